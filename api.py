@@ -0,0 +1,271 @@
+"""Headless JSON API for Book Tracker.
+
+Run with `uvicorn api:app`. Every database call is blocking SQLite work, so it is
+handed to a bounded thread pool and the event loop only ever awaits it.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import field
+from datetime import date
+from functools import partial
+from typing import Annotated, Any, Callable, Literal, Optional
+
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import Field
+from pydantic.dataclasses import dataclass
+
+from utils.auth import Authenticator
+from utils.database_funcs import BOOK_COLUMNS, BOOKSHELF_COLUMNS, BookDatabase
+from utils.export import iter_export, media_type
+from utils.recommender import start_recommender
+
+# Threads available for blocking SQLite calls, shared by all requests
+DB_WORKERS = int(os.environ.get("BOOK_TRACKER_API_DB_WORKERS", 8))
+MAX_PAGE_SIZE = 200
+
+BOOK_FIELDS = BOOK_COLUMNS
+BOOKSHELF_FIELDS = BOOKSHELF_COLUMNS
+
+app = FastAPI(title="Book Tracker API")
+db = BookDatabase("books.db", "bookshelf.db")
+# Keeps the "more like this" lists current, if no other process already does
+start_recommender(db)
+auth = Authenticator()
+bearer = HTTPBearer()
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="api-db")
+
+
+@dataclass
+class Credentials:
+    username: str
+    password: str
+
+
+@dataclass
+class NewBook:
+    isbn: str
+    title: str
+    authors: str = ""
+    publisher: str = ""
+    description: str = ""
+    page_count: int = 0
+    year: int = 0
+    categories: list[str] = field(default_factory=list)
+
+
+# Malformed dates, unknown ownership and negative pages are rejected with a 422 before reaching the database
+@dataclass
+class BookshelfUpdate:
+    date_started: Optional[date] = None
+    date_ended: Optional[date] = None
+    owned: Literal["Owned", "Rented", "Burrowed", "No"] = "Owned"
+    current_page: Annotated[int, Field(ge=0)] = 0
+
+
+async def run_db(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Runs a blocking database call on the bounded thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+
+def check_result(result: Any) -> Any:
+    """Turns the error strings returned by the database layer into HTTP 500s."""
+    if isinstance(result, str) and result.startswith("An error occurred"):
+        raise HTTPException(status_code=500, detail=result)
+    return result
+
+
+def as_page(rows: list[tuple], fields: tuple, limit: int, offset: int) -> dict:
+    """Shapes one page of rows into the paginated response body."""
+    return {
+        "items": [dict(zip(fields, row)) for row in rows],
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(rows) == limit else None,
+    }
+
+
+async def current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer),
+) -> str:
+    """Resolves the bearer token to a username."""
+    username = await run_db(auth.verify_token, credentials.credentials)
+    if username is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token.")
+    return username
+
+
+# Authentication
+@app.post("/auth/register", status_code=201)
+async def register(credentials: Credentials) -> dict:
+    msg = check_result(
+        await run_db(auth.register_user, credentials.username, credentials.password)
+    )
+    if "successfully" not in msg:
+        raise HTTPException(status_code=409, detail=msg)
+    return {"detail": msg}
+
+
+@app.post("/auth/token")
+async def issue_token(credentials: Credentials) -> dict:
+    logged_in = await run_db(auth.login, credentials.username, credentials.password)
+    if logged_in is not True:
+        raise HTTPException(status_code=401, detail="Invalid username or password.")
+    token = check_result(await run_db(auth.issue_token, credentials.username))
+    return {"access_token": token, "token_type": "bearer"}
+
+
+@app.delete("/auth/token")
+async def revoke_token(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer),
+) -> dict:
+    return {"detail": await run_db(auth.revoke_token, credentials.credentials)}
+
+
+# Catalog
+@app.get("/books")
+async def list_books(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    username: str = Depends(current_user),
+) -> dict:
+    rows = check_result(await run_db(db.get_books_page, limit, offset))
+    return as_page(rows, BOOK_FIELDS, limit, offset)
+
+
+@app.get("/books/{isbn}")
+async def get_book(isbn: str, username: str = Depends(current_user)) -> dict:
+    book = check_result(await run_db(db.get_book_by_isbn, isbn))
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"No book with ISBN {isbn}.")
+    return dict(zip(BOOK_FIELDS, book))
+
+
+@app.post("/books", status_code=201)
+async def create_book(book: NewBook, username: str = Depends(current_user)) -> dict:
+    msg = await run_db(
+        db.insert_book,
+        isbn=book.isbn,
+        title=book.title,
+        authors=book.authors,
+        publisher=book.publisher,
+        description=book.description,
+        page_count=book.page_count,
+        year=book.year,
+        categories=book.categories,
+    )
+    if "successfully" not in msg:
+        raise HTTPException(status_code=409, detail=msg)
+    return {"detail": msg}
+
+
+@app.get("/books/{isbn}/similar")
+async def similar_books(
+    isbn: str,
+    limit: int = Query(5, ge=1, le=50),
+    username: str = Depends(current_user),
+) -> list[dict]:
+    rows = check_result(await run_db(db.get_similar_books, isbn, limit))
+    return [dict(zip(("isbn", "title", "authors", "score"), row)) for row in rows]
+
+
+# Bookshelf
+@app.get("/bookshelf")
+async def list_bookshelf(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    username: str = Depends(current_user),
+) -> dict:
+    rows = check_result(await run_db(db.get_bookshelf_page, username, limit, offset))
+    return as_page(rows, BOOKSHELF_FIELDS, limit, offset)
+
+
+@app.get("/bookshelf/{isbn}")
+async def get_bookshelf_entry(isbn: str, username: str = Depends(current_user)) -> dict:
+    book = check_result(await run_db(db.get_one_book_bookshelf, isbn, username))
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"{isbn} is not in your bookshelf.")
+    return dict(zip(BOOKSHELF_FIELDS, book))
+
+
+@app.post("/bookshelf/{isbn}", status_code=201)
+async def add_to_bookshelf(isbn: str, username: str = Depends(current_user)) -> dict:
+    exists, msg = await run_db(db.check_bookshelf_entry, isbn, username)
+    if exists:
+        raise HTTPException(status_code=409, detail=msg)
+    book = check_result(await run_db(db.get_book_by_isbn, isbn))
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"{isbn} is not in the catalog.")
+    msg = check_result(await run_db(db.add_to_bookshelf, isbn, username))
+    return {"detail": msg}
+
+
+@app.put("/bookshelf/{isbn}")
+async def update_bookshelf(
+    isbn: str, update: BookshelfUpdate, username: str = Depends(current_user)
+) -> dict:
+    updated, msg = await run_db(
+        db.update_bookshelf,
+        book_id=isbn,
+        username=username,
+        date_started=update.date_started,
+        date_ended=update.date_ended,
+        owned=update.owned,
+        current_page=update.current_page,
+    )
+    if not updated:
+        check_result(msg)
+        raise HTTPException(status_code=404, detail=msg)
+    return {"detail": msg}
+
+
+@app.delete("/bookshelf/{isbn}")
+async def remove_from_bookshelf(
+    isbn: str, username: str = Depends(current_user)
+) -> dict:
+    msg = check_result(await run_db(db.remove_from_bookshelf, isbn, username))
+    if "removed" not in msg:
+        raise HTTPException(status_code=404, detail=msg)
+    return {"detail": msg}
+
+
+# Export
+def export_response(rows, columns: tuple, fmt: str, name: str) -> StreamingResponse:
+    """Streams rows as CSV or JSON Lines; Starlette pulls the generator from a worker thread."""
+    if fmt not in ("csv", "jsonl"):
+        raise HTTPException(status_code=404, detail=f"Unknown export format {fmt}.")
+    return StreamingResponse(
+        iter_export(rows, columns, fmt),
+        media_type=media_type(fmt),
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@app.get("/export/books.{fmt}")
+async def export_books(fmt: str, username: str = Depends(current_user)):
+    return export_response(db.iter_all_books(), BOOK_FIELDS, fmt, "books")
+
+
+@app.get("/export/bookshelf.{fmt}")
+async def export_bookshelf(fmt: str, username: str = Depends(current_user)):
+    return export_response(
+        db.iter_bookshelf(username), BOOKSHELF_FIELDS, fmt, "bookshelf"
+    )
+
+
+# Delta sync
+@app.get("/changes")
+async def changes(
+    since: int = Query(0, ge=0), username: str = Depends(current_user)
+) -> dict:
+    delta = check_result(await run_db(db.changes_since, since, username))
+    for change in delta["books"]:
+        change["row"] = change["row"] and dict(zip(BOOK_FIELDS, change["row"]))
+    for change in delta["bookshelf"]:
+        change["row"] = change["row"] and dict(zip(BOOKSHELF_FIELDS, change["row"]))
+    return delta
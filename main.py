@@ -3,6 +3,16 @@
 import streamlit as st
 
 from utils.auth import Authenticator
+from utils.database_funcs import BookDatabase
+from utils.jobs import JOBS_DB, start_job_worker
+from utils.maintenance import start_maintenance_scheduler
+from utils.predictions import start_prediction_scheduler
+from utils.prefetch import cancel_warmup, start_warmup
+from utils.profiling import profile_page
+from utils.rate_limit import QUOTA_DB
+from utils.recommender import start_recommender
+
+profile_page(__file__)
 
 st.set_page_config(
     page_title="Book Tracker",
@@ -14,6 +24,23 @@ st.set_page_config(
 # Instantiate Auth class
 auth = Authenticator()
 
+# Keep the reading predictions fresh for every page (started once per process)
+start_prediction_scheduler(BookDatabase("books.db", "bookshelf.db"))
+# Daily ANALYZE, VACUUM and integrity checks of every database file (once per process)
+start_maintenance_scheduler(
+    [
+        "books.db",
+        "bookshelf.db",
+        auth.db_name,
+        JOBS_DB,
+        st.secrets.get("QUOTA_DB", QUOTA_DB),
+    ]
+)
+# Runs queued imports and downloads in the background (once per process)
+start_job_worker(BookDatabase("books.db", "bookshelf.db"))
+# Keeps the "more like this" lists current, if no other process already does
+start_recommender(BookDatabase("books.db", "bookshelf.db"))
+
 # Initialize session state for login status
 auth.init_session()
 
@@ -28,9 +55,12 @@ if not auth.is_logged_in():
         reg_password = st.text_input("Password", type="password")
         if st.button("Register"):
             if reg_username and reg_password:
-                auth.register_user(reg_username, reg_password)
-                st.success("Registration successful. Please log in.")
-                st.session_state["register"] = False
+                reg_msg = auth.register_user(reg_username, reg_password)
+                if "successfully" in reg_msg:
+                    st.success("Registration successful. Please log in.")
+                    st.session_state["register"] = False
+                else:
+                    st.error(reg_msg)
             else:
                 st.error("Please enter a username and password.")
         if st.button("Go to Login"):
@@ -44,6 +74,7 @@ if not auth.is_logged_in():
             if auth.login(username, password):
                 st.session_state["logged_in"] = True
                 st.session_state["username"] = username
+                start_warmup(BookDatabase("books.db", "bookshelf.db"), username)
                 st.rerun()
             else:
                 st.error("Invalid username or password")
@@ -68,5 +99,6 @@ else:
         """
     )
     if st.button("Logout"):
+        cancel_warmup()
         auth.logout()
         st.rerun()
@@ -1,19 +1,21 @@
 # type: ignore
 """Scan a New Book Page."""
 
-import io
 from time import sleep
 
 import streamlit as st
-from PIL import Image
 
 import utils.assist_functions as af
 from utils.database_funcs import BookDatabase
+from utils.jobs import get_queue
+from utils.profiling import profile_page
 
 # Global Variables
 BOOK_INFO: dict = {}
 MORE_BOOK_INFO: dict = {}
 
+profile_page(__file__)
+
 st.set_page_config(
     page_title="Scan a new book",
     page_icon="📷",
@@ -30,11 +32,24 @@ if user_id is None:
 
 st.title("Scan a new book 📷")
 
+# Lookups are drawn from a Google Books budget shared by every user
+quota = af.google_books_limiter().metrics()
+st.caption(
+    f"Google Books lookups left today: {quota['remaining']} of {quota['daily_quota']}"
+)
+
 db = BookDatabase("books.db", "bookshelf.db")
+jobs = get_queue()
 
 # Prompt the user to choose an option: upload an image or take a picture
 option = st.radio(
-    "Choose an option:", ("Upload an image", "Take a picture", "Enter ISBN Manually")
+    "Choose an option:",
+    (
+        "Upload an image",
+        "Take a picture",
+        "Enter ISBN Manually",
+        "Import a list of ISBNs",
+    ),
 )
 
 image = None
@@ -45,14 +60,14 @@ if option == "Upload an image":
         "Choose an image...", type=["jpg", "jpeg", "png"]
     )  # type: ignore
     if uploaded_file is not None:
-        # Open the uploaded image file
-        image = Image.open(uploaded_file)
+        # Keep the raw bytes, they key the memoized scan across reruns
+        image = uploaded_file.getvalue()
 elif option == "Take a picture":
     # Allow the user to take a picture using the camera
     cam_image = st.camera_input("Take a picture of the book's barcode.")
     if cam_image is not None:
-        # Open the captured image from the camera
-        image = Image.open(io.BytesIO(cam_image.getvalue()))
+        # Keep the raw bytes, they key the memoized scan across reruns
+        image = cam_image.getvalue()
 elif option == "Enter ISBN Manually":
     isbn = st.text_input(
         "Enter the ISBN of the book",
@@ -60,7 +75,7 @@ elif option == "Enter ISBN Manually":
     )
     if isbn:
         # Get book information based on the ISBN
-        BOOK_INFO = af.get_basic_info(isbn)
+        BOOK_INFO = af.get_basic_info_memo(isbn)
         if BOOK_INFO:
             # Display the book information
             st.write("Book Information:")
@@ -69,6 +84,19 @@ elif option == "Enter ISBN Manually":
             # Inform the user that no information is found for the ISBN
             st.write("No information found for this ISBN.")
 
+elif option == "Import a list of ISBNs":
+    isbn_list = st.text_area(
+        "ISBNs to import",
+        placeholder="One ISBN per line, or separated by commas.",
+    )
+    if st.button("Import", disabled=not isbn_list.strip()):
+        isbns = list(dict.fromkeys(isbn_list.replace(",", "\n").split()))
+        # The lookups and inserts run on the job workers, the page returns right away
+        job_id = jobs.enqueue(
+            "import", {"isbns": isbns, "owner": user_id}, owner=user_id
+        )
+        st.success(f"Importing {len(isbns)} books in the background (job #{job_id}).")
+
 with st.container(border=True):
     if image:
         # Display the scanned barcode image
@@ -76,12 +104,12 @@ with st.container(border=True):
         st.write("\nScanning barcode...")
 
         # Scan the barcode in the image and retrieve the ISBN
-        isbn = af.scan_barcode(image)
+        isbn = af.scan_barcode_memo(image)
         if isbn:
             # Display the scanned ISBN
             st.write(f"ISBN: {isbn}")
             # Get book information based on the ISBN
-            BOOK_INFO = af.get_basic_info(isbn)
+            BOOK_INFO = af.get_basic_info_memo(isbn)
             if BOOK_INFO:
                 # Display the book information
                 st.write("Book Information:")
@@ -125,6 +153,11 @@ if BOOK_INFO:
                 value=BOOK_INFO.get("Publisher", ""),
                 placeholder="Enter the publisher of the book.",
             )
+            categories = st.text_input(
+                "Categories",
+                value=", ".join(BOOK_INFO.get("categories", [])),
+                placeholder="Enter the book's categories, separated by commas.",
+            )
 
         with col2:
             isbn = st.text_input(
@@ -168,10 +201,33 @@ if BOOK_INFO:
                 description=description,
                 page_count=int(pages),
                 year=int(year),
+                categories=categories.split(","),
             )
             if "successfully" in insert_msg:
+                jobs.enqueue("cover", {"isbn": isbn}, owner=user_id)
                 st.success(insert_msg)
                 sleep(3)
                 st.rerun()
             else:
                 st.error(insert_msg)
+
+# Progress of the imports and downloads this user queued
+recent_jobs = jobs.list_jobs(owner=user_id, limit=10)
+if recent_jobs:
+    st.divider()
+    st.subheader("Background jobs")
+    if st.button("Refresh"):
+        st.rerun()
+    for job in recent_jobs:
+        label = f"#{job.id} {job.kind} · {job.status}"
+        if job.kind == "import":
+            label += f" · {len(job.payload['isbns'])} books"
+        if job.message:
+            label += f" · {job.message}"
+        st.progress(job.progress, text=label)
+        if job.status == "done" and job.kind == "import":
+            st.caption(
+                f"Added {len(job.result['added'])} new books, shelved "
+                f"{len(job.result['shelved'])}, not found: "
+                f"{', '.join(job.result['missing']) or 'none'}"
+            )
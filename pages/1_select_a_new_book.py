@@ -3,10 +3,12 @@
 """Select a New Book Page."""
 
 import pandas as pd
-import requests
 import streamlit as st
 
+import utils.assist_functions as af
 from utils.database_funcs import BookDatabase
+from utils.jobs import get_queue
+from utils.profiling import profile_page
 
 # Global Variables
 BOOK_INFO: pd.DataFrame = pd.DataFrame()
@@ -14,6 +16,8 @@ BOOK_FLAG: bool = False
 MORE_BOOK_INFO: dict = {}
 BOOK_DATA = ()
 
+profile_page(__file__)
+
 st.set_page_config(
     page_title="Add a new book",
     page_icon="📖",
@@ -30,39 +34,16 @@ if user_id is None:
 
 st.title("Add a new book 📖")
 
-db = BookDatabase("books.db", "bookshelf.db")
-get_all_books = db.get_all_books()
-all_books = []
-
-all_books = [book for book in get_all_books]
-
-
-# Define data types dictionary
-dtypes_dict = {
-    "ISBN": str,
-    "Title": str,
-    "Authors": str,
-    "Publisher": str,
-    "Description": str,
-    "Page_Count": int,
-    "Year": int,
-}
-
-# Create DataFrame and apply data types
-books_df = pd.DataFrame(
-    # books,
-    all_books,
-    columns=[
-        "ISBN",
-        "Title",
-        "Authors",
-        "Publisher",
-        "Description",
-        "Page_Count",
-        "Year",
-    ],
+# Reads on this page can be served from the in-memory snapshot
+db = BookDatabase(
+    "books.db", "bookshelf.db", read_snapshot=st.secrets.get("READ_SNAPSHOT", False)
 )
-books_df = books_df.astype(dtypes_dict)
+# The description is not shown here, so the list query leaves it out
+books_df = db.get_book_frame()
+
+if isinstance(books_df, str):
+    st.error(books_df)
+    st.stop()
 
 only_titles = sorted(books_df["Title"].unique())
 
@@ -88,12 +69,17 @@ with col1:
 with col2:
     if BOOK_FLAG:
         st.subheader(f"Book Information for {BOOK_INFO['Title'].values[0]}:")
-        url = f"https://covers.openlibrary.org/b/isbn/{str(BOOK_INFO['ISBN'])}-M.jpg"
-        response = requests.request("GET", url)
-        if response.status_code == 200:
-            st.image(response.content, caption="Book Cover", use_column_width=True)
+        isbn = BOOK_INFO["ISBN"].values[0]
+        if af.has_cached_cover(isbn):
+            cover = af.get_cover(isbn)
+            if cover:
+                st.image(cover, caption="Book Cover", use_column_width=True)
+            else:
+                st.error("No book cover found.")
         else:
-            st.error("No book cover found.")
+            # Downloaded by the job workers, so the page doesn't wait on Open Library
+            get_queue().enqueue("cover", {"isbn": isbn}, owner=user_id)
+            st.info("The cover is being downloaded, it will show up shortly.")
         info1, info2 = st.columns(2)
 
         with st.form("add_book_form"):
@@ -119,7 +105,7 @@ with col2:
             with info2:
                 st.text_input(
                     "Publication year:",
-                    value=BOOK_INFO["Year"].values[0],
+                    value=BOOK_INFO["Year"].astype("string").fillna("").values[0],
                     key="year",
                     disabled=True,
                 )
@@ -131,7 +117,7 @@ with col2:
                 )
                 st.text_input(
                     "Page Count:",
-                    value=BOOK_INFO["Page_Count"].values[0],
+                    value=BOOK_INFO["Page Count"].astype("string").fillna("").values[0],
                     key="pageCount",
                     disabled=True,
                 )
@@ -1,10 +1,19 @@
 # type: ignore
 """View All Books."""
 
-import pandas as pd
+import io
+
 import streamlit as st
 
-from utils.database_funcs import BookDatabase
+from utils.database_funcs import BOOKSHELF_COLUMNS, SHELF_SORT_COLUMNS, BookDatabase
+from utils.export import iter_export, media_type
+from utils.frames import COLUMN_LABELS
+from utils.profiling import profile_page
+
+# Rows shown per page of the table
+PAGE_SIZES = (25, 50, 100, 250)
+
+profile_page(__file__)
 
 st.set_page_config(
     page_title="View All Books",
@@ -22,76 +31,134 @@ if user_id is None:
 
 st.title(f"All of {user_id}'s Books 📚")
 
-db = BookDatabase("books.db", "bookshelf.db")
-all_user_books = db.get_from_bookshelf(user_id)
+# Reads on this page can be served from the in-memory snapshot
+db = BookDatabase(
+    "books.db", "bookshelf.db", read_snapshot=st.secrets.get("READ_SNAPSHOT", False)
+)
+# Facet counts come from one grouped query, the filtering itself is done in SQL
+facets = db.get_bookshelf_facets(user_id)
 
-if "error" in all_user_books:
+if "error" in facets or not facets["owned"]:
     st.error("You have not added any books yet.")
     st.stop()
 
-user_books = [book for book in all_user_books]
-
-# Define data types dictionary
-dtypes_dict = {
-    "ISBN": str,
-    "Title": str,
-    "Authors": str,
-    "Publisher": str,
-    "Description": str,
-    "Page Count": int,
-    "Year": int,
-    "Started Reading": "datetime64[ns]",
-    "Finished Reading": "datetime64[ns]",
-    "Owned": "category",
-    "Current Page": int,
+with st.expander("Filters"):
+    filter1, filter2, filter3, filter4 = st.columns(4)
+    with filter1:
+        categories = st.multiselect(
+            "Category",
+            options=sorted(facets["category"]),
+            format_func=lambda category: f"{category} ({facets['category'][category]})",
+        )
+    with filter2:
+        first_year, last_year = facets["year"]["min"], facets["year"]["max"]
+        year_range = None
+        if first_year and last_year and first_year < last_year:
+            selected_years = st.slider(
+                "Publication year",
+                min_value=first_year,
+                max_value=last_year,
+                value=(first_year, last_year),
+            )
+            # Books without a year are only hidden once the range is narrowed
+            if selected_years != (first_year, last_year):
+                year_range = selected_years
+    with filter3:
+        owned = st.multiselect(
+            "Owned",
+            options=sorted(facets["owned"], key=str),
+            format_func=lambda status: f"{status} ({facets['owned'][status]})",
+        )
+    with filter4:
+        finished_counts = facets["finished"]
+        finished_filter = st.radio(
+            "Status",
+            options=(None, True, False),
+            format_func=lambda status: {
+                None: f"All ({sum(finished_counts.values())})",
+                True: f"Finished ({finished_counts.get(True, 0)})",
+                False: f"Unfinished ({finished_counts.get(False, 0)})",
+            }[status],
+            horizontal=True,
+        )
+
+filters = {
+    "categories": tuple(categories),
+    "year_range": year_range,
+    "owned": tuple(owned),
+    "finished": finished_filter,
 }
+# The whole shelf's totals are kept current on every write, filtered ones are summed in SQL
+if any(filters.values()) or finished_filter is not None:
+    totals = db.get_bookshelf_totals(user_id, **filters)
+else:
+    totals = db.get_user_summary(user_id)
+
+if isinstance(totals, str):
+    st.error(totals)
+    st.stop()
 
-# Create DataFrame and apply data types
-books_df = pd.DataFrame(
-    user_books,
-    columns=[
-        "ISBN",
-        "Title",
-        "Authors",
-        "Publisher",
-        "Description",
-        "Page Count",
-        "Year",
-        "Started Reading",
-        "Finished Reading",
-        "Owned",
-        "Current Page",
-    ],
+sort1, sort2, sort3, sort4 = st.columns([2, 1, 1, 1])
+with sort1:
+    sort_by = st.selectbox(
+        "Sort by",
+        options=list(SHELF_SORT_COLUMNS),
+        format_func=lambda column: COLUMN_LABELS[column],
+    )
+with sort2:
+    descending = st.toggle("Descending")
+with sort3:
+    page_size = st.selectbox("Books per page", options=PAGE_SIZES, index=1)
+with sort4:
+    page_count = max(1, -(-totals["books"] // page_size))
+    page_number = st.number_input(
+        f"Page (of {page_count})", min_value=1, max_value=page_count, step=1
+    )
+
+# Descriptions are left out of the list and fetched for the selected book only
+books_df = db.get_bookshelf_window(
+    user_id,
+    **filters,
+    sort_by=sort_by,
+    descending=descending,
+    limit=page_size,
+    offset=(page_number - 1) * page_size,
 )
-books_df = books_df.astype(dtypes_dict)
+
+if isinstance(books_df, str):
+    st.error(books_df)
+    st.stop()
 
 col1, col2 = st.columns([1, 6], gap="small")
 
-delta_val = round(
-    (books_df["Current Page"].sum() / books_df["Page Count"].sum()) * 100, 2
+delta_val = (
+    round((totals["read_pages"] / totals["total_pages"]) * 100, 2)
+    if totals["total_pages"]
+    else 0
 )
 
 with col1:
-    st.metric("Registered Books", value=books_df.shape[0])
-    st.metric("Books Owned", value=books_df["Owned"].value_counts().get("Yes", 0))
+    st.metric("Registered Books", value=totals["books"])
+    st.metric("Books Owned", value=totals["owned"])
     st.metric(
         "Read Pages",
-        value=books_df["Current Page"].sum(),
+        value=totals["read_pages"],
         delta=f"{delta_val}%",
     )
-    st.metric("Total Pages", value=books_df["Page Count"].sum())
+    st.metric("Total Pages", value=totals["total_pages"])
 
 with col2:
     # Display DataFrame
-    st.dataframe(
+    selection = st.dataframe(
         books_df,
         use_container_width=True,
         hide_index=True,
         key="books_df",
+        on_select="rerun",
+        selection_mode="single-row",
         column_order=(
             "Title",
             "Authors",
-            "Description",
             "Page Count",
             "Current Page",
             "Started Reading",
@@ -101,11 +168,6 @@ with col2:
         column_config={
             "Title": "Book Title",
             "Authors": "Author(s)",
-            "Description": st.column_config.TextColumn(
-                max_chars=3,
-                width="small",
-                help="Click on the row to expand the description.",
-            ),
             "Started Reading": st.column_config.DatetimeColumn(
                 format="DD/MM/YYYY",
             ),
@@ -114,3 +176,31 @@ with col2:
             ),
         },
     )
+
+    selected_rows = selection.selection.rows
+    if selected_rows and selected_rows[0] < books_df.shape[0]:
+        selected_book = books_df.iloc[selected_rows[0]]
+        description = db.get_description(selected_book["ISBN"])
+        with st.expander(f"Description of {selected_book['Title']}", expanded=True):
+            st.write(description or "No description available.")
+    else:
+        st.caption("Select a row to read the book's description.")
+
+# The rows are streamed from the database cursor, not from books_df. Streamlit keeps
+# download data in memory, so the encoded export is built in a buffer of its own
+export1, export2 = st.columns([1, 6], gap="small")
+with export1:
+    export_format = st.radio("Export format", ("csv", "jsonl"), horizontal=True)
+    if st.button("Prepare export", help="Export your whole bookshelf."):
+        with io.BytesIO() as export:
+            for chunk in iter_export(
+                db.iter_bookshelf(user_id), BOOKSHELF_COLUMNS, export_format
+            ):
+                export.write(chunk.encode("utf-8"))
+            export_data = export.getvalue()
+        st.download_button(
+            "Download",
+            data=export_data,
+            file_name=f"{user_id}_bookshelf.{export_format}",
+            mime=media_type(export_format),
+        )
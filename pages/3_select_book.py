@@ -1,12 +1,15 @@
 # type: ignore
 """Select Book."""
 
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import pandas as pd
 import streamlit as st
 
 from utils.database_funcs import BookDatabase
+from utils.profiling import profile_page
+
+profile_page(__file__)
 
 st.set_page_config(
     page_title="Select a Book",
@@ -24,49 +27,16 @@ if user_id is None:
 
 
 db = BookDatabase("books.db", "bookshelf.db")
-all_user_books = db.get_from_bookshelf(username=user_id)  # type: ignore
+# Only the titles are listed, the selected book is read in full below
+books_df = db.get_bookshelf_frame(user_id)
 
-user_books = [book for book in all_user_books]
+if isinstance(books_df, str):
+    st.error(books_df)
+    st.stop()
 
-if all_user_books:
+if not books_df.empty:
 
     st.title("View a Book 📕")
-    # st.markdown(user_books)
-
-    # Define data types dictionary
-    dtypes_dict = {
-        "ISBN": str,
-        "Title": str,
-        "Authors": str,
-        "Publisher": str,
-        "Description": str,
-        "Page_Count": int,
-        "Year": int,
-        "Started_Reading": "datetime64[ns]",
-        "Finished_Reading": "datetime64[ns]",
-        "Owned": "category",
-        "Current_Page": int,
-    }
-
-    # Create DataFrame and apply data types
-    books_df = pd.DataFrame(
-        # books,
-        user_books,
-        columns=[
-            "ISBN",
-            "Title",
-            "Authors",
-            "Publisher",
-            "Description",
-            "Page_Count",
-            "Year",
-            "Started_Reading",
-            "Finished_Reading",
-            "Owned",
-            "Current_Page",
-        ],
-    )
-    books_df = books_df.astype(dtypes_dict)
 
     only_titles = sorted(books_df["Title"].unique())
 
@@ -163,9 +133,7 @@ if all_user_books:
                             )
                             if current_page < page_count:
                                 st.info("You haven't finished your book.")
-                                finished_reading = (
-                                    started_reading + timedelta(days=365)
-                                ).strftime("%Y-%m-%d")
+                                finished_reading = None
                             else:
                                 finished_reading = st.date_input(
                                     label="Date Finished Reading",
@@ -175,13 +143,18 @@ if all_user_books:
                                     format="DD/MM/YYYY",
                                     max_value=datetime.now(),
                                 )
+                            owned_options = ["Owned", "Rented", "Burrowed", "No"]
                             owned = st.selectbox(
                                 label="Owned",
-                                options=["Owned", "Rented", "Burrowed", "No"],
-                                index=None,
+                                options=owned_options,
+                                index=(
+                                    owned_options.index(book_info[9])
+                                    if book_info[9] in owned_options
+                                    else None
+                                ),
                                 key="owned",
                                 help="Indicates whether you own the book.",
-                                disabled=True,
+                                disabled=False,
                                 placeholder="Own",
                             )
 
@@ -208,7 +181,7 @@ if all_user_books:
                 username=user_id,
                 date_started=started_reading,
                 date_ended=finished_reading,
-                owned="Own",
+                owned=owned or book_info[9],
                 current_page=current_page,
             )
             if "successfully" in update_msg:
@@ -245,5 +218,20 @@ if all_user_books:
             #         with col2:
             #             st.error(add_ans)
 
+        if book_info:
+            prediction = db.get_prediction(book_info[0], user_id)
+            if prediction and not isinstance(prediction, str) and prediction[1]:
+                pace1, pace2 = st.columns(2)
+                pace1.metric("Pages per day", value=prediction[0])
+                pace2.metric("Predicted finish", value=prediction[1])
+
+            st.subheader("More like this")
+            similar_books = db.get_similar_books(book_info[0])
+            if isinstance(similar_books, str) or not similar_books:
+                st.info("No similar books found yet.")
+            else:
+                for _, similar_title, similar_authors, _ in similar_books:
+                    st.markdown(f"- **{similar_title}** by {similar_authors}")
+
 else:
     st.header("You have not added any books yet.")
@@ -1,7 +1,14 @@
 """View Reading Stats."""
 
+import pandas as pd
 import streamlit as st
 
+from utils.analytics import get_analytics
+from utils.database_funcs import BookDatabase
+from utils.profiling import profile_page
+
+profile_page(__file__)
+
 st.set_page_config(
     page_title="My Reading Stats",
     page_icon="📊",
@@ -9,4 +16,90 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
+# Retrieve the user ID from the session state
+user_id = st.session_state.get("username", None)
+
+if user_id is None:
+    st.error("You must be logged in to view your stats.")
+    st.stop()  # Stop the script here if the user is not logged in
+
 st.title("My Reading Stats 📊")
+
+db = BookDatabase("books.db", "bookshelf.db")
+
+st.subheader("Currently reading")
+predictions = db.get_predictions(user_id)
+if isinstance(predictions, str):
+    st.error(predictions)
+elif not predictions:
+    st.info("Predictions appear here once you've started a book.")
+else:
+    predictions_df = pd.DataFrame(
+        predictions,
+        columns=[
+            "Title",
+            "Current Page",
+            "Page Count",
+            "Pages per Day",
+            "Predicted Finish",
+        ],
+    )
+    st.dataframe(predictions_df, use_container_width=True, hide_index=True)
+
+# The user's own history is read straight from SQLite so it includes their latest updates
+st.subheader("Reading history")
+history = get_analytics("books.db", "bookshelf.db").finished_by_month(user_id)
+if isinstance(history, str):
+    st.error(history)
+elif history.empty:
+    st.info("Your history appears here once you've finished a book.")
+else:
+    st.bar_chart(history, x="month", y="pages", x_label="Month", y_label="Pages")
+
+# Stats across every user's shelf run on the configured engine, DuckDB when enabled
+analytics = get_analytics(
+    "books.db",
+    "bookshelf.db",
+    backend=st.secrets.get("ANALYTICS_BACKEND", "sqlite"),
+    snapshot_dir=st.secrets.get("ANALYTICS_SNAPSHOT_DIR", None),
+)
+
+st.subheader("Across all readers")
+summary = analytics.yearly_summary()
+if isinstance(summary, str):
+    st.error(summary)
+else:
+    st.dataframe(
+        summary,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "year": st.column_config.NumberColumn("Year", format="%d"),
+            "readers": "Readers",
+            "books": "Books Finished",
+            "pages": "Pages Read",
+            "avg_days": st.column_config.NumberColumn(
+                "Average Days to Finish", format="%.1f"
+            ),
+        },
+    )
+
+col1, col2 = st.columns(2)
+for col, ranking, label in (
+    (col1, analytics.top_categories(), "Category"),
+    (col2, analytics.top_authors(), "Author"),
+):
+    with col:
+        if isinstance(ranking, str):
+            st.error(ranking)
+        else:
+            st.dataframe(
+                ranking,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    label.lower(): label,
+                    "readers": "Readers",
+                    "books": "Books Finished",
+                },
+            )
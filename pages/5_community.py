@@ -0,0 +1,84 @@
+"""Community Reading Challenge."""
+
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from utils.database_funcs import BookDatabase
+from utils.profiling import profile_page
+
+profile_page(__file__)
+
+st.set_page_config(
+    page_title="Reading Challenge",
+    page_icon="🏆",
+    layout="wide",
+    initial_sidebar_state="collapsed",
+)
+
+# Retrieve the user ID from the session state
+user_id = st.session_state.get("username", None)
+
+if user_id is None:
+    st.error("You must be logged in to view the reading challenge.")
+    st.stop()  # Stop the script here if the user is not logged in
+
+st.title("Yearly Reading Challenge 🏆")
+
+# Reads on this page can be served from the in-memory snapshot
+db = BookDatabase(
+    "books.db", "bookshelf.db", read_snapshot=st.secrets.get("READ_SNAPSHOT", False)
+)
+
+# The rankings are precomputed, so this page never scans the bookshelf
+years = db.get_leaderboard_years()
+if isinstance(years, str):
+    st.error(years)
+    st.stop()
+
+current_year = datetime.now().year
+if current_year not in years:
+    years = [current_year] + years
+
+year = st.selectbox("Challenge year", options=years, index=0)
+
+entry = db.get_leaderboard_entry(year, user_id)
+col1, col2, col3 = st.columns(3)
+if entry and not isinstance(entry, str):
+    books_finished, pages_finished, books_rank, pages_rank = entry
+    col1.metric("Books finished", value=books_finished)
+    col2.metric("Pages read", value=pages_finished)
+    col3.metric(
+        "Your rank", value=f"#{books_rank}", help=f"#{pages_rank} by pages read."
+    )
+else:
+    col1.info(f"Finish a book in {year} to join the challenge.")
+
+books_tab, pages_tab = st.tabs(["Most books", "Most pages"])
+for tab, order_by in ((books_tab, "books"), (pages_tab, "pages")):
+    with tab:
+        leaderboard = db.get_leaderboard(year, order_by=order_by)
+        if isinstance(leaderboard, str):
+            st.error(leaderboard)
+        elif not leaderboard:
+            st.info(f"Nobody has finished a book in {year} yet.")
+        else:
+            leaderboard_df = pd.DataFrame(
+                leaderboard,
+                columns=[
+                    "Reader",
+                    "Books Finished",
+                    "Pages Read",
+                    "Books Rank",
+                    "Pages Rank",
+                ],
+            )
+            rank_column = "Books Rank" if order_by == "books" else "Pages Rank"
+            st.dataframe(
+                leaderboard_df,
+                use_container_width=True,
+                hide_index=True,
+                column_order=(rank_column, "Reader", "Books Finished", "Pages Read"),
+                column_config={rank_column: "Rank"},
+            )
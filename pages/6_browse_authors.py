@@ -0,0 +1,80 @@
+"""Browse Authors."""
+
+import streamlit as st
+
+from utils.database_funcs import BookDatabase
+from utils.profiling import profile_page
+
+# Books shown per page of an author's bibliography
+PAGE_SIZE = 50
+
+profile_page(__file__)
+
+st.set_page_config(
+    page_title="Browse Authors",
+    page_icon="✍️",
+    layout="wide",
+    initial_sidebar_state="collapsed",
+)
+
+# Retrieve the user ID from the session state
+user_id = st.session_state.get("username", None)
+
+if user_id is None:
+    st.error("You must be logged in to browse authors.")
+    st.stop()  # Stop the script here if the user is not logged in
+
+st.title("Browse Authors ✍️")
+
+# Reads on this page can be served from the in-memory snapshot
+db = BookDatabase(
+    "books.db", "bookshelf.db", read_snapshot=st.secrets.get("READ_SNAPSHOT", False)
+)
+
+col1, col2 = st.columns([2, 5], gap="small")
+
+with col1:
+    prefix = st.text_input(
+        "Author's name",
+        placeholder="Start typing a name, e.g. Ursula",
+        help="Authors whose name starts with this text are listed.",
+    )
+    selected_author = None
+    if prefix:
+        authors = db.search_authors(prefix)
+        if isinstance(authors, str):
+            st.error(authors)
+        elif not authors:
+            st.info("No author found with that name.")
+        else:
+            book_counts = dict(authors)
+            selected_author = st.radio(
+                "Select an author:",
+                options=list(book_counts),
+                format_func=lambda name: f"{name} ({book_counts[name]})",
+            )
+
+with col2:
+    if selected_author:
+        st.subheader(f"Books by {selected_author}")
+        page = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=max(1, -(-book_counts[selected_author] // PAGE_SIZE)),
+            step=1,
+        )
+        books_df = db.get_books_by_author_frame(
+            selected_author, limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE
+        )
+        if isinstance(books_df, str):
+            st.error(books_df)
+        else:
+            st.dataframe(
+                books_df,
+                use_container_width=True,
+                hide_index=True,
+                column_order=("Title", "Authors", "Year", "Page Count", "Publisher"),
+            )
+    else:
+        st.subheader("Author's books:")
+        st.warning("Please search for an author on the left.")
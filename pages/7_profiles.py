@@ -0,0 +1,85 @@
+"""Page Run Profiles."""
+
+import os
+
+import pandas as pd
+import streamlit as st
+
+from utils.profiling import (
+    PROFILE_DIR,
+    PROFILING_KEY,
+    is_admin,
+    list_profiles,
+    profile_page,
+    top_functions,
+)
+
+profile_page(__file__)
+
+st.set_page_config(
+    page_title="Profiles",
+    page_icon="⏱️",
+    layout="wide",
+    initial_sidebar_state="collapsed",
+)
+
+# Retrieve the user ID from the session state
+user_id = st.session_state.get("username", None)
+
+if not is_admin(user_id):
+    st.error("You must be logged in as an admin to view profiles.")
+    st.stop()  # Stop the script here if the user is not an admin
+
+st.title("Page Run Profiles ⏱️")
+
+
+def set_profiling() -> None:
+    # Widget keys are dropped on pages without the widget, so the flag is copied
+    st.session_state[PROFILING_KEY] = st.session_state["profiling_toggle"]
+
+
+st.toggle(
+    "Profile my page runs",
+    value=st.session_state.get(PROFILING_KEY, False),
+    key="profiling_toggle",
+    on_change=set_profiling,
+    help="Every page you open runs under the profiler until this is turned off. "
+    "Adding ?profile=1 to a page's URL profiles a single run.",
+)
+
+profiles = list_profiles()
+if not profiles:
+    st.info("No profiles yet.")
+    st.stop()
+
+st.dataframe(
+    pd.DataFrame(profiles)[
+        ["started", "user", "page", "duration_ms", "profiler", "file"]
+    ].rename(
+        columns={
+            "started": "Started",
+            "user": "User",
+            "page": "Page",
+            "duration_ms": "Duration (ms)",
+            "profiler": "Profiler",
+            "file": "File",
+        }
+    ),
+    hide_index=True,
+    use_container_width=True,
+)
+
+selected = st.selectbox(
+    "Profile",
+    profiles,
+    format_func=lambda p: f"{p['started']} · {p['page']} · {p['duration_ms']:.0f} ms",
+)
+with open(os.path.join(PROFILE_DIR, selected["file"]), "rb") as f:
+    st.download_button(
+        "Download",
+        data=f.read(),
+        file_name=selected["file"],
+        help="Speedscope files open on speedscope.app, .prof files with snakeviz.",
+    )
+if selected["profiler"] == "cProfile":
+    st.code(top_functions(selected["file"]), language="text")
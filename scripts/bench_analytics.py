@@ -0,0 +1,162 @@
+"""Benchmark of the analytics backends.
+
+Fills temporary database files with synthetic readers, runs every stats query on
+each available backend and reports the median latency, checking that all backends
+return the same rows:
+
+    python scripts/bench_analytics.py --books 200000 --readers 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.analytics import (  # noqa: E402
+    DuckDBAnalytics,
+    SQLiteAnalytics,
+    analytics_cache,
+    duckdb,
+    export_snapshot,
+)
+from utils.database_funcs import BookDatabase, to_epoch_day  # noqa: E402
+
+CATEGORIES = ["Fiction", "History", "Science", "Fantasy", "Poetry", "Travel", "Art"]
+QUERIES = {
+    "finished_by_month (all)": lambda a: a.finished_by_month(),
+    "yearly_summary": lambda a: a.yearly_summary(),
+    "top_categories": lambda a: a.top_categories(),
+    "top_authors": lambda a: a.top_authors(),
+}
+
+
+def fill(books_db: str, bookshelf_db: str, books: int, readers: int) -> None:
+    """Creates the schema and inserts the synthetic catalog and shelves."""
+    rng = random.Random(7)
+    db = BookDatabase(books_db, bookshelf_db)
+    start = date(2010, 1, 1)
+    conn = db._connect(books_db)
+    conn.executemany(
+        "INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (f"{i:013d}", f"Book {i}", f"Author {i % 5000}", "Pub", "", 300, 2000)
+            for i in range(books)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO authors (author_id, name, name_key) VALUES (?, ?, ?)",
+        ((i, f"Author {i}", f"author {i}") for i in range(5000)),
+    )
+    conn.executemany(
+        "INSERT INTO book_authors VALUES (?, ?, 0)",
+        ((f"{i:013d}", i % 5000) for i in range(books)),
+    )
+    conn.executemany(
+        "INSERT INTO book_categories VALUES (?, ?)",
+        ((f"{i:013d}", CATEGORIES[i % len(CATEGORIES)]) for i in range(books)),
+    )
+    conn.commit()
+    conn.close()
+
+    shelf = []
+    for i in range(books):
+        started = start + timedelta(days=rng.randrange(5000))
+        finished = rng.random() < 0.7
+        ended = started + timedelta(days=rng.randrange(1, 90))
+        shelf.append(
+            (
+                f"{i:013d}",
+                f"reader{rng.randrange(readers)}",
+                to_epoch_day(started),
+                to_epoch_day(ended) if finished else None,
+                "Own",
+                300 if finished else 100,
+                to_epoch_day(ended) if finished else None,
+            )
+        )
+    conn = db._connect(bookshelf_db)
+    conn.executemany(
+        """
+        INSERT INTO bookshelf (isbn, owner, date_started, date_ended, owned, current_page, date_finished)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        shelf,
+    )
+    conn.commit()
+    conn.close()
+
+
+def bench(analytics, repeats: int) -> dict:
+    """Runs every query repeats times without the shared cache."""
+    results = {}
+    for name, query in QUERIES.items():
+        timings = []
+        for _ in range(repeats):
+            analytics_cache.invalidate()
+            started = time.perf_counter()
+            frame = query(analytics)
+            timings.append(time.perf_counter() - started)
+            if isinstance(frame, str):
+                raise RuntimeError(frame)
+        results[name] = (statistics.median(timings), frame)
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        books_db = os.path.join(directory, "books.db")
+        bookshelf_db = os.path.join(directory, "bookshelf.db")
+        print(f"[INFO] Filling {args.books} shelved books for {args.readers} readers")
+        fill(books_db, bookshelf_db, args.books, args.readers)
+
+        backends = {"sqlite": SQLiteAnalytics(books_db, bookshelf_db)}
+        if duckdb is None:
+            print("[WARN] duckdb is not installed, only SQLite is measured")
+        else:
+            snapshot_dir = os.path.join(directory, "snapshot")
+            started = time.perf_counter()
+            export_snapshot(books_db, bookshelf_db, snapshot_dir)
+            print(f"[INFO] Parquet export took {time.perf_counter() - started:.2f}s")
+            backends["duckdb (parquet)"] = DuckDBAnalytics(
+                books_db, bookshelf_db, snapshot_dir
+            )
+            try:
+                backends["duckdb (sqlite)"] = DuckDBAnalytics(books_db, bookshelf_db)
+            except Exception as e:
+                print(f"[WARN] Skipping DuckDB over the SQLite files: {e}")
+
+        results = {name: bench(a, args.repeats) for name, a in backends.items()}
+
+        print(f"{'query':<26}" + "".join(f"{name:>20}" for name in results))
+        for query in QUERIES:
+            print(
+                f"{query:<26}"
+                + "".join(
+                    f"{results[name][query][0] * 1000:>18.1f}ms" for name in results
+                )
+            )
+
+        baseline = results["sqlite"]
+        for name, result in results.items():
+            for query in QUERIES:
+                expected, actual = baseline[query][1], result[query][1]
+                if (
+                    not expected.round(6)
+                    .astype(str)
+                    .equals(actual.round(6).astype(str))
+                ):
+                    print(f"[WARN] {name} disagrees with SQLite on {query}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=200_000)
+    parser.add_argument("--readers", type=int, default=2_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    main(parser.parse_args())
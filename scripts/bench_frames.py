@@ -0,0 +1,100 @@
+"""Benchmark of the typed DataFrame loader.
+
+Loads a synthetic user's bookshelf the way the pages used to, with fetchall(), a
+DataFrame of tuples and astype(), and with utils.frames.load_frame, then reports
+the median latency, the peak memory allocated while loading and the size of the
+resulting frame:
+
+    python scripts/bench_frames.py --books 200000
+"""
+
+import argparse
+import os
+import statistics
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_analytics import fill  # noqa: E402
+from utils.database_funcs import (  # noqa: E402
+    BOOKSHELF_LIST_COLUMNS,
+    BOOKSHELF_LIST_SELECT,
+)
+from utils.frames import COLUMN_LABELS, load_frame  # noqa: E402
+
+# The dtypes the pages applied after building their frames
+LEGACY_DTYPES = {
+    "ISBN": str,
+    "Title": str,
+    "Authors": str,
+    "Publisher": str,
+    "Page Count": int,
+    "Year": int,
+    "Started Reading": "datetime64[ns]",
+    "Finished Reading": "datetime64[ns]",
+    "Owned": "category",
+    "Current Page": int,
+}
+
+
+def legacy(conn: sqlite3.Connection) -> pd.DataFrame:
+    rows = conn.execute(BOOKSHELF_LIST_SELECT).fetchall()
+    frame = pd.DataFrame(
+        rows, columns=[COLUMN_LABELS[column] for column in BOOKSHELF_LIST_COLUMNS]
+    )
+    return frame.astype(LEGACY_DTYPES)
+
+
+def loader(conn: sqlite3.Connection) -> pd.DataFrame:
+    return load_frame(conn, BOOKSHELF_LIST_SELECT)
+
+
+def measure(load, conn: sqlite3.Connection, repeats: int) -> dict:
+    """Times repeats loads, then measures the peak allocation of one more."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        load(conn)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    frame = load(conn)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "peak_mb": peak / 2**20,
+        "frame_mb": frame.memory_usage(deep=True).sum() / 2**20,
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        books_db = os.path.join(directory, "books.db")
+        bookshelf_db = os.path.join(directory, "bookshelf.db")
+        print(f"[INFO] Filling a bookshelf of {args.books} books")
+        # A single reader owns the whole shelf, like one large user's bookshelf
+        fill(books_db, bookshelf_db, args.books, readers=1)
+
+        conn = sqlite3.connect(bookshelf_db)
+        conn.execute("ATTACH DATABASE ? AS books_db", (books_db,))
+        print(f"{'approach':<24}{'median':>12}{'peak alloc':>14}{'frame size':>14}")
+        for name, load in (("fetchall + astype", legacy), ("load_frame", loader)):
+            result = measure(load, conn, args.repeats)
+            print(
+                f"{name:<24}{result['median_ms']:>10.1f}ms"
+                f"{result['peak_mb']:>12.1f}MB{result['frame_mb']:>12.1f}MB"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=200_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    main(parser.parse_args())
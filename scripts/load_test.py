@@ -0,0 +1,107 @@
+"""Load test for the Book Tracker API.
+
+Hammers one endpoint at increasing concurrency levels and reports the throughput
+and latency percentiles of each level:
+
+    uvicorn api:app --port 8000 &
+    python scripts/load_test.py --username alice --password secret
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def get_token(client: httpx.AsyncClient, username: str, password: str) -> str:
+    """Logs in through the API and returns a bearer token."""
+    res = await client.post(
+        "/auth/token", json={"username": username, "password": password}
+    )
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    path: str,
+    deadline: float,
+    latencies: list[float],
+    errors: list[int],
+) -> None:
+    """Sends requests back to back until the deadline."""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            res = await client.get(path)
+            if res.status_code >= 400:
+                errors.append(res.status_code)
+                continue
+        except httpx.HTTPError:
+            errors.append(0)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(
+    client: httpx.AsyncClient, path: str, concurrency: int, duration: float
+) -> dict:
+    """Runs one concurrency level and summarizes it."""
+    latencies: list[float] = []
+    errors: list[int] = []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(worker(client, path, deadline, latencies, errors) for _ in range(concurrency))
+    )
+    elapsed = time.perf_counter() - started
+
+    if len(latencies) >= 2:
+        percentiles = statistics.quantiles(latencies, n=100)
+        p50, p99 = percentiles[49], percentiles[98]
+    else:
+        p50 = p99 = latencies[0] if latencies else float("nan")
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": p50 * 1000,
+        "p99_ms": p99 * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=30
+    ) as client:
+        token = await get_token(client, args.username, args.password)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        print(
+            f"{'concurrency':>11} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+        for concurrency in args.concurrency:
+            result = await run_level(client, args.path, concurrency, args.duration)
+            print(
+                f"{result['concurrency']:>11} {result['requests']:>9} {result['errors']:>7} "
+                f"{result['rps']:>9.1f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Book Tracker API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/bookshelf?limit=50")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32, 64, 128]
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Seconds per level."
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,147 @@
+"""Concurrency stress test for the SQLite database layer.
+
+Simulates N Streamlit sessions hitting the same books.db and bookshelf.db with a
+realistic mix of reads and writes, once per retry policy, and reports throughput,
+latency and how many operations still failed with "database is locked":
+
+    python scripts/stress_test.py --sessions 16 --duration 10
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.database_funcs import BookDatabase, RetryPolicy  # noqa: E402
+
+# Share of each operation in a session's workload
+OPERATION_MIX = {"read": 0.70, "update": 0.22, "insert": 0.08}
+BOOKS_PER_SESSION = 20
+
+POLICIES = {
+    "no retry": RetryPolicy(attempts=1, busy_timeout=0.0),
+    "busy timeout only": RetryPolicy(attempts=1, busy_timeout=0.1),
+    "retry + backoff": RetryPolicy(attempts=8, base_delay=0.01, busy_timeout=0.1),
+}
+
+
+def seed(db: BookDatabase, sessions: int) -> None:
+    """Gives every simulated user a bookshelf to read and update."""
+    for session in range(sessions):
+        for book in range(BOOKS_PER_SESSION):
+            isbn = f"seed-{session}-{book}"
+            db.insert_book(isbn, f"Book {isbn}", "Author", "Publisher", "", 300, 2020)
+            db.add_to_bookshelf(isbn, f"user{session}")
+
+
+def session(
+    db: BookDatabase,
+    session_id: int,
+    deadline: float,
+    results: list[tuple[str, float, bool]],
+) -> None:
+    """Runs one user's mix of operations until the deadline."""
+    rng = random.Random(session_id)
+    username = f"user{session_id}"
+    operations, weights = zip(*OPERATION_MIX.items())
+    inserted = 0
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        if operation == "read":
+            ret = db.get_from_bookshelf(username)
+            locked = isinstance(ret, str) and "locked" in ret
+        elif operation == "update":
+            book = rng.randrange(BOOKS_PER_SESSION)
+            _, ret = db.update_bookshelf(
+                f"seed-{session_id}-{book}",
+                username,
+                "2024-01-01",
+                None,
+                "Owned",
+                rng.randrange(300),
+            )
+            locked = "locked" in ret
+        else:
+            inserted += 1
+            ret = db.insert_book(
+                f"new-{session_id}-{inserted}", "New", "Author", "P", "", 100, 2024
+            )
+            locked = "locked" in ret
+        results.append((operation, time.perf_counter() - start, locked))
+
+
+def run(workdir: str, policy: RetryPolicy, sessions: int, duration: float) -> dict:
+    """Runs all sessions against a fresh copy of the databases with one policy."""
+    db = BookDatabase(
+        os.path.join(workdir, "books.db"),
+        os.path.join(workdir, "bookshelf.db"),
+        policy,
+    )
+    seed(db, sessions)
+
+    results: list[tuple[str, float, bool]] = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=session, args=(db, i, deadline, results))
+        for i in range(sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for _, latency, _ in results]
+    return {
+        "operations": len(results),
+        "ops_per_sec": len(results) / elapsed,
+        "lock_errors": sum(locked for _, _, locked in results),
+        "write_lock_errors": sum(
+            locked for operation, _, locked in results if operation != "read"
+        ),
+        "p99_ms": (
+            statistics.quantiles(latencies, n=100)[98] * 1000
+            if len(latencies) >= 2
+            else float("nan")
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Stress test the SQLite database layer."
+    )
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Seconds per policy."
+    )
+    args = parser.parse_args()
+
+    # The edition index is not what this harness measures
+    BookDatabase.find_editions = lambda *args, **kwargs: []
+
+    print(
+        f"{args.sessions} sessions, {args.duration:.0f}s per policy, mix {OPERATION_MIX}"
+    )
+    print(
+        f"{'policy':<18} {'ops':>7} {'ops/s':>8} {'lock errors':>12} {'(writes)':>9} {'p99 ms':>8}"
+    )
+    for name, policy in POLICIES.items():
+        with tempfile.TemporaryDirectory() as workdir:
+            result = run(workdir, policy, args.sessions, args.duration)
+        print(
+            f"{name:<18} {result['operations']:>7} {result['ops_per_sec']:>8.1f} "
+            f"{result['lock_errors']:>12} {result['write_lock_errors']:>9} {result['p99_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Tests for the books schema migration."""
+
+import sqlite3
+
+from tests.test_bookshelf_migration import make_books
+from utils.database_funcs import BOOKS_SCHEMA_VERSION, BookDatabase
+
+
+def test_first_release_books_are_linked_to_their_authors(tmp_path):
+    books_path = tmp_path / "books.db"
+    make_books(
+        books_path,
+        [
+            (
+                "111",
+                "Good Omens",
+                "Terry Pratchett, Neil Gaiman",
+                "Gollancz",
+                "",
+                288,
+                1990,
+            ),
+            ("222", "Mort", "Terry Pratchett", "Gollancz", "", 272, 1987),
+        ],
+    )
+
+    db = BookDatabase(str(books_path), str(tmp_path / "bookshelf.db"))
+
+    conn = sqlite3.connect(books_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == BOOKS_SCHEMA_VERSION
+    conn.close()
+    # Ordered by year
+    assert [book[0] for book in db.get_books_by_author("Terry Pratchett")] == [
+        "222",
+        "111",
+    ]
+    assert [book[0] for book in db.get_books_by_author("Neil Gaiman")] == ["111"]
+
+
+def test_migration_runs_once(tmp_path):
+    books_path = tmp_path / "books.db"
+    make_books(books_path, [("111", "Mort", "Terry Pratchett", "", "", 272, 1987)])
+    BookDatabase(str(books_path), str(tmp_path / "bookshelf.db"))
+    conn = sqlite3.connect(books_path)
+    conn.execute("DELETE FROM book_authors")
+    conn.commit()
+    conn.close()
+
+    db = BookDatabase(str(books_path), str(tmp_path / "bookshelf.db"))
+
+    assert db.get_books_by_author("Terry Pratchett") == []
@@ -0,0 +1,221 @@
+"""Tests for the bookshelf schema migrations."""
+
+import sqlite3
+
+import pytest
+
+from utils.database_funcs import (
+    BOOKSHELF_SCHEMA_VERSION,
+    BookDatabase,
+    to_epoch_day,
+)
+
+# The bookshelf table as the first release created it, with free-form text dates
+V0_BOOKSHELF = """CREATE TABLE bookshelf (
+                isbn TEXT PRIMARY KEY,
+                owner TEXT,
+                date_started TEXT,
+                date_ended TEXT,
+                owned TEXT,
+                current_page INTEGER
+        )
+        """
+
+# The typed layout before the key included the owner
+V3_BOOKSHELF = """CREATE TABLE bookshelf (
+                isbn TEXT PRIMARY KEY,
+                owner TEXT,
+                date_started INTEGER,
+                date_ended INTEGER,
+                owned TEXT,
+                current_page INTEGER,
+                date_finished INTEGER
+        )
+        """
+
+
+def make_books(path, books: list[tuple]) -> None:
+    """Creates a books file in the first release's layout."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """CREATE TABLE books (
+                isbn TEXT PRIMARY KEY,
+                title TEXT,
+                authors TEXT,
+                publisher TEXT,
+                description TEXT,
+                page_count INTEGER,
+                year INTEGER
+        )
+        """
+    )
+    conn.executemany("INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?)", books)
+    conn.commit()
+    conn.close()
+
+
+def make_bookshelf(path, table: str, rows: list[tuple], version: int) -> None:
+    """Creates a bookshelf file with the given table layout, rows and schema version."""
+    conn = sqlite3.connect(path)
+    conn.execute(table)
+    placeholders = ", ".join("?" * len(rows[0]))
+    conn.executemany(f"INSERT INTO bookshelf VALUES ({placeholders})", rows)
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.commit()
+    conn.close()
+
+
+def shelf_rows(path) -> dict[tuple[str, str], tuple]:
+    """Reads the bookshelf rows by (owner, isbn)."""
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            (row[1], row[0]): row[2:]
+            for row in conn.execute(
+                "SELECT isbn, owner, date_started, date_ended, owned, current_page, date_finished FROM bookshelf"
+            )
+        }
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def books_path(tmp_path):
+    path = tmp_path / "books.db"
+    make_books(
+        path,
+        [
+            ("111", "Dune", "Frank Herbert", "Chilton", "", 400, 1965),
+            ("222", "Emma", "Jane Austen", "Murray", "", 300, 1815),
+            ("333", "Kim", "Rudyard Kipling", "Macmillan", "", 0, 1901),
+        ],
+    )
+    return path
+
+
+def test_v0_file_is_migrated_to_the_current_layout(tmp_path, books_path):
+    shelf_path = tmp_path / "bookshelf.db"
+    make_bookshelf(
+        shelf_path,
+        V0_BOOKSHELF,
+        [
+            # Finished, with real dates
+            ("111", "ann", "2024-01-05", "2024-02-01", "Owned", 400),
+            # Unfinished, with the year-ahead end date and the unquoted default's number
+            ("222", "ann", "2022", "2025-03-01", "Own", 120),
+            # No page count, so never finished
+            ("333", "bob", "not a date", "", "Rented", 10),
+        ],
+        version=0,
+    )
+
+    db = BookDatabase(str(books_path), str(shelf_path))
+
+    conn = sqlite3.connect(shelf_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == BOOKSHELF_SCHEMA_VERSION
+    conn.close()
+    assert shelf_rows(shelf_path) == {
+        ("ann", "111"): (
+            to_epoch_day("2024-01-05"),
+            to_epoch_day("2024-02-01"),
+            "Owned",
+            400,
+            to_epoch_day("2024-02-01"),
+        ),
+        ("ann", "222"): (None, None, "Owned", 120, None),
+        ("bob", "333"): (None, None, "Rented", 10, None),
+    }
+    assert db.get_user_summary("ann") == {
+        "books": 2,
+        "owned": 2,
+        "read_pages": 520,
+        "total_pages": 700,
+    }
+    assert db.get_leaderboard_entry(2024, "ann")[:2] == (1, 400)
+
+
+def test_migrated_dates_read_back_as_iso_dates(tmp_path, books_path):
+    shelf_path = tmp_path / "bookshelf.db"
+    make_bookshelf(
+        shelf_path,
+        V0_BOOKSHELF,
+        [("111", "ann", "2024-01-05T10:00:00", "2024-02-01", "Owned", 400)],
+        version=0,
+    )
+
+    db = BookDatabase(str(books_path), str(shelf_path))
+
+    book = db.get_one_book_bookshelf("111", "ann")
+    assert book[7:11] == ("2024-01-05", "2024-02-01", "Owned", 400)
+
+
+def test_v3_file_is_rekeyed_by_owner_and_isbn(tmp_path, books_path):
+    shelf_path = tmp_path / "bookshelf.db"
+    started = to_epoch_day("2024-03-01")
+    make_bookshelf(
+        shelf_path,
+        V3_BOOKSHELF,
+        [
+            ("111", "ann", started, None, "Owned", 50, None),
+            ("222", "ann", started, None, "Own", 10, None),
+        ],
+        version=3,
+    )
+
+    db = BookDatabase(str(books_path), str(shelf_path))
+
+    assert shelf_rows(shelf_path) == {
+        ("ann", "111"): (started, None, "Owned", 50, None),
+        ("ann", "222"): (started, None, "Owned", 10, None),
+    }
+    conn = sqlite3.connect(shelf_path)
+    key = [
+        column[1]
+        for column in sorted(
+            conn.execute("PRAGMA table_info(bookshelf)"), key=lambda c: c[5]
+        )
+        if column[5]
+    ]
+    conn.close()
+    assert key == ["owner", "isbn"]
+    assert db.get_user_summary("ann")["owned"] == 2
+
+
+def test_two_users_can_shelve_the_same_book(tmp_path, books_path):
+    shelf_path = tmp_path / "bookshelf.db"
+    make_bookshelf(
+        shelf_path,
+        V0_BOOKSHELF,
+        [("111", "ann", "2024-01-05", "2025-01-05", "Owned", 0)],
+        version=0,
+    )
+    db = BookDatabase(str(books_path), str(shelf_path))
+
+    assert "added" in db.add_to_bookshelf("111", "bob")
+
+    assert set(shelf_rows(shelf_path)) == {("ann", "111"), ("bob", "111")}
+    assert db.get_user_summary("bob")["books"] == 1
+    changes = db.changes_since(0)
+    assert {(change["owner"], change["isbn"]) for change in changes["bookshelf"]} == {
+        ("ann", "111"),
+        ("bob", "111"),
+    }
+
+
+def test_migration_runs_once(tmp_path, books_path):
+    shelf_path = tmp_path / "bookshelf.db"
+    make_bookshelf(
+        shelf_path,
+        V0_BOOKSHELF,
+        [("111", "ann", "2024-01-05", "2024-02-01", "Own", 400)],
+        version=0,
+    )
+    BookDatabase(str(books_path), str(shelf_path))
+    conn = sqlite3.connect(shelf_path)
+    conn.execute("UPDATE bookshelf SET owned = 'Own'")
+    conn.commit()
+    conn.close()
+
+    BookDatabase(str(books_path), str(shelf_path))
+
+    assert shelf_rows(shelf_path)[("ann", "111")][2] == "Own"
@@ -0,0 +1,27 @@
+"""Tests for the edition index."""
+
+import sqlite3
+
+from utils.database_funcs import BookDatabase
+from utils.editions import EditionIndex
+
+
+def test_index_follows_changes_made_by_other_processes(tmp_path):
+    books_path = str(tmp_path / "books.db")
+    db = BookDatabase(books_path, str(tmp_path / "bookshelf.db"))
+    db.insert_book("1", "Dune", "Frank Herbert", "Chilton", "", 400, 1965)
+    index = EditionIndex(db)
+    index.build()
+
+    # Writes that never went through this process' BookDatabase
+    conn = sqlite3.connect(books_path)
+    conn.execute(
+        "INSERT INTO books (isbn, title, authors) VALUES ('2', 'Emma', 'Jane Austen')"
+    )
+    conn.execute("DELETE FROM books WHERE isbn = '1'")
+    conn.commit()
+    conn.close()
+
+    assert index.sync()
+    assert [isbn for isbn, _ in index.find("Emma", "Jane Austen")] == ["2"]
+    assert index.find("Dune", "Frank Herbert") == []
@@ -0,0 +1,26 @@
+"""Tests for the database maintenance tasks."""
+
+import os
+import sqlite3
+
+from utils.database_funcs import BookDatabase
+from utils.maintenance import run_maintenance
+
+
+def test_app_files_are_checkpointed(tmp_path):
+    books_path, shelf_path = str(tmp_path / "books.db"), str(tmp_path / "bookshelf.db")
+    db = BookDatabase(books_path, shelf_path)
+    # An open reader keeps the last writer from checkpointing the WAL on close
+    reader = sqlite3.connect(books_path)
+    reader.execute("SELECT COUNT(*) FROM books").fetchone()
+    for book in range(20):
+        db.insert_book(f"{book}", f"Book {book}", "Author", "Publisher", "", 100, 2020)
+    assert os.path.getsize(f"{books_path}-wal") > 0
+
+    report = run_maintenance(books_path, ["wal_checkpoint"])
+    reader.close()
+
+    assert report["before"]["journal_mode"] == "wal"
+    assert report["tasks"][0]["status"] == "ok"
+    assert report["after"]["wal_bytes"] == 0
+    assert run_maintenance(shelf_path, ["wal_checkpoint"])["tasks"][0]["status"] == "ok"
@@ -0,0 +1,428 @@
+"""Reading Analytics."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import pandas as pd
+
+from utils.query_cache import QueryCache
+from utils.snapshot import read_generation
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is optional, the SQLite backend needs nothing extra
+    duckdb = None
+
+# Seconds a Parquet snapshot may lag behind the SQLite files before it is exported again
+SNAPSHOT_MAX_AGE = 15 * 60
+# Tables copied into a Parquet snapshot, with the file they live in
+SNAPSHOT_TABLES = {
+    "books": "books",
+    "book_categories": "books",
+    "book_authors": "books",
+    "authors": "books",
+    "bookshelf": "bookshelf",
+}
+SNAPSHOT_MANIFEST = "snapshot.json"
+# Seconds between two checks of a Parquet snapshot's age
+CHECK_INTERVAL = 60.0
+
+# Aggregates shared by every session of the process, they cover all users' shelves
+analytics_cache = QueryCache(ttl=300.0)
+
+_BACKENDS: dict[tuple, "AnalyticsBackend"] = {}
+_BACKENDS_LOCK = threading.Lock()
+
+# Every backend exposes the bookshelf as `bookshelf` and the catalog tables under
+# `books_db`, so the statements below run on SQLite and DuckDB. Bookshelf dates are
+# days since 1970-01-01, only their conversion to text differs between the engines
+FINISHED_BY_MONTH = """
+    SELECT
+        substr({finished_date}, 1, 7) AS month,
+        COUNT(*) AS books,
+        CAST(SUM(books_db.books.page_count) AS BIGINT) AS pages
+    FROM bookshelf
+    INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+    WHERE bookshelf.date_finished IS NOT NULL {owner_filter}
+    GROUP BY month
+    ORDER BY month
+"""
+
+YEARLY_SUMMARY = """
+    SELECT
+        CAST(substr({finished_date}, 1, 4) AS BIGINT) AS year,
+        COUNT(DISTINCT bookshelf.owner) AS readers,
+        COUNT(*) AS books,
+        CAST(SUM(books_db.books.page_count) AS BIGINT) AS pages,
+        AVG(bookshelf.date_finished - bookshelf.date_started) AS avg_days
+    FROM bookshelf
+    INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+    WHERE bookshelf.date_finished IS NOT NULL
+    GROUP BY 1
+    ORDER BY 1 DESC
+"""
+
+TOP_CATEGORIES = """
+    SELECT
+        books_db.book_categories.category AS category,
+        COUNT(DISTINCT bookshelf.owner) AS readers,
+        COUNT(*) AS books
+    FROM bookshelf
+    INNER JOIN books_db.book_categories
+        ON bookshelf.isbn = books_db.book_categories.isbn
+    WHERE bookshelf.date_finished IS NOT NULL
+    GROUP BY books_db.book_categories.category
+    ORDER BY books DESC, category
+    LIMIT ?
+"""
+
+TOP_AUTHORS = """
+    SELECT
+        books_db.authors.name AS author,
+        COUNT(DISTINCT bookshelf.owner) AS readers,
+        COUNT(*) AS books
+    FROM bookshelf
+    INNER JOIN books_db.book_authors ON bookshelf.isbn = books_db.book_authors.isbn
+    INNER JOIN books_db.authors
+        ON books_db.book_authors.author_id = books_db.authors.author_id
+    WHERE bookshelf.date_finished IS NOT NULL
+    GROUP BY books_db.authors.name
+    ORDER BY books DESC, author
+    LIMIT ?
+"""
+
+
+class AnalyticsBackend(ABC):
+    """
+    Runs the cross-user stats queries of the stats page on one engine.
+
+    Methods:
+        - finished_by_month(owner: Optional[str]) -> pd.DataFrame | str: Books and pages finished per month.
+        - yearly_summary() -> pd.DataFrame | str: Readers, books, pages and average days to finish per year.
+        - top_categories(limit: int) -> pd.DataFrame | str: The categories with the most finished books.
+        - top_authors(limit: int) -> pd.DataFrame | str: The authors with the most finished books.
+    """
+
+    name = "base"
+    # The finish date as "YYYY-MM-DD" text, in the engine's SQL dialect
+    finished_date = ""
+
+    def __init__(self, books_db: str, bookshelf_db: str) -> None:
+        self.books_db = books_db
+        self.bookshelf_db = bookshelf_db
+
+    @abstractmethod
+    def _query(self, sql: str, params: tuple) -> pd.DataFrame:
+        """Runs one query on the engine and returns its rows."""
+
+    def _cached(
+        self, label: str, sql: str, params: tuple = (), cache: bool = True
+    ) -> pd.DataFrame | str:
+        key = (label, self.name, self.books_db, self.bookshelf_db, params)
+        try:
+            if not cache:
+                return self._query(sql, params)
+            return analytics_cache.get_or_load(key, lambda: self._query(sql, params))
+        except Exception as e:
+            return f"An error occurred: {e}\n\t{label}"
+
+    def finished_by_month(self, owner: Optional[str] = None) -> pd.DataFrame | str:
+        """
+        Counts the books and pages finished per month.
+
+        A single user's counts skip the shared cache, so they reflect the user's own
+        updates right away.
+
+        Args:
+            owner (Optional[str]): Only counts this user's books, everyone's if None.
+
+        Returns:
+            pd.DataFrame or str: month ("YYYY-MM"), books and pages columns, or an error message.
+        """
+        if owner is None:
+            return self._cached(
+                "Finished By Month",
+                FINISHED_BY_MONTH.format(
+                    finished_date=self.finished_date, owner_filter=""
+                ),
+            )
+        return self._cached(
+            "Finished By Month",
+            FINISHED_BY_MONTH.format(
+                finished_date=self.finished_date,
+                owner_filter="AND bookshelf.owner = ?",
+            ),
+            (owner,),
+            cache=False,
+        )
+
+    def yearly_summary(self) -> pd.DataFrame | str:
+        """
+        Summarizes every year of finished books across all users, newest first.
+
+        Returns:
+            pd.DataFrame or str: year, readers, books, pages and avg_days columns, or an error message.
+        """
+        return self._cached(
+            "Yearly Summary", YEARLY_SUMMARY.format(finished_date=self.finished_date)
+        )
+
+    def top_categories(self, limit: int = 10) -> pd.DataFrame | str:
+        """
+        Ranks the categories by the number of finished books across all users.
+
+        Args:
+            limit (int): The number of categories to return.
+
+        Returns:
+            pd.DataFrame or str: category, readers and books columns, or an error message.
+        """
+        return self._cached("Top Categories", TOP_CATEGORIES, (limit,))
+
+    def top_authors(self, limit: int = 10) -> pd.DataFrame | str:
+        """
+        Ranks the authors by the number of finished books across all users.
+
+        Args:
+            limit (int): The number of authors to return.
+
+        Returns:
+            pd.DataFrame or str: author, readers and books columns, or an error message.
+        """
+        return self._cached("Top Authors", TOP_AUTHORS, (limit,))
+
+
+class SQLiteAnalytics(AnalyticsBackend):
+    """
+    Runs the stats queries directly on the SQLite files, row at a time on one core.
+    """
+
+    name = "sqlite"
+    finished_date = "date(bookshelf.date_finished * 86400, 'unixepoch')"
+
+    def __init__(
+        self, books_db: str, bookshelf_db: str, busy_timeout: float = 5.0
+    ) -> None:
+        super().__init__(books_db, bookshelf_db)
+        self.busy_timeout = busy_timeout
+
+    def _query(self, sql: str, params: tuple) -> pd.DataFrame:
+        conn = sqlite3.connect(self.bookshelf_db, timeout=self.busy_timeout)
+        try:
+            conn.execute("ATTACH DATABASE ? AS books_db", (self.books_db,))
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+
+def file_generations(books_db: str, bookshelf_db: str) -> tuple[int, int]:
+    """
+    Reads the write generation of both database files.
+
+    Args:
+        books_db (str): The path to the books database file.
+        bookshelf_db (str): The path to the bookshelf database file.
+
+    Returns:
+        tuple[int, int]: The books and bookshelf generations.
+    """
+    generations = []
+    for path in (books_db, bookshelf_db):
+        conn = sqlite3.connect(path)
+        try:
+            generations.append(read_generation(conn))
+        finally:
+            conn.close()
+    return generations[0], generations[1]
+
+
+def export_snapshot(books_db: str, bookshelf_db: str, snapshot_dir: str) -> dict:
+    """
+    Copies the tables the stats queries read into Parquet files, one per table.
+
+    All tables are read in a single read transaction, so the files agree with each
+    other. Each file is written next to its final name and then renamed over it.
+
+    Args:
+        books_db (str): The path to the books database file.
+        bookshelf_db (str): The path to the bookshelf database file.
+        snapshot_dir (str): The directory holding the snapshot.
+
+    Returns:
+        dict: The snapshot manifest, with the write generation of both files and the row counts.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    # Read before the tables, so a write in between only makes the next export come sooner
+    books_generation, bookshelf_generation = file_generations(books_db, bookshelf_db)
+    manifest = {
+        "created": time.time(),
+        "books_generation": books_generation,
+        "bookshelf_generation": bookshelf_generation,
+        "rows": {},
+    }
+    conn = sqlite3.connect(bookshelf_db)
+    duck = duckdb.connect()
+    try:
+        conn.execute("ATTACH DATABASE ? AS books_db", (books_db,))
+        conn.execute("BEGIN")
+        for table, source in SNAPSHOT_TABLES.items():
+            schema = "books_db" if source == "books" else "main"
+            frame = pd.read_sql_query(f"SELECT * FROM {schema}.{table}", conn)
+            path = os.path.join(snapshot_dir, f"{table}.parquet")
+            duck.register("frame", frame)
+            duck.execute(
+                f"COPY frame TO {_literal(path + '.partial')} (FORMAT parquet)"
+            )
+            duck.unregister("frame")
+            os.replace(path + ".partial", path)
+            manifest["rows"][table] = len(frame)
+        conn.rollback()
+    finally:
+        duck.close()
+        conn.close()
+    with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def _literal(value: str) -> str:
+    """Quotes a path for the DuckDB statements that can't bind it as a parameter."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+class DuckDBAnalytics(AnalyticsBackend):
+    """
+    Runs the stats queries on an in-process DuckDB engine, vectorized and on every core.
+
+    With a snapshot_dir the engine reads Parquet snapshots of the tables, exported
+    again once they are SNAPSHOT_MAX_AGE seconds old and the SQLite files have
+    changed. Without one it attaches the SQLite files read-only through DuckDB's
+    sqlite extension and always sees the latest data.
+    """
+
+    name = "duckdb"
+    # Parquet snapshots hold the nullable day counts as doubles
+    finished_date = (
+        "CAST(DATE '1970-01-01' + CAST(bookshelf.date_finished AS INTEGER) AS VARCHAR)"
+    )
+
+    def __init__(
+        self,
+        books_db: str,
+        bookshelf_db: str,
+        snapshot_dir: Optional[str] = None,
+        threads: Optional[int] = None,
+    ) -> None:
+        super().__init__(books_db, bookshelf_db)
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._conn = duckdb.connect()
+        if threads:
+            self._conn.execute(f"SET threads = {int(threads)}")
+        if snapshot_dir:
+            self._refresh_snapshot()
+            self._conn.execute("CREATE SCHEMA books_db")
+            for table, source in SNAPSHOT_TABLES.items():
+                view = f"books_db.{table}" if source == "books" else table
+                path = os.path.join(snapshot_dir, f"{table}.parquet")
+                self._conn.execute(
+                    f"CREATE VIEW {view} AS SELECT * FROM read_parquet({_literal(path)})"
+                )
+        else:
+            self._conn.execute(
+                f"ATTACH {_literal(books_db)} AS books_db (TYPE sqlite, READ_ONLY)"
+            )
+            self._conn.execute(
+                f"ATTACH {_literal(bookshelf_db)} AS shelf_db (TYPE sqlite, READ_ONLY)"
+            )
+            self._conn.execute(
+                "CREATE VIEW bookshelf AS SELECT * FROM shelf_db.bookshelf"
+            )
+
+    def _refresh_snapshot(self) -> None:
+        """Exports the snapshot if it is missing, or too old and behind the SQLite files."""
+        manifest_path = os.path.join(self.snapshot_dir, SNAPSHOT_MANIFEST)
+        with self._lock:
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                if time.time() - manifest["created"] < SNAPSHOT_MAX_AGE:
+                    return
+                if file_generations(self.books_db, self.bookshelf_db) == (
+                    manifest["books_generation"],
+                    manifest["bookshelf_generation"],
+                ):
+                    return
+            export_snapshot(self.books_db, self.bookshelf_db, self.snapshot_dir)
+
+    def _query(self, sql: str, params: tuple) -> pd.DataFrame:
+        if self.snapshot_dir and time.monotonic() - self._checked > CHECK_INTERVAL:
+            self._checked = time.monotonic()
+            self._refresh_snapshot()
+        # A cursor is a separate connection to the same engine, safe to use per thread
+        cursor = self._conn.cursor()
+        try:
+            return cursor.execute(sql, list(params)).df()
+        finally:
+            cursor.close()
+
+
+def get_analytics(
+    books_db: str,
+    bookshelf_db: str,
+    backend: str = "sqlite",
+    snapshot_dir: Optional[str] = None,
+) -> AnalyticsBackend:
+    """
+    Returns the process-wide analytics backend for the database files.
+
+    Falls back to SQLite when DuckDB is requested but not installed or can't open the files.
+
+    Args:
+        books_db (str): The path to the books database file.
+        bookshelf_db (str): The path to the bookshelf database file.
+        backend (str): "sqlite" or "duckdb".
+        snapshot_dir (Optional[str]): Where DuckDB keeps its Parquet snapshots, None to attach the SQLite files.
+
+    Returns:
+        AnalyticsBackend: The backend.
+    """
+    key = (books_db, bookshelf_db, backend, snapshot_dir)
+    with _BACKENDS_LOCK:
+        if key not in _BACKENDS:
+            analytics: AnalyticsBackend = SQLiteAnalytics(books_db, bookshelf_db)
+            if backend == "duckdb":
+                if duckdb is None:
+                    print("[WARN] duckdb is not installed, using SQLite for analytics")
+                else:
+                    try:
+                        analytics = DuckDBAnalytics(
+                            books_db, bookshelf_db, snapshot_dir
+                        )
+                    except Exception as e:
+                        print(f"[WARN] DuckDB analytics unavailable, using SQLite: {e}")
+            _BACKENDS[key] = analytics
+        return _BACKENDS[key]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Export the Parquet snapshot read by the DuckDB analytics backend."
+    )
+    parser.add_argument("snapshot_dir")
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    args = parser.parse_args()
+
+    if duckdb is None:
+        raise SystemExit("Install duckdb to export analytics snapshots.")
+    manifest = export_snapshot(args.books_db, args.bookshelf_db, args.snapshot_dir)
+    print(f"[INFO] Exported {manifest['rows']} rows to {args.snapshot_dir}")
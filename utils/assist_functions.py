@@ -1,41 +1,103 @@
 # flake8: noqa
 """Assistance Functions."""
+import hashlib
+import io
+import os
+import threading
 import time
 
-import requests
 import streamlit as st
 from PIL import Image
 from pyzbar.pyzbar import decode  # type: ignore
 from requests.exceptions import HTTPError
 
+from utils.http_client import CircuitOpenError, get_client
+from utils.query_cache import QueryCache
+from utils.rate_limit import DAILY_QUOTA, QUOTA_DB, QuotaExceededError, get_limiter
+
 GOOGLE_BOOKS_API_KEY = st.secrets["GOOGLE_BOOKS_API_KEY"]
+GOOGLE_BOOKS_URL = "https://www.googleapis.com/books/v1/volumes"
+# Only the volume fields kept below are requested, the rest of the payload is never sent
+GOOGLE_BOOKS_FIELDS = (
+    "items(volumeInfo(title,authors,publisher,publishedDate,description,pageCount,"
+    "categories,averageRating,imageLinks/thumbnail,infoLink))"
+)
+# Daily Google Books quota of the API key, shared by every session and replica
+GOOGLE_BOOKS_DAILY_QUOTA = st.secrets.get("GOOGLE_BOOKS_DAILY_QUOTA", DAILY_QUOTA)
+
+# Scan and lookup results kept per session, so reruns of the scan page reuse them
+SCAN_MEMO_ENTRIES = 32
+SCAN_MEMO_TTL = 1800.0
+
+# Covers downloaded by any process, an empty file marks a book Open Library has no cover for
+COVER_DIR = "covers"
+# Cover images already downloaded by this process, keyed by ISBN
+_COVER_CACHE: dict[str, bytes | None] = {}
+_COVER_CACHE_LOCK = threading.Lock()
+
+
+def google_books_limiter():
+    """Get the Google Books Rate Limiter.
+
+    Returns:
+        RateLimiter: The limiter every Google Books call of the app goes through.
+    """
+    return get_limiter(
+        "google_books",
+        st.secrets.get("QUOTA_DB", QUOTA_DB),
+        daily_quota=GOOGLE_BOOKS_DAILY_QUOTA,
+    )
 
 
-def get_basic_info(isbn: str) -> dict | None:
+def get_basic_info(isbn: str, priority: str = "interactive") -> dict | None:
     """Get a Book's Basic Information.
 
-    Retrieves book information based on the provided ISBN.
+    Retrieves book information based on the provided ISBN. Each lookup spends a
+    token of the shared Google Books budget, background work should pass "bulk"
+    so it never starves the scans users are waiting on.
 
     Parameters:
         isbn (str): The ISBN of the book.
+        priority (str): "interactive" or "bulk".
     Returns:
-        dict: A dictionary containing the book information.
+        dict: A dictionary containing the book information, with an empty "Title"
+        if Google Books has no book with this ISBN. None if the lookup failed (the
+        budget is spent, or the request failed), so it is worth trying again later.
 
     """
     book_info_unclean = {}
-    query = f"isbn:{isbn}"
-    url = f"https://www.googleapis.com/books/v1/volumes?q={query}&key={GOOGLE_BOOKS_API_KEY}&country=MX"
+    params = {
+        "q": f"isbn:{isbn}",
+        "key": GOOGLE_BOOKS_API_KEY,
+        "country": "MX",
+        "maxResults": 1,
+        "fields": GOOGLE_BOOKS_FIELDS,
+    }
     try:
-        res = requests.get(url)
-        if res.status_code == 200:
-            print("[INFO] Found a book's information!")
-            data = res.json()
-            if "items" in data:
-                book_info_unclean = data["items"][0]["volumeInfo"]
+        google_books_limiter().acquire(priority)
+    except QuotaExceededError as e:
+        st.warning(f"Google Books lookups are paused. {e}")
+        return None
+    try:
+        res = get_client().get(GOOGLE_BOOKS_URL, params=params)
+        if res.status_code != 200:
+            st.warning(
+                f"Google Books answered with HTTP {res.status_code}, try again shortly."
+            )
+            return None
+        print("[INFO] Found a book's information!")
+        data = res.json()
+        if "items" in data:
+            book_info_unclean = data["items"][0]["volumeInfo"]
+    except CircuitOpenError as e:
+        st.warning(f"Google Books is not responding, try again shortly. {e}")
+        return None
     except HTTPError as http_err:
         st.error(f"HTTP error occurred: {http_err}")
+        return None
     except Exception as e:
         st.error(f"An error occurred: {e}")
+        return None
 
     book_info = {
         "Title": book_info_unclean.get("title", ""),
@@ -46,12 +108,79 @@ def get_basic_info(isbn: str) -> dict | None:
         "pageCount": book_info_unclean.get("pageCount", ""),
         "categories": book_info_unclean.get("categories", []),
         "averageRating": book_info_unclean.get("averageRating", ""),
-        "thumbnail": book_info_unclean.get("thumbnail", ""),
+        "thumbnail": book_info_unclean.get("imageLinks", {}).get("thumbnail", ""),
         "infoLink": book_info_unclean.get("infoLink", ""),
     }
     return book_info
 
 
+def _cover_path(isbn: str) -> str:
+    return os.path.join(COVER_DIR, "".join(c for c in isbn if c.isalnum()) + ".jpg")
+
+
+def has_cached_cover(isbn: str) -> bool:
+    """Check for a Downloaded Cover.
+
+    Parameters:
+        isbn (str): The ISBN of the book.
+    Returns:
+        bool: True if get_cover can answer without calling Open Library.
+    """
+    with _COVER_CACHE_LOCK:
+        if isbn in _COVER_CACHE:
+            return True
+    return os.path.exists(_cover_path(isbn))
+
+
+def get_cover(isbn: str) -> bytes | None:
+    """Get a Book's Cover.
+
+    Downloads the medium-sized Open Library cover for the ISBN. Covers and missing
+    covers (404) are kept in a process-wide cache and in COVER_DIR, which every
+    process and the job workers share, so each cover is fetched once. Failed
+    requests (429, 5xx, network errors) are not kept and are tried again next time.
+
+    Parameters:
+        isbn (str): The ISBN of the book.
+    Returns:
+        bytes | None: The cover image, or None if Open Library has no cover for it or
+        could not be reached; has_cached_cover tells the two apart.
+    """
+    with _COVER_CACHE_LOCK:
+        if isbn in _COVER_CACHE:
+            return _COVER_CACHE[isbn]
+
+    path = _cover_path(isbn)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            cover = f.read() or None
+        with _COVER_CACHE_LOCK:
+            _COVER_CACHE[isbn] = cover
+        return cover
+
+    url = f"https://covers.openlibrary.org/b/isbn/{isbn}-M.jpg"
+    try:
+        res = get_client().get(url, params={"default": "false"})
+    except Exception as e:
+        print(f"[WARN] Could not fetch the cover for {isbn}: {e}")
+        return None
+
+    if res.status_code not in (200, 404):
+        print(f"[WARN] Could not fetch the cover for {isbn}: HTTP {res.status_code}")
+        return None
+
+    cover = res.content if res.status_code == 200 else None
+    # Written next to the target and renamed, so readers never see half a file
+    os.makedirs(COVER_DIR, exist_ok=True)
+    partial = f"{path}.{os.getpid()}.partial"
+    with open(partial, "wb") as f:
+        f.write(cover or b"")
+    os.replace(partial, path)
+    with _COVER_CACHE_LOCK:
+        _COVER_CACHE[isbn] = cover
+    return cover
+
+
 def scan_barcode(image: Image) -> str | None:  # type: ignore
     """Scan Barcode.
 
@@ -68,3 +197,57 @@ def scan_barcode(image: Image) -> str | None:  # type: ignore
         barcode_data = barcode.data.decode("utf-8")
         return barcode_data
     return None
+
+
+def _scan_memo() -> QueryCache:
+    """Returns the session's memo of scan and lookup results, created on first use."""
+    if "scan_memo" not in st.session_state:
+        st.session_state["scan_memo"] = QueryCache(
+            ttl=SCAN_MEMO_TTL, max_entries=SCAN_MEMO_ENTRIES
+        )
+    return st.session_state["scan_memo"]
+
+
+def scan_barcode_memo(image_bytes: bytes) -> str | None:
+    """Scan Barcode, Memoized.
+
+    Decodes the image with scan_barcode once per session and reuses the result
+    while the same image stays uploaded, keyed by the SHA-256 of its bytes.
+
+    Args:
+        image_bytes (bytes): The encoded barcode image, as uploaded.
+
+    Returns:
+        The decoded barcode data as a string, or None if no barcode is found.
+    """
+    memo = _scan_memo()
+    key = ("barcode", hashlib.sha256(image_bytes).hexdigest())
+    # Results are wrapped in a tuple so that "no barcode" is cached as well
+    hit = memo.get(key)
+    if hit is None:
+        hit = (scan_barcode(Image.open(io.BytesIO(image_bytes))),)
+        memo.set(key, hit)
+    return hit[0]
+
+
+def get_basic_info_memo(isbn: str) -> dict | None:
+    """Get a Book's Basic Information, Memoized.
+
+    Calls get_basic_info once per ISBN and session. Found books and ISBNs Google
+    Books doesn't know are kept, failed lookups are not, so the next rerun tries
+    again. The least recently used results are evicted past SCAN_MEMO_ENTRIES, and
+    all expire after SCAN_MEMO_TTL.
+
+    Parameters:
+        isbn (str): The ISBN of the book.
+    Returns:
+        dict: A dictionary containing the book information, or None if the lookup failed.
+    """
+    memo = _scan_memo()
+    key = ("info", isbn.strip())
+    book_info = memo.get(key)
+    if book_info is None:
+        book_info = get_basic_info(isbn.strip())
+        if book_info is not None:
+            memo.set(key, book_info)
+    return book_info
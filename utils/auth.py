@@ -1,13 +1,19 @@
 # flake8: noqa
 """"Authentication utilities for user registration, login, and logout."""
 
+import hashlib
 import os
+import secrets
 import sqlite3
+from datetime import datetime, timedelta
 
 import bcrypt
 import streamlit as st
 from pydantic.dataclasses import dataclass
 
+# How long an API token stays valid after it was issued
+TOKEN_LIFETIME = timedelta(days=30)
+
 
 @dataclass
 class Authenticator:
@@ -20,7 +26,7 @@ class Authenticator:
     Methods:
         __post_init__(): Initializes the Authenticator object and validates the existence of the database.
         validate_db_existance(): Checks if the database file exists and initializes it if not.
-        init_db(db_name: str) -> str: Initializes the database by creating the 'users' table.
+        init_db(db_name: str) -> str: Initializes the database by creating the 'users' and 'tokens' tables.
         hash_password(password): Hashes a password using bcrypt.
         check_password(hashed_password, plain_password): Checks if a plain password matches a hashed password.
         register_user(username, password): Registers a new user by inserting their username and hashed password into the database.
@@ -28,6 +34,9 @@ class Authenticator:
         logout(): Logs out the current user by resetting the session state.
         is_logged_in(): Checks if a user is currently logged in.
         init_session(): Initializes the session by setting the initial session state.
+        issue_token(username): Issues a new API token for a user.
+        verify_token(token): Returns the user an API token belongs to.
+        revoke_token(token): Revokes an API token.
     """
 
     db_name: str = os.path.join(os.path.dirname(__file__), "..", "users.db")
@@ -42,6 +51,7 @@ class Authenticator:
         Returns:
             None
         """
+        self.init_db(self.db_name)  # Always initialize the tables
         self.validate_db_existance()
 
     def validate_db_existance(self) -> None:
@@ -67,9 +77,13 @@ class Authenticator:
         conn = sqlite3.connect(self.db_name)
         c = conn.cursor()
         try:
+            c.execute("PRAGMA journal_mode=WAL")
             c.execute(
                 """CREATE TABLE IF NOT EXISTS users (username TEXT, password TEXT)"""
             )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS tokens (token_hash TEXT PRIMARY KEY, username TEXT, expires_at TEXT)"""
+            )
             conn.commit()
             return "Database initialized."
         except Exception as e:
@@ -113,13 +127,21 @@ class Authenticator:
             password (str): The password of the user.
 
         Returns:
-            str: A success message if the user is registered successfully,
-                 or an error message if an exception occurs during the registration process.
+            str: A success message if the user is registered successfully, a message saying
+                 the username is taken, or an error message if an exception occurs during the
+                 registration process.
         """
         hashed_pw = self.hash_password(password)
         conn = sqlite3.connect(self.db_name)
         c = conn.cursor()
         try:
+            # The users table has no unique constraint, so the check and the insert share
+            # one write transaction to keep two registrations from both claiming a name
+            c.execute("BEGIN IMMEDIATE")
+            c.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+            if c.fetchone():
+                conn.rollback()
+                return "Username already exists."
             c.execute(
                 "INSERT INTO users (username, password) VALUES (?, ?)",
                 (username, hashed_pw),
@@ -187,3 +209,84 @@ class Authenticator:
         """
         if "logged_in" not in st.session_state:
             st.session_state["logged_in"] = False
+
+    # API tokens
+    def _hash_token(self, token: str) -> str:
+        """Only token digests are stored, so a leaked users.db can't be replayed."""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def issue_token(self, username: str) -> str:
+        """
+        Issues a new API token for the user.
+
+        Args:
+            username (str): The user the token authenticates.
+
+        Returns:
+            str: The token, or an error message if it couldn't be stored.
+        """
+        token = secrets.token_urlsafe(32)
+        expires_at = (datetime.now() + TOKEN_LIFETIME).isoformat(timespec="seconds")
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        try:
+            c.execute(
+                "INSERT INTO tokens (token_hash, username, expires_at) VALUES (?, ?, ?)",
+                (self._hash_token(token), username, expires_at),
+            )
+            conn.commit()
+            return token
+        except Exception as e:
+            return f"An error occurred: {e}"
+        finally:
+            conn.close()
+
+    def verify_token(self, token: str) -> str | None:
+        """
+        Looks up the user an API token belongs to.
+
+        Args:
+            token (str): The token sent by the client.
+
+        Returns:
+            str | None: The username, or None if the token is unknown or expired.
+        """
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        try:
+            c.execute(
+                "SELECT username FROM tokens WHERE token_hash = ? AND expires_at > ?",
+                (
+                    self._hash_token(token),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+            result = c.fetchone()
+            return result[0] if result else None
+        except Exception:
+            return None
+        finally:
+            conn.close()
+
+    def revoke_token(self, token: str) -> str:
+        """
+        Revokes an API token.
+
+        Args:
+            token (str): The token to revoke.
+
+        Returns:
+            str: A message indicating whether the token was revoked.
+        """
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        try:
+            c.execute(
+                "DELETE FROM tokens WHERE token_hash = ?", (self._hash_token(token),)
+            )
+            conn.commit()
+            return "Token revoked successfully."
+        except Exception as e:
+            return f"An error occurred: {e}"
+        finally:
+            conn.close()
@@ -0,0 +1,48 @@
+"""Author Index Backfill."""
+
+from utils.database_funcs import BookDatabase
+
+# Books linked per transaction, so the backfill never holds the write lock for long
+BATCH_SIZE = 1000
+
+
+def backfill_authors(db: BookDatabase, batch_size: int = BATCH_SIZE) -> str:
+    """
+    Links every book added before the author index existed to its authors.
+
+    Books are processed in ISBN order, one batch per transaction, so the job can be
+    stopped and restarted at any time and runs alongside the app.
+
+    Args:
+        db (BookDatabase): The database holding the catalog.
+        batch_size (int): The number of books linked per transaction.
+
+    Returns:
+        str: A message indicating the success or failure of the backfill.
+    """
+    after, total = "", 0
+    while True:
+        batch = db.link_missing_authors(after, batch_size)
+        if isinstance(batch, str):
+            return batch
+        count, after = batch
+        total += count
+        if count < batch_size:
+            return f"Linked the authors of {total} books."
+        print(f"[INFO] Linked the authors of {total} books so far...")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backfill the author index.")
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(
+        backfill_authors(
+            BookDatabase(args.books_db, args.bookshelf_db), args.batch_size
+        )
+    )
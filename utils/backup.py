@@ -0,0 +1,449 @@
+"""Online Backup and Restore."""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+BACKUP_DIR = "backups"
+# Pages copied per backup step, the source is unlocked between two steps
+PAGES_PER_STEP = 256
+# Seconds to pause between two steps so writers get the lock in between
+STEP_PAUSE = 0.005
+# A stepped copy taking this many times its expected steps gives up the attempt
+RESTART_FACTOR = 4
+# Times a set is copied again when a file changed while the others were copied
+MAX_ATTEMPTS = 3
+# Retention: the latest backups are always kept, older ones one per day
+KEEP_LAST = 7
+KEEP_DAILY = 30
+
+MANIFEST = "manifest.json"
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _data_version(conn: sqlite3.Connection) -> int:
+    """Returns a counter that moves whenever another connection commits to the file."""
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _counters(conn: sqlite3.Connection) -> tuple[Optional[int], Optional[int]]:
+    """Returns a file's write generation and highest change log sequence number, None where it has none."""
+    tables = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    generation = seq = None
+    if "write_generation" in tables:
+        generation = conn.execute(
+            "SELECT COALESCE(MAX(generation), 0) FROM write_generation"
+        ).fetchone()[0]
+    if "change_log" in tables:
+        # The AUTOINCREMENT counter also covers entries that were pruned
+        seq = conn.execute(
+            """
+            SELECT MAX(
+                COALESCE((SELECT MAX(seq) FROM change_log), 0),
+                COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)
+            )
+            """
+        ).fetchone()[0]
+    return generation, seq
+
+
+def _advance_counters(
+    conn: sqlite3.Connection, generation: Optional[int], seq: Optional[int]
+) -> None:
+    """
+    Moves a restored file's counters past the values the replaced file had reached.
+
+    The restored file carries the older generation and change log, so snapshots keyed
+    by a generation they saw before could match again, and sync cursors handed out
+    since the backup would look current. The generation is bumped past both files'
+    values, and a "reset" entry is logged after every sequence number the replaced
+    file gave out, which changes_since answers with a reset.
+    """
+    restored_generation, restored_seq = _counters(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    if restored_generation is not None:
+        conn.execute(
+            "UPDATE write_generation SET generation = ? WHERE id = 1",
+            (max(restored_generation, generation or 0) + 1,),
+        )
+    if restored_seq is not None:
+        conn.execute(
+            "INSERT INTO change_log (seq, table_name, op) VALUES (?, 'restore', 'reset')",
+            (max(restored_seq, seq or 0) + 1,),
+        )
+    conn.execute("COMMIT")
+
+
+class _CopyRestarting(Exception):
+    """Raised to abandon a stepped copy that keeps restarting under constant writes."""
+
+
+def _copy(source: sqlite3.Connection, target_path: str, stepped: bool = True) -> None:
+    """
+    Copies a live database with the sqlite3 backup API.
+
+    A stepped copy unlocks the source between steps. A write by another connection
+    restarts it, so it gives up with _CopyRestarting once it has taken more than
+    RESTART_FACTOR times the steps it needs.
+    """
+    steps = 0
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal steps
+        steps += 1
+        if steps > RESTART_FACTOR * (total // PAGES_PER_STEP + 1):
+            raise _CopyRestarting()
+        time.sleep(STEP_PAUSE)
+
+    target = sqlite3.connect(target_path)
+    try:
+        if stepped:
+            source.backup(
+                target, pages=PAGES_PER_STEP, progress=progress, sleep=STEP_PAUSE
+            )
+        else:
+            source.backup(target, sleep=STEP_PAUSE)
+    finally:
+        target.close()
+
+
+def _copy_set(sources: dict[str, sqlite3.Connection], path: str) -> bool:
+    """Copies every file in steps, returning whether none changed during the copy."""
+    versions = {file_name: _data_version(conn) for file_name, conn in sources.items()}
+    try:
+        for file_name, conn in sources.items():
+            _copy(conn, os.path.join(path, file_name))
+    except _CopyRestarting:
+        return False
+    return all(
+        _data_version(conn) == versions[file_name]
+        for file_name, conn in sources.items()
+    )
+
+
+def _copy_set_locked(
+    files: dict[str, str],
+    sources: dict[str, sqlite3.Connection],
+    path: str,
+    busy_timeout: float,
+) -> None:
+    """Copies every file in one pass while other connections hold all their write locks."""
+    # The backup API cannot read from a connection with an open write transaction
+    lockers = [
+        sqlite3.connect(files[file_name], timeout=busy_timeout) for file_name in sources
+    ]
+    try:
+        for locker in lockers:
+            locker.execute("BEGIN IMMEDIATE")
+        for file_name, conn in sources.items():
+            _copy(conn, os.path.join(path, file_name), stepped=False)
+    finally:
+        for locker in lockers:
+            locker.rollback()
+            locker.close()
+
+
+def create_backup(
+    files: dict[str, str], backup_dir: str = BACKUP_DIR, busy_timeout: float = 5.0
+) -> str:
+    """
+    Takes an online backup of several database files as one consistent set.
+
+    Each file is copied in steps, so readers and writers are only paused for one
+    step at a time. Once every file is copied, their data versions are compared with
+    the ones read before the copy started. If any file changed in the meantime, the
+    set is copied again, so the files always match each other. If writes keep coming
+    for MAX_ATTEMPTS copies, a last pass holds all the files' write locks while it
+    copies them: readers carry on, writers wait up to their busy timeout.
+
+    Args:
+        files (dict[str, str]): The database files to back up, by name, e.g. {"books.db": "books.db"}.
+        backup_dir (str): The directory holding the backups.
+        busy_timeout (float): Seconds to wait for other connections' locks.
+
+    Returns:
+        str: The path of the new backup, or an error message.
+    """
+    name = datetime.now().strftime(TIMESTAMP_FORMAT)
+    while os.path.exists(os.path.join(backup_dir, name)):
+        # Backups are named by the second they were taken in
+        time.sleep(0.1)
+        name = datetime.now().strftime(TIMESTAMP_FORMAT)
+    final_path = os.path.join(backup_dir, name)
+    partial_path = os.path.join(backup_dir, f".partial-{name}")
+    os.makedirs(partial_path, exist_ok=True)
+
+    sources = {
+        file_name: sqlite3.connect(path, timeout=busy_timeout)
+        for file_name, path in files.items()
+    }
+    try:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            if _copy_set(sources, partial_path):
+                break
+        else:
+            attempt += 1
+            _copy_set_locked(files, sources, partial_path, busy_timeout)
+    except Exception as e:
+        shutil.rmtree(partial_path, ignore_errors=True)
+        return f"An error occurred: {e}\n\tCreate Backup"
+    finally:
+        for conn in sources.values():
+            conn.close()
+
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "consistent": True,
+        "attempts": attempt,
+        "files": {
+            file_name: {
+                "source": os.path.abspath(path),
+                "size": os.path.getsize(os.path.join(partial_path, file_name)),
+                "sha256": _sha256(os.path.join(partial_path, file_name)),
+            }
+            for file_name, path in files.items()
+        },
+    }
+    with open(os.path.join(partial_path, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2)
+    # The backup only becomes visible once it is complete
+    os.rename(partial_path, final_path)
+    return final_path
+
+
+def list_backups(backup_dir: str = BACKUP_DIR) -> list[tuple[datetime, str]]:
+    """
+    Lists the complete backups, oldest first.
+
+    Args:
+        backup_dir (str): The directory holding the backups.
+
+    Returns:
+        list[tuple[datetime, str]]: The time each backup was taken and its path.
+    """
+    if not os.path.isdir(backup_dir):
+        return []
+    backups = []
+    for name in os.listdir(backup_dir):
+        path = os.path.join(backup_dir, name)
+        try:
+            taken_at = datetime.strptime(name, TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            backups.append((taken_at, path))
+    return sorted(backups)
+
+
+def verify_backup(path: str) -> list[str]:
+    """
+    Checks a backup against its manifest and runs an integrity check on every file.
+
+    Args:
+        path (str): The path of the backup.
+
+    Returns:
+        list[str]: The problems found, empty if the backup can be restored.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST)) as file:
+            manifest = json.load(file)
+    except Exception as e:
+        return [f"unreadable manifest: {e}"]
+
+    problems = []
+    if not manifest.get("consistent", False):
+        problems.append("the files were still changing when the backup was taken")
+    for file_name, expected in manifest["files"].items():
+        file_path = os.path.join(path, file_name)
+        if not os.path.exists(file_path):
+            problems.append(f"{file_name}: missing")
+            continue
+        if _sha256(file_path) != expected["sha256"]:
+            problems.append(f"{file_name}: checksum mismatch")
+            continue
+        conn = sqlite3.connect(f"file:{file_path}?mode=ro", uri=True)
+        try:
+            result = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        finally:
+            conn.close()
+        if result != ["ok"]:
+            problems.append(f"{file_name}: {'; '.join(result[:5])}")
+    return problems
+
+
+def find_backup(
+    at: Optional[datetime] = None, backup_dir: str = BACKUP_DIR
+) -> Optional[str]:
+    """
+    Finds the latest backup taken at or before a point in time.
+
+    Args:
+        at (Optional[datetime]): The point in time, the latest backup if None.
+        backup_dir (str): The directory holding the backups.
+
+    Returns:
+        Optional[str]: The path of the backup, or None if there is none that old.
+    """
+    candidates = [
+        path
+        for taken_at, path in list_backups(backup_dir)
+        if at is None or taken_at <= at
+    ]
+    return candidates[-1] if candidates else None
+
+
+def restore_backup(
+    path: str,
+    files: dict[str, str],
+    backup_dir: str = BACKUP_DIR,
+    busy_timeout: float = 5.0,
+) -> str:
+    """
+    Restores a verified backup over the live database files.
+
+    The backup is verified first, and the current files are backed up before being
+    replaced. Each file is written in a single backup step, so connections to it see
+    either the old or the restored contents, never a mix. Its write generation and
+    change log are then moved past the replaced file's, so caches refresh and sync
+    clients read everything again.
+
+    Args:
+        path (str): The path of the backup to restore.
+        files (dict[str, str]): The live database files, by name, as given to create_backup.
+        backup_dir (str): The directory for the safety backup of the current files.
+        busy_timeout (float): Seconds to wait for other connections' locks.
+
+    Returns:
+        str: A message indicating the success or failure of the restore.
+    """
+    problems = verify_backup(path)
+    if problems:
+        return (
+            "The backup failed verification, nothing was restored:\n\t"
+            + "\n\t".join(problems)
+        )
+
+    safety = create_backup(files, backup_dir, busy_timeout)
+    if safety.startswith("An error occurred"):
+        return f"Could not back up the current files, nothing was restored:\n\t{safety}"
+
+    for file_name, live_path in files.items():
+        source = sqlite3.connect(
+            f"file:{os.path.join(path, file_name)}?mode=ro", uri=True
+        )
+        target = sqlite3.connect(live_path, timeout=busy_timeout, isolation_level=None)
+        try:
+            replaced = _counters(target)
+            source.backup(target)
+            _advance_counters(target, *replaced)
+        except Exception as e:
+            return f"An error occurred: {e}\n\tRestore Backup (current files saved in {safety})"
+        finally:
+            source.close()
+            target.close()
+    return f"Restored {path}. The previous files were saved in {safety}."
+
+
+def prune_backups(
+    backup_dir: str = BACKUP_DIR,
+    keep_last: int = KEEP_LAST,
+    keep_daily: int = KEEP_DAILY,
+    now: Optional[datetime] = None,
+) -> list[str]:
+    """
+    Deletes the backups that fall outside the retention policy.
+
+    The keep_last most recent backups are always kept. Of the older ones, the latest
+    backup of each day is kept for keep_daily days, everything else is deleted.
+
+    Args:
+        backup_dir (str): The directory holding the backups.
+        keep_last (int): The number of most recent backups always kept.
+        keep_daily (int): The number of days for which one backup per day is kept.
+        now (Optional[datetime]): The current time, for testing.
+
+    Returns:
+        list[str]: The paths of the deleted backups.
+    """
+    backups = list_backups(backup_dir)
+    cutoff = (now or datetime.now()) - timedelta(days=keep_daily)
+    kept_days = set()
+    deleted = []
+    for index, (taken_at, path) in enumerate(reversed(backups)):
+        if index < keep_last:
+            kept_days.add(taken_at.date())
+            continue
+        if taken_at >= cutoff and taken_at.date() not in kept_days:
+            kept_days.add(taken_at.date())
+            continue
+        shutil.rmtree(path)
+        deleted.append(path)
+    return deleted
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Back up and restore the database files."
+    )
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    parser.add_argument("--users-db", default="users.db")
+    parser.add_argument("--backup-dir", default=BACKUP_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "backup", help="Take a backup, then apply the retention policy."
+    )
+    commands.add_parser("list", help="List the backups.")
+    verify = commands.add_parser(
+        "verify", help="Verify a backup, the latest by default."
+    )
+    verify.add_argument("path", nargs="?")
+    restore = commands.add_parser(
+        "restore", help="Restore the latest backup taken at or before a time."
+    )
+    restore.add_argument(
+        "--at", type=datetime.fromisoformat, help="e.g. 2024-05-01T12:00"
+    )
+    args = parser.parse_args()
+
+    db_files = {
+        "books.db": args.books_db,
+        "bookshelf.db": args.bookshelf_db,
+        "users.db": args.users_db,
+    }
+    if args.command == "backup":
+        print(create_backup(db_files, args.backup_dir))
+        for pruned in prune_backups(args.backup_dir):
+            print(f"[INFO] Deleted {pruned}")
+    elif args.command == "list":
+        for taken_at, backup_path in list_backups(args.backup_dir):
+            print(f"{taken_at.isoformat()}  {backup_path}")
+    elif args.command == "verify":
+        backup_path = args.path or find_backup(backup_dir=args.backup_dir)
+        found = verify_backup(backup_path) if backup_path else ["no backup found"]
+        print("\n".join(found) or f"{backup_path} is OK.")
+    else:
+        backup_path = find_backup(args.at, args.backup_dir)
+        if backup_path is None:
+            print("[WARN] No backup was taken at or before that time.")
+        else:
+            print(restore_backup(backup_path, db_files, args.backup_dir))
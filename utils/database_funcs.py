@@ -2,14 +2,411 @@
 """Database Functions."""
 
 import os
+import random
 import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Optional, Tuple
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterator, List, Optional, Tuple, TypeVar
 
+import pandas as pd
 from pydantic.dataclasses import dataclass
 
-now = datetime(year=2024, month=1, day=1).strftime("%Y-%m-%d")
-default_date = (datetime.now() + timedelta(days=365)).strftime("%Y-%m-%d")
+from utils.frames import load_frame
+from utils.query_cache import QueryCache
+from utils.snapshot import get_snapshot, notify_write
+
+# Bookshelf dates are stored as whole days since this date, NULL when unknown
+EPOCH = date(1970, 1, 1)
+# Layout of the bookshelf file, kept in its user_version to run migrations once. Bump it
+# with every schema change, files at this version skip the set-up on start-up
+BOOKSHELF_SCHEMA_VERSION = 4
+# Layout of the books file, kept in its user_version the same way
+BOOKS_SCHEMA_VERSION = 1
+
+# Shelf query results shared by all sessions in the process, keyed by the write
+# generation of both files so writes from other processes are seen on the next read
+shelf_cache = QueryCache(ttl=300.0)
+
+# Column names of the tuples returned by the catalog and bookshelf queries
+BOOK_COLUMNS = (
+    "isbn",
+    "title",
+    "authors",
+    "publisher",
+    "description",
+    "page_count",
+    "year",
+)
+BOOKSHELF_COLUMNS = BOOK_COLUMNS + (
+    "date_started",
+    "date_ended",
+    "owned",
+    "current_page",
+)
+# The same columns without the large description text, for list views
+BOOK_LIST_COLUMNS = tuple(column for column in BOOK_COLUMNS if column != "description")
+BOOKSHELF_LIST_COLUMNS = tuple(
+    column for column in BOOKSHELF_COLUMNS if column != "description"
+)
+
+# Columns returned by every bookshelf query joined with the books catalog, with the
+# stored day numbers turned back into "YYYY-MM-DD" text
+BOOKSHELF_SELECT = """
+    SELECT
+        books_db.books.isbn,
+        books_db.books.title,
+        books_db.books.authors,
+        books_db.books.publisher,
+        books_db.books.description,
+        books_db.books.page_count,
+        books_db.books.year,
+        date(bookshelf.date_started * 86400, 'unixepoch') AS date_started,
+        date(bookshelf.date_ended * 86400, 'unixepoch') AS date_ended,
+        bookshelf.owned,
+        bookshelf.current_page
+    FROM bookshelf
+    INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+"""
+
+# BOOKSHELF_SELECT without the description, whose text is fetched per book on demand
+BOOKSHELF_LIST_SELECT = """
+    SELECT
+        books_db.books.isbn,
+        books_db.books.title,
+        books_db.books.authors,
+        books_db.books.publisher,
+        books_db.books.page_count,
+        books_db.books.year,
+        date(bookshelf.date_started * 86400, 'unixepoch') AS date_started,
+        date(bookshelf.date_ended * 86400, 'unixepoch') AS date_ended,
+        bookshelf.owned,
+        bookshelf.current_page
+    FROM bookshelf
+    INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+"""
+
+# One page of an author's books, found through the author index
+BOOKS_BY_AUTHOR_SELECT = f"""
+    SELECT {", ".join(f"books.{column}" for column in BOOK_LIST_COLUMNS)}
+    FROM authors
+    INNER JOIN book_authors ON book_authors.author_id = authors.author_id
+    INNER JOIN books ON books.isbn = book_authors.isbn
+    WHERE authors.name_key = ?
+    ORDER BY books.year, books.title
+    LIMIT ? OFFSET ?
+"""
+
+# Per-user totals of the bookshelf, grouped by owner; books missing from the catalog don't count
+USER_SUMMARY_SELECT = """
+    SELECT
+        bookshelf.owner,
+        COUNT(*),
+        COALESCE(SUM(bookshelf.owned = 'Owned'), 0),
+        COALESCE(SUM(bookshelf.current_page), 0),
+        COALESCE(SUM(books_db.books.page_count), 0)
+    FROM bookshelf
+    INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+"""
+USER_SUMMARY_COLUMNS = ("books", "owned", "read_pages", "total_pages")
+
+# Columns the bookshelf table can be sorted by, ties are broken by ISBN
+SHELF_SORT_COLUMNS = {
+    "title": "books_db.books.title",
+    "authors": "books_db.books.authors",
+    "page_count": "books_db.books.page_count",
+    "year": "books_db.books.year",
+    "date_started": "bookshelf.date_started",
+    "date_ended": "bookshelf.date_ended",
+    "owned": "bookshelf.owned",
+    "current_page": "bookshelf.current_page",
+}
+
+# The bookshelf table, one row per user and book, its dates are days since EPOCH
+BOOKSHELF_TABLE = """CREATE TABLE IF NOT EXISTS {table} (
+                isbn TEXT,
+                owner TEXT,
+                date_started INTEGER,
+                date_ended INTEGER,
+                owned TEXT,
+                current_page INTEGER,
+                date_finished INTEGER,
+                PRIMARY KEY (owner, isbn),
+                FOREIGN KEY (isbn) REFERENCES books(isbn) ON DELETE CASCADE,
+                FOREIGN KEY (owner) REFERENCES users(username) ON DELETE CASCADE
+        )
+        """
+
+T = TypeVar("T")
+
+
+def generation_triggers(table: str) -> list[str]:
+    """
+    Builds the statements that keep a database's write generation counter current.
+
+    Args:
+        table (str): The table whose inserts, updates and deletes bump the counter.
+
+    Returns:
+        list[str]: The CREATE statements, safe to run on every start-up.
+    """
+    statements = [
+        """CREATE TABLE IF NOT EXISTS write_generation (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    generation INTEGER NOT NULL
+            )
+            """,
+        "INSERT OR IGNORE INTO write_generation (id, generation) VALUES (1, 0)",
+    ]
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        statements.append(
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_generation_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE write_generation SET generation = generation + 1 WHERE id = 1;
+                    END
+            """
+        )
+    return statements
+
+
+def change_log_triggers(table: str, owner_column: Optional[str] = None) -> list[str]:
+    """
+    Builds the statements that record every change to a table in the database's change log.
+
+    Args:
+        table (str): The table to record changes of.
+        owner_column (Optional[str]): The column holding the row's owner, if the table has one.
+
+    Returns:
+        list[str]: The CREATE statements, safe to run on every start-up.
+    """
+    statements = [
+        """CREATE TABLE IF NOT EXISTS change_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    table_name TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    isbn TEXT,
+                    owner TEXT,
+                    changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+            )
+            """,
+        "CREATE INDEX IF NOT EXISTS idx_change_log_owner ON change_log (owner, seq)",
+    ]
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        owner = f"{row}.{owner_column}" if owner_column else "NULL"
+        statements.append(
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_change_log_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        INSERT INTO change_log (table_name, op, isbn, owner)
+                            VALUES ('{table}', '{event.lower()}', {row}.isbn, {owner});
+                    END
+            """
+        )
+    return statements
+
+
+def bookshelf_indexes() -> list[str]:
+    """
+    Builds the statements creating the bookshelf table's indexes and triggers.
+
+    Returns:
+        list[str]: The CREATE statements, safe to run on every start-up.
+    """
+    # The key serves the reads per owner, this index the readers of one book
+    statements = [
+        "CREATE INDEX IF NOT EXISTS idx_bookshelf_isbn ON bookshelf (isbn, owner)"
+    ]
+    # Shelves are sorted or windowed by one of these columns
+    for column in ("date_started", "date_ended", "date_finished", "current_page"):
+        statements.append(
+            f"CREATE INDEX IF NOT EXISTS idx_bookshelf_owner_{column} ON bookshelf (owner, {column})"
+        )
+    # Date ranges across every user, such as a leaderboard year
+    statements.append(
+        "CREATE INDEX IF NOT EXISTS idx_bookshelf_finished ON bookshelf (date_finished, owner)"
+    )
+    statements.extend(generation_triggers("bookshelf"))
+    statements.extend(change_log_triggers("bookshelf", owner_column="owner"))
+    return statements
+
+
+def prune_change_log(conn: sqlite3.Connection, older_than_days: int = 30) -> int:
+    """
+    Deletes a database's change log entries older than the given age.
+
+    The newest entry is always kept, so changes_since can tell a cursor that fell
+    behind the pruned entries from one that is up to date.
+
+    Args:
+        conn (sqlite3.Connection): A connection to the database holding the log.
+        older_than_days (int): Age in days of the oldest entries to keep.
+
+    Returns:
+        int: The number of entries deleted.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).strftime(
+        "%Y-%m-%dT%H:%M:%S"
+    )
+    return conn.execute(
+        """
+        DELETE FROM change_log
+        WHERE changed_at < ? AND seq < (SELECT MAX(seq) FROM change_log)
+        """,
+        (cutoff,),
+    ).rowcount
+
+
+def log_position(conn: sqlite3.Connection, schema: str, since: int) -> tuple[bool, int]:
+    """
+    Checks a position in a change log against the entries the log still holds.
+
+    Args:
+        conn (sqlite3.Connection): A connection that can read the log.
+        schema (str): The schema holding the log, e.g. "main" or "books_db".
+        since (int): The sequence number a reader has already seen.
+
+    Returns:
+        tuple[bool, int]: Whether the reader must re-read everything because the log was
+        pruned past its position or rolled back by a restore, and the log's newest sequence number.
+    """
+    first, last = conn.execute(
+        f"SELECT MIN(seq), MAX(seq) FROM {schema}.change_log"
+    ).fetchone()
+    # Pruning keeps the newest entry, so an empty log past a position was emptied
+    # by an older pruning and the reader must re-read as well
+    if first is None:
+        return since > 0, since
+    # A restore logs a "reset" entry after every position handed out before it, a
+    # position past the newest entry comes from a log that was rolled back since
+    restored = conn.execute(
+        f"SELECT 1 FROM {schema}.change_log WHERE seq > ? AND op = 'reset' LIMIT 1",
+        (since,),
+    ).fetchone()
+    return since < first - 1 or since > last or restored is not None, last
+
+
+def pack_sync_cursor(books_seq: int, bookshelf_seq: int) -> int:
+    """
+    Packs the sequence numbers of both change logs into one sync cursor.
+
+    The catalog's sequence number takes the high bits, so the cursor grows
+    monotonically whenever either log does.
+    """
+    return (books_seq << 32) | bookshelf_seq
+
+
+def unpack_sync_cursor(seq: int) -> tuple[int, int]:
+    """Splits a sync cursor back into the books and bookshelf sequence numbers."""
+    return seq >> 32, seq & 0xFFFFFFFF
+
+
+def to_epoch_day(value) -> Optional[int]:
+    """
+    Converts a date to the day number the bookshelf stores.
+
+    Args:
+        value: A date, datetime, pandas Timestamp or "YYYY-MM-DD" text. None, "" and NaT
+            mean there is no date.
+
+    Returns:
+        Optional[int]: The days since EPOCH, or None.
+
+    Raises:
+        ValueError: If value is not a date.
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value.strip()[:10])
+    elif value is pd.NaT:
+        return None
+    elif isinstance(value, datetime):  # Also covers pandas Timestamps
+        value = value.date()
+    elif not isinstance(value, date):
+        raise ValueError(f"Not a date: {value!r}")
+    return (value - EPOCH).days
+
+
+def from_epoch_day(days: Optional[int]) -> Optional[date]:
+    """Converts a stored day number back to a date, None stays None."""
+    return None if days is None else EPOCH + timedelta(days=int(days))
+
+
+def split_authors(authors: str) -> list[str]:
+    """
+    Splits the comma-joined authors string stored with each book into names.
+
+    Args:
+        authors (str): The authors as entered, e.g. "Terry Pratchett, Neil Gaiman".
+
+    Returns:
+        list[str]: The distinct names in order, with surrounding whitespace removed.
+    """
+    names: list[str] = []
+    for name in (authors or "").split(","):
+        name = " ".join(name.split())
+        if name and author_key(name) not in map(author_key, names):
+            names.append(name)
+    return names
+
+
+def author_key(name: str) -> str:
+    """Normalizes an author's name so that spelling variants in case and spacing match."""
+    return " ".join(name.casefold().split())
+
+
+def is_busy_error(error: Exception) -> bool:
+    """
+    Checks whether an error means another connection holds the lock (SQLITE_BUSY / SQLITE_LOCKED).
+
+    Args:
+        error (Exception): The error raised by sqlite3.
+
+    Returns:
+        bool: True if retrying the operation later may succeed.
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How the database layer waits out locks held by other sessions.
+
+    Attributes:
+        attempts (int): Times an operation is tried before its lock error is reported.
+        base_delay (float): Seconds of backoff before the second attempt; doubles with every retry.
+        max_delay (float): Upper bound in seconds for a single backoff.
+        busy_timeout (float): Seconds SQLite itself waits on a lock before raising SQLITE_BUSY.
+
+    Methods:
+        - delay(attempt: int) -> float: Returns the jittered backoff after a failed attempt.
+    """
+
+    attempts: int = 5
+    base_delay: float = 0.05
+    max_delay: float = 2.0
+    busy_timeout: float = 5.0
+
+    def delay(self, attempt: int) -> float:
+        """
+        Returns the backoff after the given failed attempt, with full jitter.
+
+        Args:
+            attempt (int): The number of the attempt that failed, starting at 1.
+
+        Returns:
+            float: Seconds to sleep before the next attempt.
+        """
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
 
 
 @dataclass
@@ -20,6 +417,8 @@ class BookDatabase:
     Attributes:
         db_name (str): The path to the main books database file.
         bookshelf_db (str): The path to the bookshelf database file.
+        retry_policy (RetryPolicy): How operations wait out locks held by other sessions.
+        read_snapshot (bool): Whether catalog and bookshelf reads are served from the process' in-memory snapshot.
 
     Methods:
         - __post_init__(): Initializes the book database by validating its existence.
@@ -27,18 +426,58 @@ class BookDatabase:
         - init_db(db_name: str) -> str: Initializes the main books database by creating the necessary table.
         - init_bookshelf_db(db_name: str) -> str: Initializes the bookshelf database by creating the necessary table.
         - attach_bookshelf_db(conn): Attaches the bookshelf database to the main books database connection.
-        - insert_book(isbn: str, title: str, authors: str, publisher: str, description: str, page_count: int, year: int) -> str: Inserts a new book into the database.
+        - insert_book(isbn: str, title: str, authors: str, publisher: str, description: str, page_count: int, year: int, categories: Optional[list[str]]) -> str: Inserts a new book into the database.
         - get_book_by_isbn(isbn: str) -> Optional[Tuple]: Retrieves a book from the database based on its ISBN.
         - get_book_by_title(title: str) -> Optional[Tuple]: Retrieves a book from the database based on its title.
         - get_all_books() -> Optional[List[Tuple]]: Retrieves all books from the database.Optional[str], owned: str, current_page: int) -> str: Updates the information of a book in the database.
+        - find_editions(isbn: str, title: str, authors: str) -> list[tuple[str, float]]: Looks up the likely other editions of a book in the edition index.
+        - get_work_ids() -> dict[str, int] | str: Retrieves the work_id of every book.
+        - set_work_ids(assignments: dict[str, int]) -> str: Stores the work_id of the given books.
+        - get_editions(isbn: str) -> list[Tuple] | str: Retrieves the other books of the same work.
+        - claim_recommender(holder: str, lease_seconds: float) -> Optional[int] | str: Takes or renews the lease on the stored "more like this" lists.
+        - release_recommender(holder: str) -> str: Gives up the lease on the stored "more like this" lists.
+        - replace_neighbours(neighbours: dict, holder: str, seq: int) -> str: Replaces the stored "more like this" lists of the given books.
+        - get_catalog_changes(seq: int) -> dict | str: Returns the books added, changed or deleted after a change log position.
+        - get_catalog_seq() -> int | str: Returns the newest position in the catalog's change log.
+        - get_similar_books(isbn: str, limit: int) -> list[Tuple] | str: Looks up the precomputed books most similar to a book.
+        - get_book_list() -> list[Tuple] | str: Retrieves the whole catalog without the book descriptions.
+        - get_book_frame() -> pd.DataFrame | str: Retrieves the catalog without descriptions as a typed DataFrame.
+        - get_description(isbn: str) -> Optional[str] | str: Retrieves the description of a single book.
         - delete_entry(isbn: str) -> str: Deletes a book from the database based on its ISBN.
+        - link_missing_authors(after: str, limit: int) -> tuple[int, str] | str: Links one batch of books without author links to their authors.
+        - search_authors(prefix: str, limit: int) -> list[Tuple] | str: Finds the authors whose name starts with a prefix.
+        - get_books_by_author(author: str, limit: int, offset: int) -> list[Tuple] | str: Retrieves an author's books through the author index.
+        - get_books_by_author_frame(author: str, limit: int, offset: int) -> pd.DataFrame | str: Retrieves an author's books as a typed DataFrame.
         - add_to_bookshelf(book_id: str, username: str) -> str: Adds a book to the user's bookshelf.
         - get_from_bookshelf(username: str) -> Optional[List[Tuple]]: Retrieves all books from the user's bookshelf.
+        - get_bookshelf_frame(username: str, categories: tuple, year_range: Optional[tuple], owned: tuple, finished: Optional[bool]) -> pd.DataFrame | str: Retrieves the matching bookshelf rows as a typed DataFrame.
+        - get_bookshelf_window(username: str, categories: tuple, year_range: Optional[tuple], owned: tuple, finished: Optional[bool], sort_by: str, descending: bool, limit: int, offset: int) -> pd.DataFrame | str: Retrieves one sorted page of the matching bookshelf rows.
+        - get_bookshelf_totals(username: str, categories: tuple, year_range: Optional[tuple], owned: tuple, finished: Optional[bool]) -> dict[str, int] | str: Counts the matching books and pages.
+        - get_bookshelf_facets(username: str) -> dict[str, dict] | str: Counts the user's books per category, owned and finished status.
+        - get_books_page(limit: int, offset: int) -> list[Tuple] | str: Retrieves one page of the catalog ordered by ISBN.
+        - get_bookshelf_page(username: str, limit: int, offset: int) -> list[Tuple] | str: Retrieves one page of the user's bookshelf ordered by ISBN.
+        - iter_all_books(chunk_size: int) -> Iterator[Tuple]: Streams the whole catalog, fetching a chunk of rows at a time.
+        - iter_bookshelf(username: str, chunk_size: int) -> Iterator[Tuple]: Streams the user's bookshelf, fetching a chunk of rows at a time.
+        - invalidate_bookshelf_cache(username: Optional[str]) -> None: Drops cached bookshelf results for a user, or for everyone.
         - get_one_book_bookshelf(book_id: str, owner: str) -> Optional[Tuple]: Retrieves a specific book from the user's bookshelf.
+        - get_user_summary(username: str) -> dict[str, int] | str: Retrieves the maintained totals of the user's bookshelf.
+        - check_user_summary(repair: bool) -> list[Tuple] | str: Finds and rebuilds the user summaries that drifted from the bookshelf.
+        - rebuild_leaderboard() -> str: Recomputes the whole cached yearly leaderboard.
+        - get_leaderboard(year: int, order_by: str, limit: int) -> list[Tuple] | str: Retrieves the cached rankings of a year.
+        - get_leaderboard_entry(year: int, owner: str) -> Optional[Tuple] | str: Retrieves a user's cached ranking in a year.
+        - get_leaderboard_years() -> list[int] | str: Retrieves the years that have a leaderboard.
+        - changes_since(seq: int, owner: Optional[str]) -> dict | str: Returns the catalog and bookshelf changes after a sync cursor.
+        - prune_change_log(older_than_days: int) -> str: Deletes old change log entries from both databases.
+        - get_active_reading() -> list[Tuple] | str: Retrieves every user's unfinished books with their progress.
+        - replace_predictions(predictions: list[Tuple]) -> str: Replaces the stored reading predictions.
+        - get_prediction(book_id: str, owner: str) -> Optional[Tuple] | str: Retrieves the stored prediction for one of the user's books.
+        - get_predictions(owner: str) -> list[Tuple] | str: Retrieves the stored predictions for the user's books.
     """
 
     db_name: str = os.path.join(os.path.dirname(__file__), "..", "books.db")
     bookshelf_db: str = os.path.join(os.path.dirname(__file__), "..", "bookshelf.db")
+    retry_policy: RetryPolicy = RetryPolicy()
+    read_snapshot: bool = False
 
     def __post_init__(self) -> None:
         """
@@ -66,6 +505,70 @@ class BookDatabase:
         if not os.path.exists(self.bookshelf_db):
             self.init_bookshelf_db(self.bookshelf_db)
 
+    def _connect(self, db_path: str, **kwargs) -> sqlite3.Connection:
+        """Opens a connection that waits up to the policy's busy timeout for locks."""
+        return sqlite3.connect(
+            db_path, timeout=self.retry_policy.busy_timeout, **kwargs
+        )
+
+    def _run(
+        self,
+        db_path: str,
+        work: Callable[[sqlite3.Connection], T],
+        attach_books: bool = False,
+        write: bool = False,
+        snapshot: bool = False,
+    ) -> T:
+        """
+        Runs work in its own connection and transaction, retrying it while the database is locked.
+
+        Writes take the write lock up front (BEGIN IMMEDIATE), so two sessions can't both
+        read and then deadlock upgrading to a write lock.
+
+        Args:
+            db_path (str): The database file to connect to.
+            work (Callable[[sqlite3.Connection], T]): The queries to run.
+            attach_books (bool): Whether to attach the books database as books_db.
+            write (bool): Whether the work modifies the database.
+            snapshot (bool): Whether the read may be served from the in-memory snapshot, if enabled.
+
+        Returns:
+            T: Whatever work returns.
+
+        Raises:
+            sqlite3.Error: If the work fails, or is still locked out after the last attempt.
+        """
+        if snapshot and self.read_snapshot and not write:
+            conn = get_snapshot(
+                self.db_name, self.bookshelf_db, self.retry_policy.busy_timeout
+            ).connect(db_path, attach_books)
+            try:
+                return work(conn)
+            finally:
+                conn.close()
+
+        attempt = 1
+        while True:
+            conn = self._connect(db_path)
+            try:
+                if attach_books:
+                    conn.execute("ATTACH DATABASE ? AS books_db", (self.db_name,))
+                if write:
+                    conn.execute("BEGIN IMMEDIATE")
+                result = work(conn)
+                conn.commit()
+                if write:
+                    notify_write(db_path)
+                return result
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if not is_busy_error(e) or attempt >= self.retry_policy.attempts:
+                    raise
+            finally:
+                conn.close()
+            time.sleep(self.retry_policy.delay(attempt))
+            attempt += 1
+
     def init_db(self, db_name: str) -> str:
         """
         Initializes the books database by creating the necessary table if it doesn't exist.
@@ -76,9 +579,15 @@ class BookDatabase:
         Returns:
             str: A message indicating the status of the initialization process.
         """
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect(self.db_name)
         c = conn.cursor()
         try:
+            # Readers keep reading while a write commits, and the mode sticks to the file
+            c.execute("PRAGMA journal_mode=WAL")
+            # A plain read, so constructing a BookDatabase never waits for the write lock
+            # once the file is up to date
+            if c.execute("PRAGMA user_version").fetchone()[0] >= BOOKS_SCHEMA_VERSION:
+                return "Database initialized successfully!"
             c.execute(
                 """CREATE TABLE IF NOT EXISTS books (
                             isbn TEXT PRIMARY KEY,
@@ -91,13 +600,115 @@ class BookDatabase:
                     )
                     """
             )
+            c.execute("CREATE INDEX IF NOT EXISTS idx_books_title ON books (title)")
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS book_neighbours (
+                            isbn TEXT,
+                            rank INTEGER,
+                            neighbour_isbn TEXT,
+                            score REAL,
+                            PRIMARY KEY (isbn, rank)
+                    )
+                    """
+            )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS authors (
+                            author_id INTEGER PRIMARY KEY,
+                            name TEXT NOT NULL,
+                            name_key TEXT NOT NULL UNIQUE
+                    )
+                    """
+            )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS book_authors (
+                            isbn TEXT,
+                            author_id INTEGER,
+                            position INTEGER,
+                            PRIMARY KEY (isbn, author_id)
+                    )
+                    """
+            )
+            c.execute(
+                "CREATE INDEX IF NOT EXISTS idx_book_authors_author ON book_authors (author_id, isbn)"
+            )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS book_categories (
+                            isbn TEXT,
+                            category TEXT,
+                            PRIMARY KEY (isbn, category)
+                    )
+                    """
+            )
+            c.execute(
+                "CREATE INDEX IF NOT EXISTS idx_book_categories_category ON book_categories (category, isbn)"
+            )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS book_works (
+                            isbn TEXT PRIMARY KEY,
+                            work_id INTEGER NOT NULL
+                    )
+                    """
+            )
+            c.execute(
+                "CREATE INDEX IF NOT EXISTS idx_book_works_work ON book_works (work_id, isbn)"
+            )
+            # The process maintaining book_neighbours, and the change log position they reflect
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS recommender_state (
+                            id INTEGER PRIMARY KEY CHECK (id = 1),
+                            holder TEXT,
+                            lease_until REAL NOT NULL DEFAULT 0,
+                            seq INTEGER NOT NULL DEFAULT 0
+                    )
+                    """
+            )
+            c.execute("INSERT OR IGNORE INTO recommender_state (id) VALUES (1)")
+            for statement in generation_triggers("books"):
+                c.execute(statement)
+            # The author backfill links books without touching the books table
+            for statement in generation_triggers("book_authors"):
+                c.execute(statement)
+            for statement in generation_triggers("book_categories"):
+                c.execute(statement)
+            for statement in generation_triggers("book_works"):
+                c.execute(statement)
+            for statement in generation_triggers("book_neighbours"):
+                c.execute(statement)
+            for statement in change_log_triggers("books"):
+                c.execute(statement)
             ret_msg = "Database initialized successfully!"
         except Exception as e:
             ret_msg = f"There was an error initializing the books database!\n\t{e}"
-        conn.commit()
-        conn.close()
+        finally:
+            conn.commit()
+            conn.close()
+        try:
+            self._migrate_books()
+        except Exception as e:
+            ret_msg = f"There was an error migrating the books database!\n\t{e}"
         return ret_msg
 
+    def _migrate_books(self) -> None:
+        """
+        Brings a books file below BOOKS_SCHEMA_VERSION up to date.
+
+        Books added before the author index existed are linked to their authors one
+        batch per transaction, so other processes keep writing while a large catalog is
+        migrated, and a migration that was interrupted picks up the books still
+        unlinked. The version is only set once every book is linked.
+        """
+        from utils.authors import backfill_authors
+
+        ret_msg = backfill_authors(self)
+        if "error" in ret_msg:
+            raise RuntimeError(ret_msg)
+        print(f"[INFO] {ret_msg}")
+        self._run(
+            self.db_name,
+            lambda conn: conn.execute(f"PRAGMA user_version = {BOOKS_SCHEMA_VERSION}"),
+            write=True,
+        )
+
     def init_bookshelf_db(self, db_name: str) -> str:
         """
         Initializes the bookshelf database with the given name.
@@ -108,30 +719,165 @@ class BookDatabase:
         Returns:
             str: A message indicating the success or failure of the initialization.
         """
-        conn = sqlite3.connect(self.bookshelf_db)
+        conn = self._connect(self.bookshelf_db)
         c = conn.cursor()
+        version = 0
         try:
             c.execute("PRAGMA foreign_keys = ON;")
+            c.execute("PRAGMA journal_mode=WAL")
+            # A plain read, so constructing a BookDatabase never waits for the write lock
+            # once the file is up to date
+            version = c.execute("PRAGMA user_version").fetchone()[0]
+            if version >= BOOKSHELF_SCHEMA_VERSION:
+                return f"Bookshelf Database with name {self.bookshelf_db} initialized successfully!"
+            c.execute(BOOKSHELF_TABLE.format(table="bookshelf"))
             c.execute(
-                """CREATE TABLE IF NOT EXISTS bookshelf (
-                            isbn TEXT PRIMARY KEY,
+                """CREATE TABLE IF NOT EXISTS reading_predictions (
+                            isbn TEXT,
+                            owner TEXT,
+                            pages_per_day REAL,
+                            predicted_finish TEXT,
+                            computed_at TEXT,
+                            PRIMARY KEY (isbn, owner)
+                    )
+                    """
+            )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS leaderboard (
+                            year INTEGER,
                             owner TEXT,
-                            date_started TEXT,
-                            date_ended TEXT,
-                            owned TEXT,
-                            current_page INTEGER,
-                            FOREIGN KEY (isbn) REFERENCES books(isbn) ON DELETE CASCADE,
-                            FOREIGN KEY (owner) REFERENCES users(username) ON DELETE CASCADE
+                            books_finished INTEGER,
+                            pages_finished INTEGER,
+                            books_rank INTEGER,
+                            pages_rank INTEGER,
+                            PRIMARY KEY (year, owner)
+                    )
+                    """
+            )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS user_summary (
+                            owner TEXT PRIMARY KEY,
+                            books INTEGER NOT NULL DEFAULT 0,
+                            owned INTEGER NOT NULL DEFAULT 0,
+                            read_pages INTEGER NOT NULL DEFAULT 0,
+                            total_pages INTEGER NOT NULL DEFAULT 0
                     )
                     """
             )
             ret_msg = f"Bookshelf Database with name {self.bookshelf_db} initialized successfully!"
         except Exception as e:
             ret_msg = f"There was an error initializing the bookshelf database!\n\t{e}"
-        conn.commit()
-        conn.close()
+        finally:
+            conn.commit()
+            conn.close()
+        try:
+            self._run(
+                self.bookshelf_db,
+                self._migrate_bookshelf,
+                attach_books=True,
+                write=True,
+            )
+        except Exception as e:
+            ret_msg = f"There was an error migrating the bookshelf database!\n\t{e}"
         return ret_msg
 
+    def _migrate_bookshelf(self, conn: sqlite3.Connection) -> None:
+        """
+        Brings a bookshelf file below BOOKSHELF_SCHEMA_VERSION up to date.
+
+        Runs once per file: the version is checked again under the write lock, in case
+        another process migrated the file in the meantime, and is only set once the
+        indexes and triggers exist.
+        """
+        if (
+            conn.execute("PRAGMA user_version").fetchone()[0]
+            >= BOOKSHELF_SCHEMA_VERSION
+        ):
+            return
+        columns = list(conn.execute("PRAGMA table_info(bookshelf)"))
+        types = {column[1]: column[2] for column in columns}
+        key = [column[1] for column in sorted(columns, key=lambda c: c[5]) if column[5]]
+        if types["date_started"] != "INTEGER" or key != ["owner", "isbn"]:
+            self._rebuild_bookshelf(
+                conn, convert_dates=types["date_started"] != "INTEGER"
+            )
+        for statement in bookshelf_indexes():
+            conn.execute(statement)
+        # Snapshot readers are served these tables too, so their writes bump the generation
+        for table in ("reading_predictions", "leaderboard", "user_summary"):
+            for statement in generation_triggers(table):
+                conn.execute(statement)
+        # The book page used to save every edit as "Own", which no total counts as owned
+        conn.execute("UPDATE bookshelf SET owned = 'Owned' WHERE owned = 'Own'")
+        # Files from before the user summaries existed get them filled here, once
+        self._rebuild_user_summary(conn)
+        conn.execute(f"PRAGMA user_version = {BOOKSHELF_SCHEMA_VERSION}")
+
+    def _rebuild_bookshelf(self, conn: sqlite3.Connection, convert_dates: bool) -> None:
+        """
+        Copies the bookshelf into the current layout, keyed by owner and ISBN.
+
+        The table used to be keyed by ISBN alone, so no two users could shelve the same
+        book. With convert_dates, it is also a file from before the typed layout with
+        day-number dates. Its dates were free-form text: real "YYYY-MM-DD" dates,
+        numbers such as 2022 left by the unquoted "2024-01-01" default, and end dates a
+        year ahead standing in for "not finished". Any text that isn't a date becomes
+        NULL, end dates are only kept for finished books and the finished date is
+        recomputed from them, and the leaderboard follows.
+        """
+        conn.execute("DROP TABLE IF EXISTS bookshelf_migrating")
+        conn.execute(BOOKSHELF_TABLE.format(table="bookshelf_migrating"))
+        if convert_dates:
+            # julianday() reads bare numbers as day numbers, so only dates are passed to it
+            day = """CASE WHEN {column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+                THEN CAST(julianday(substr({column}, 1, 10)) - 2440587.5 AS INTEGER) END"""
+            conn.execute(
+                f"""
+                INSERT INTO bookshelf_migrating (
+                    isbn, owner, date_started, date_ended, owned, current_page, date_finished
+                )
+                SELECT
+                    isbn,
+                    owner,
+                    {day.format(column="date_started")},
+                    CASE WHEN finished THEN {day.format(column="date_ended")} END,
+                    owned,
+                    current_page,
+                    CASE WHEN finished THEN {day.format(column="date_ended")} END
+                FROM (
+                    SELECT bookshelf.*, bookshelf.current_page >= (
+                        SELECT NULLIF(page_count, 0) FROM books_db.books
+                        WHERE books_db.books.isbn = bookshelf.isbn
+                    ) AS finished
+                    FROM bookshelf
+                )
+                """
+            )
+        else:
+            conn.execute(
+                """
+                INSERT INTO bookshelf_migrating (
+                    isbn, owner, date_started, date_ended, owned, current_page, date_finished
+                )
+                SELECT isbn, owner, date_started, date_ended, owned, current_page, date_finished
+                FROM bookshelf
+                """
+            )
+        # Dropping the table drops its indexes and triggers, they are created again below
+        conn.execute("DROP TABLE bookshelf")
+        conn.execute("ALTER TABLE bookshelf_migrating RENAME TO bookshelf")
+        for statement in bookshelf_indexes():
+            conn.execute(statement)
+        # Every row may have changed, so caches and sync clients read them again
+        conn.execute("UPDATE write_generation SET generation = generation + 1")
+        conn.execute(
+            """
+            INSERT INTO change_log (table_name, op, isbn, owner)
+            SELECT 'bookshelf', 'update', isbn, owner FROM bookshelf
+            """
+        )
+        self._rebuild_leaderboard(conn)
+
     def attach_bookshelf_db(self, conn: sqlite3.connect) -> None:  # type: ignore
         """
         Attaches the bookshelf database to the given connection.
@@ -153,6 +899,7 @@ class BookDatabase:
         description: str,
         page_count: int,
         year: int,
+        categories: Optional[list[str]] = None,
     ) -> str:
         """
         Inserts a new book into the database.
@@ -165,120 +912,355 @@ class BookDatabase:
             description (str): The description of the book.
             page_count (int): The number of pages in the book.
             year (int): The year the book was published.
+            categories (Optional[list[str]]): The subjects of the book, e.g. from Google Books.
 
         Returns:
-            str: A message indicating the success or failure of the insertion.
+            str: A message indicating the success or failure of the insertion, naming the
+            books it is likely another edition of.
         """
-        conn = sqlite3.connect(self.db_name)
-        c = conn.cursor()
-        try:
-            c.execute(
+        editions = self.find_editions(isbn, title, authors)
+
+        def insert(conn: sqlite3.Connection) -> None:
+            conn.execute(
                 """
                 INSERT INTO books (isbn, title, authors, publisher, description, page_count, year)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
+                """,
                 (isbn, title, authors, publisher, description, page_count, year),
             )
-            ret_msg = f"Book {title} added successfully!"
+            self._link_authors(conn, isbn, authors)
+            conn.executemany(
+                "INSERT OR IGNORE INTO book_categories (isbn, category) VALUES (?, ?)",
+                [
+                    (isbn, category.strip())
+                    for category in categories or []
+                    if category.strip()
+                ],
+            )
+            # A likely edition joins the work of the closest match, other books start their own
+            closest = editions[0][0] if editions else None
+            work_id = conn.execute(
+                """
+                SELECT COALESCE(
+                    (SELECT work_id FROM book_works WHERE isbn = ?),
+                    (SELECT COALESCE(MAX(work_id), 0) + 1 FROM book_works)
+                )
+                """,
+                (closest,),
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO book_works (isbn, work_id) VALUES (?, ?)",
+                [(isbn, work_id)] + ([(closest, work_id)] if closest else []),
+            )
+
+        try:
+            self._run(self.db_name, insert, write=True)
         except Exception as e:
-            ret_msg = f"There was an error inserting the book!\n\t{e}"
-        finally:
-            conn.commit()
-            conn.close()
-            return ret_msg
+            return f"There was an error inserting the book!\n\t{e}"
+        self.invalidate_bookshelf_cache()
+        ret_msg = f"Book {title} added successfully!"
+        if editions:
+            ret_msg += f" It looks like another edition of ISBN {', '.join(match for match, _ in editions)}."
+        return ret_msg
 
-    def get_book_by_isbn(
-        self,
-        isbn: str,
-    ) -> (
-        Optional[
-            Tuple[str, str, str, str, str, int, int, Optional[str], Optional[str], int]
-        ]
-        | str
-    ):
+    def find_editions(
+        self, isbn: str, title: str, authors: str
+    ) -> list[tuple[str, float]]:
         """
-        Retrieves a book from the database based on its ISBN.
+        Looks up the catalog's books that are likely other editions of a book in the edition index.
+
+        Failures are only logged, since duplicate detection shouldn't fail an insert. The
+        check is skipped, returning no matches, while the index is still being built.
 
         Args:
-            isbn (str): The ISBN of the book to retrieve.
+            isbn (str): The ISBN of the book.
+            title (str): The title of the book.
+            authors (str): The authors of the book.
 
         Returns:
-            Optional[Tuple[str, str, str, str, str, int, int, Optional[str], Optional[str], int]] or str:
-                If the book is found, a tuple containing the book's information is returned.
-                If the book is not found, a string indicating an error is returned.
+            list[tuple[str, float]]: (isbn, similarity) pairs, most similar first.
         """
-        conn = sqlite3.connect(self.db_name)
         try:
-            c = conn.cursor()
-            c.execute("SELECT * FROM books WHERE isbn = ?", (isbn,))
-            book = c.fetchone()
+            from utils.editions import get_edition_index
+
+            index = get_edition_index(self)
+            return index.find(title, authors, isbn) if index else []
         except Exception as e:
-            return f"An error occurred: {e}"
-        finally:
-            conn.close()
-            return book
+            print(f"[WARN] Could not look up the editions of {isbn}: {e}")
+            return []
 
-    def get_book_by_title(
-        self,
-        title: str,
-    ) -> (
-        Optional[
-            Tuple[
-                str,
-                str,
-                str,
-                str,
-                str,
-                int,
-                int,
-            ]
-        ]
-        | str
-    ):
+    def claim_recommender(
+        self, holder: str, lease_seconds: float
+    ) -> Optional[int] | str:
         """
-        Retrieves a book from the database based on its title.
+        Takes or renews the lease on the stored neighbour lists, which one process maintains at a time.
+
+        The lease is only written once less than half of it is left, so the holder's
+        regular claims and the other processes' checks are plain reads.
 
         Args:
-            title (str): The title of the book to retrieve.
+            holder (str): The name of the claiming process.
+            lease_seconds (float): Seconds the lease lasts without being renewed.
 
         Returns:
-            Optional[Tuple[str, str, str, str, str, int, int, Optional[str], Optional[str], str, int]] or str:
-            - If a book with the given title is found, returns a tuple containing the book's information.
-            - If no book is found, returns None.
-            - If an error occurs during the retrieval process, returns an error message as a string.
+            Optional[int] or str: The catalog change log position the stored lists reflect if the
+            lease is held, None if another process holds it, or an error message.
         """
+
+        def read(conn: sqlite3.Connection) -> Tuple:
+            return conn.execute(
+                "SELECT holder, lease_until, seq FROM recommender_state WHERE id = 1"
+            ).fetchone()
+
+        def claim(conn: sqlite3.Connection) -> Optional[int]:
+            now = time.time()
+            updated = conn.execute(
+                """
+                UPDATE recommender_state SET holder = ?, lease_until = ?
+                WHERE id = 1 AND (holder = ? OR holder IS NULL OR lease_until < ?)
+                """,
+                (holder, now + lease_seconds, holder, now),
+            ).rowcount
+            return read(conn)[2] if updated else None
+
         try:
-            with sqlite3.connect(self.bookshelf_db) as bookshelf_conn:
-                bookshelf_conn.execute(f"ATTACH DATABASE '{self.db_name}' AS books_db")
-                cursor = bookshelf_conn.cursor()
-                cursor.execute(
-                    """
-                      SELECT
-                        books_db.books.isbn,
-                        books_db.books.title,
-                        books_db.books.authors,
-                        books_db.books.publisher,
-                        books_db.books.description,
-                        books_db.books.page_count,
-                        books_db.books.year,
-                        bookshelf.date_started,
-                        bookshelf.date_ended,
-                        bookshelf.owned,
-                        bookshelf.current_page
-                      FROM bookshelf
-                      INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
-                      WHERE title = ?
-                      """,
-                    (title,),
-                )
-            book = cursor.fetchone()
+            current, lease_until, seq = self._run(self.db_name, read)
+            now = time.time()
+            if current == holder and lease_until - now > lease_seconds / 2:
+                return seq
+            if current not in (holder, None) and lease_until >= now:
+                return None
+            return self._run(self.db_name, claim, write=True)
         except Exception as e:
-            return f"An error occurred: {e}"
-        finally:
-            return book
+            return f"An error occurred: {e}\n\tClaim Recommender"
 
-    def get_all_books(
-        self,
+    def release_recommender(self, holder: str) -> str:
+        """
+        Gives up the lease on the stored neighbour lists, so another process can take it right away.
+
+        Args:
+            holder (str): The name of the process holding the lease.
+
+        Returns:
+            str: A message indicating the success or failure of the release.
+        """
+        try:
+            self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    "UPDATE recommender_state SET holder = NULL, lease_until = 0 WHERE id = 1 AND holder = ?",
+                    (holder,),
+                ),
+                write=True,
+            )
+            return "Recommender lease released successfully!"
+        except Exception as e:
+            return f"An error occurred: {e}\n\tRelease Recommender"
+
+    def replace_neighbours(
+        self, neighbours: dict[str, list[tuple[str, float]]], holder: str, seq: int
+    ) -> str:
+        """
+        Replaces the stored neighbour lists of the given books.
+
+        The lists are only written while the holder still has the recommender lease, so a
+        process that lost it can't overwrite the new holder's lists.
+
+        Args:
+            neighbours (dict[str, list[tuple[str, float]]]): The ranked (neighbour ISBN, score) pairs per book ISBN.
+            holder (str): The process holding the lease, see claim_recommender.
+            seq (int): The catalog change log position the lists reflect.
+
+        Returns:
+            str: A message indicating the success or failure of the update.
+        """
+
+        def replace(conn: sqlite3.Connection) -> None:
+            fenced = conn.execute(
+                """
+                UPDATE recommender_state SET seq = ?
+                WHERE id = 1 AND holder = ? AND lease_until >= ?
+                """,
+                (seq, holder, time.time()),
+            ).rowcount
+            if not fenced:
+                raise RuntimeError(f"{holder} no longer holds the recommender lease")
+            conn.executemany(
+                "DELETE FROM book_neighbours WHERE isbn = ?",
+                [(isbn,) for isbn in neighbours],
+            )
+            conn.executemany(
+                "INSERT INTO book_neighbours (isbn, rank, neighbour_isbn, score) VALUES (?, ?, ?, ?)",
+                [
+                    (isbn, rank, neighbour, score)
+                    for isbn, ranked in neighbours.items()
+                    for rank, (neighbour, score) in enumerate(ranked)
+                ],
+            )
+
+        try:
+            self._run(self.db_name, replace, write=True)
+            return f"Neighbours of {len(neighbours)} books updated successfully!"
+        except Exception as e:
+            return f"An error occurred: {e}\n\tReplace Neighbours"
+
+    def get_similar_books(self, isbn: str, limit: int = 5) -> list[Tuple] | str:
+        """
+        Looks up the precomputed books most similar to the given one.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            limit (int): The maximum number of similar books to return.
+
+        Returns:
+            list[Tuple] or str: (isbn, title, authors, score) tuples, best match first, or an error message.
+        """
+        try:
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    """
+                    SELECT books.isbn, books.title, books.authors, book_neighbours.score
+                    FROM book_neighbours
+                    INNER JOIN books ON books.isbn = book_neighbours.neighbour_isbn
+                    WHERE book_neighbours.isbn = ?
+                    ORDER BY book_neighbours.rank
+                    LIMIT ?
+                    """,
+                    (isbn, limit),
+                ).fetchall(),
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Similar Books"
+
+    def get_catalog_changes(self, seq: int) -> dict | str:
+        """
+        Returns the books added, changed or deleted after a position in the catalog's change log.
+
+        Args:
+            seq (int): The sequence number already seen, 0 for everything.
+
+        Returns:
+            dict or str: The new position ("seq"), whether the log was pruned past seq and
+            everything must be read again ("reset"), and "books" as (isbn, row) pairs, where
+            row is None for deleted books. An error message on failure.
+        """
+
+        def read(conn: sqlite3.Connection) -> dict:
+            conn.execute("BEGIN")  # The rows as of the log position returned
+            reset, head = log_position(conn, "main", seq)
+            if reset:
+                return {"seq": head, "reset": True, "books": []}
+            rows = conn.execute(
+                "SELECT seq, op, isbn FROM change_log WHERE seq > ? AND op != 'reset' ORDER BY seq",
+                (seq,),
+            ).fetchall()
+            books = []
+            for isbn, op in {isbn: op for _, op, isbn in rows}.items():
+                row = None
+                if op != "delete":
+                    row = conn.execute(
+                        "SELECT * FROM books WHERE isbn = ?", (isbn,)
+                    ).fetchone()
+                books.append((isbn, row))
+            return {"seq": head, "reset": False, "books": books}
+
+        try:
+            return self._run(self.db_name, read)
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Catalog Changes"
+
+    def get_catalog_seq(self) -> int | str:
+        """
+        Returns the newest position in the catalog's change log, for indexes built from the whole catalog.
+
+        Returns:
+            int or str: The sequence number, 0 for an empty log, or an error message.
+        """
+        try:
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM change_log"
+                ).fetchone()[0],
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Catalog Seq"
+
+    def get_book_by_isbn(
+        self,
+        isbn: str,
+    ) -> (
+        Optional[
+            Tuple[str, str, str, str, str, int, int, Optional[str], Optional[str], int]
+        ]
+        | str
+    ):
+        """
+        Retrieves a book from the database based on its ISBN.
+
+        Args:
+            isbn (str): The ISBN of the book to retrieve.
+
+        Returns:
+            Optional[Tuple[str, str, str, str, str, int, int, Optional[str], Optional[str], int]] or str:
+                If the book is found, a tuple containing the book's information is returned.
+                If the book is not found, a string indicating an error is returned.
+        """
+        try:
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    "SELECT * FROM books WHERE isbn = ?", (isbn,)
+                ).fetchone(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}"
+
+    def get_book_by_title(
+        self,
+        title: str,
+    ) -> (
+        Optional[
+            Tuple[
+                str,
+                str,
+                str,
+                str,
+                str,
+                int,
+                int,
+            ]
+        ]
+        | str
+    ):
+        """
+        Retrieves a book from the database based on its title.
+
+        Args:
+            title (str): The title of the book to retrieve.
+
+        Returns:
+            Optional[Tuple[str, str, str, str, str, int, int, Optional[str], Optional[str], str, int]] or str:
+            - If a book with the given title is found, returns a tuple containing the book's information.
+            - If no book is found, returns None.
+            - If an error occurs during the retrieval process, returns an error message as a string.
+        """
+        try:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    BOOKSHELF_SELECT + "WHERE title = ?", (title,)
+                ).fetchone(),
+                attach_books=True,
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}"
+
+    def get_all_books(
+        self,
     ) -> (
         Optional[
             List[
@@ -319,16 +1301,86 @@ class BookDatabase:
 
             If an error occurs during the retrieval, None is returned.
         """
-        conn = sqlite3.connect(self.db_name)
-        c = conn.cursor()
         try:
-            c.execute("SELECT * FROM books")
-            books = c.fetchall()
-            conn.close()
-            return books
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute("SELECT * FROM books").fetchall(),
+                snapshot=True,
+            )
         except Exception as e:
             return f"An error occurred: {e}"
 
+    def get_book_list(self) -> list[Tuple] | str:
+        """
+        Retrieves the whole catalog without the book descriptions.
+
+        Returns:
+            list[Tuple] or str: The books, with the columns in BOOK_LIST_COLUMNS, or an error message.
+        """
+        try:
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    f"SELECT {', '.join(BOOK_LIST_COLUMNS)} FROM books"
+                ).fetchall(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Book List"
+
+    def _read_frame(
+        self,
+        db_path: str,
+        sql: str,
+        params: tuple,
+        attach_books: bool = False,
+    ) -> pd.DataFrame:
+        """Runs a read through _run and loads its rows into a typed, labelled DataFrame."""
+        return self._run(
+            db_path,
+            lambda conn: load_frame(conn, sql, params),
+            attach_books=attach_books,
+            snapshot=True,
+        )
+
+    def get_book_frame(self) -> pd.DataFrame | str:
+        """
+        Retrieves the whole catalog without the book descriptions as a typed DataFrame.
+
+        Returns:
+            pd.DataFrame or str: The books, with the columns in BOOK_LIST_COLUMNS under their page labels, or an error message.
+        """
+        try:
+            return self._read_frame(
+                self.db_name,
+                f"SELECT {', '.join(BOOK_LIST_COLUMNS)} FROM books",
+                (),
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Book Frame"
+
+    def get_description(self, isbn: str) -> Optional[str] | str:
+        """
+        Retrieves the description of a single book, for views that list books without it.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Optional[str] or str: The description, None if the book does not exist, or an error message.
+        """
+        try:
+            row = self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    "SELECT description FROM books WHERE isbn = ?", (isbn,)
+                ).fetchone(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Description"
+        return row[0] if row else None
+
     def update_book(
         self,
         isbn: str,
@@ -339,169 +1391,1335 @@ class BookDatabase:
         page_count: int,
         year: int,
     ) -> str:
-        conn = sqlite3.connect(self.db_name)
-        c = conn.cursor()
-        try:
-            c.execute(
+        def update(conn: sqlite3.Connection) -> None:
+            conn.execute(
                 """
                 UPDATE books
-                SET title = ?, authors = ?, publisher = ?, description = ?, page_count = ?, year = ?,
+                SET title = ?, authors = ?, publisher = ?, description = ?, page_count = ?, year = ?
                 WHERE isbn = ?
                 """,
-                (
-                    title,
-                    authors,
-                    publisher,
-                    description,
-                    page_count,
-                    year,
-                ),
+                (title, authors, publisher, description, page_count, year, isbn),
             )
-            conn.commit()
-            ret_msg = f"{title} with ISBN {isbn} updated successfully!"
+            conn.execute("DELETE FROM book_authors WHERE isbn = ?", (isbn,))
+            self._link_authors(conn, isbn, authors)
+
+        try:
+            self._run(self.db_name, update, write=True)
         except Exception as e:
-            ret_msg = f"An error occurred: {e}"
-        finally:
-            conn.close()
-            return ret_msg
+            return f"An error occurred: {e}"
+        self._refresh_book_summaries(isbn)
+        self.invalidate_bookshelf_cache()
+        return f"{title} with ISBN {isbn} updated successfully!"
 
     def delete_entry(self, isbn: str) -> str:
-        conn = sqlite3.connect(self.db_name)
-        c = conn.cursor()
-        ret_msg = ""
+        def delete(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM book_authors WHERE isbn = ?", (isbn,))
+            conn.execute("DELETE FROM book_categories WHERE isbn = ?", (isbn,))
+            conn.execute("DELETE FROM book_works WHERE isbn = ?", (isbn,))
+            # The recommender refills the lists that pointed at the book once it sees the delete
+            conn.execute(
+                "DELETE FROM book_neighbours WHERE isbn = ? OR neighbour_isbn = ?",
+                (isbn, isbn),
+            )
+            conn.execute("DELETE FROM books WHERE isbn = ?", (isbn,))
+
         try:
-            c.execute("DELETE FROM books WHERE isbn = ?", (isbn,))
-            ret_msg = f"Book with ISBN {isbn} deleted successfully!"
+            self._run(self.db_name, delete, write=True)
         except Exception as e:
-            ret_msg = f"An error occurred: {e}"
-        finally:
-            conn.close()
-        return ret_msg
+            return f"An error occurred: {e}"
+        self._refresh_book_summaries(isbn)
+        self.invalidate_bookshelf_cache()
+        return f"Book with ISBN {isbn} deleted successfully!"
 
-    # Bookshelf Functions
-    def add_to_bookshelf(self, book_id: str, username: str) -> str:
-        conn = sqlite3.connect(self.bookshelf_db)
-        self.attach_bookshelf_db(conn)
-        c = conn.cursor()
+    # Editions
+    def get_work_ids(self) -> dict[str, int] | str:
+        """
+        Retrieves the work_id of every book that has one.
+
+        Returns:
+            dict[str, int] or str: The work_id per ISBN, or an error message.
+        """
         try:
-            c.execute(
-                f"INSERT INTO bookshelf (isbn, owner, date_started, date_ended, owned, current_page) VALUES (?, ?, {str(now)}, {str(default_date)}, 'Owned', 0)",
-                (book_id, username),
+            return dict(
+                self._run(
+                    self.db_name,
+                    lambda conn: conn.execute(
+                        "SELECT isbn, work_id FROM book_works"
+                    ).fetchall(),
+                )
             )
-            conn.commit()
-            return f"Book with ISBN {book_id} added to your bookshelf!"
         except Exception as e:
-            return f"An error occurred: {e}\n\tAdd To Bookshelf"
-        finally:
-            conn.close()
+            return f"An error occurred: {e}\n\tGet Work IDs"
+
+    def set_work_ids(self, assignments: dict[str, int]) -> str:
+        """
+        Stores the work_id of the given books in a single transaction.
+
+        Args:
+            assignments (dict[str, int]): The work_id per ISBN.
+
+        Returns:
+            str: A message indicating the success or failure of the update.
+        """
+
+        def update(conn: sqlite3.Connection) -> int:
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT INTO book_works (isbn, work_id) VALUES (?, ?)
+                    ON CONFLICT (isbn) DO UPDATE SET work_id = excluded.work_id
+                    WHERE work_id != excluded.work_id
+                """,
+                assignments.items(),
+            )
+            return conn.total_changes - before
 
-    def update_bookshelf(
-        self,
-        book_id: str,
-        username: str,
-        date_started: str,
-        date_ended: str,
-        owned: str,
-        current_page: int,
-    ) -> tuple[bool, str]:
         try:
-            with sqlite3.connect(self.bookshelf_db) as bookshelf_conn:
-                cursor = bookshelf_conn.cursor()
-                cursor.execute(
-                    """
-                    UPDATE bookshelf
-                    SET date_started = ?, date_ended = ?, owned = ?, current_page = ?
-                    WHERE isbn = ? AND owner = ?
+            changed = self._run(self.db_name, update, write=True)
+            return f"Work IDs of {changed} books updated successfully!"
+        except Exception as e:
+            return f"An error occurred: {e}\n\tSet Work IDs"
+
+    def get_editions(self, isbn: str) -> list[Tuple] | str:
+        """
+        Retrieves the other books of the same work as a book.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            list[Tuple] or str: The other editions, with the columns in BOOK_LIST_COLUMNS, or an error message.
+        """
+        columns = ", ".join(f"books.{column}" for column in BOOK_LIST_COLUMNS)
+        try:
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    f"""
+                    SELECT {columns}
+                    FROM book_works AS edition
+                    INNER JOIN book_works AS work ON work.work_id = edition.work_id
+                    INNER JOIN books ON books.isbn = edition.isbn
+                    WHERE work.isbn = ? AND edition.isbn != ?
+                    ORDER BY books.year, books.isbn
                     """,
-                    (date_started, date_ended, owned, current_page, book_id, username),
-                )
-                return (True, f"Book with ISBN {book_id} updated successfully!")
+                    (isbn, isbn),
+                ).fetchall(),
+                snapshot=True,
+            )
         except Exception as e:
-            return (False, f"An error occurred: {e}\n\tUpdate Bookshelf")
+            return f"An error occurred: {e}\n\tGet Editions"
+
+    # Authors
+    def _link_authors(self, conn: sqlite3.Connection, isbn: str, authors: str) -> None:
+        """Links a book to its authors, creating the authors that are new."""
+        for position, name in enumerate(split_authors(authors)):
+            conn.execute(
+                "INSERT OR IGNORE INTO authors (name, name_key) VALUES (?, ?)",
+                (name, author_key(name)),
+            )
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO book_authors (isbn, author_id, position)
+                    SELECT ?, author_id, ? FROM authors WHERE name_key = ?
+                """,
+                (isbn, position, author_key(name)),
+            )
+
+    def link_missing_authors(
+        self, after: str = "", limit: int = 1000
+    ) -> tuple[int, str] | str:
+        """
+        Links one batch of books that have no author links yet, in ISBN order.
+
+        Args:
+            after (str): The last ISBN of the previous batch, "" to start from the beginning.
+            limit (int): The maximum number of books in the batch.
+
+        Returns:
+            tuple[int, str] or str: The number of books scanned and the last ISBN, or an error message.
+        """
+
+        def link(conn: sqlite3.Connection) -> tuple[int, str]:
+            books = conn.execute(
+                """
+                SELECT isbn, authors FROM books
+                WHERE isbn > ?
+                AND NOT EXISTS (SELECT 1 FROM book_authors WHERE book_authors.isbn = books.isbn)
+                ORDER BY isbn
+                LIMIT ?
+                """,
+                (after, limit),
+            ).fetchall()
+            for isbn, authors in books:
+                self._link_authors(conn, isbn, authors)
+            return (len(books), books[-1][0] if books else after)
 
-    def check_bookshelf_entry(self, book_id: str, username: str) -> tuple[bool, str]:
         try:
-            with sqlite3.connect(self.bookshelf_db) as bookshelf_conn:
-                cursor = bookshelf_conn.cursor()
-                cursor.execute(
-                    "SELECT * FROM bookshelf WHERE isbn = ? AND owner = ?",
-                    (book_id, username),
-                )
-                book = cursor.fetchone()
-                if book:
-                    return (True, "Book already exists in your bookshelf!")
-                return (False, "Book does not exist in your bookshelf.")
+            return self._run(self.db_name, link, write=True)
         except Exception as e:
-            return (False, f"An error occurred: {e}\n\tCheck Bookshelf Entry")
+            return f"An error occurred: {e}\n\tLink Missing Authors"
 
-    def get_from_bookshelf(self, username: str) -> Optional[list[Tuple]] | str:
+    def search_authors(self, prefix: str, limit: int = 20) -> list[Tuple] | str:
+        """
+        Finds the authors whose name starts with the prefix, ignoring case.
+
+        Args:
+            prefix (str): The beginning of the author's name.
+            limit (int): The maximum number of authors to return.
+
+        Returns:
+            list[Tuple] or str: (name, book_count) rows ordered by name, or an error message.
+        """
+        key = author_key(prefix)
         try:
-            with sqlite3.connect(self.bookshelf_db) as bookshelf_conn:
-                bookshelf_conn.execute(f"ATTACH DATABASE '{self.db_name}' AS books_db")
-                cursor = bookshelf_conn.cursor()
-                cursor.execute(
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute(
                     """
                     SELECT
-                        books_db.books.isbn,
-                        books_db.books.title,
-                        books_db.books.authors,
-                        books_db.books.publisher,
-                        books_db.books.description,
-                        books_db.books.page_count,
-                        books_db.books.year,
-                        bookshelf.date_started,
-                        bookshelf.date_ended,
-                        bookshelf.owned,
-                        bookshelf.current_page
-                    FROM bookshelf
-                    INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
-                    WHERE owner = ?
+                        authors.name,
+                        (SELECT COUNT(*) FROM book_authors
+                         WHERE book_authors.author_id = authors.author_id)
+                    FROM authors
+                    WHERE name_key >= ? AND name_key < ?
+                    ORDER BY name_key
+                    LIMIT ?
                     """,
-                    (username,),
-                )
-                books = cursor.fetchall()
+                    (key, key + "\U0010ffff", limit),
+                ).fetchall(),
+                snapshot=True,
+            )
         except Exception as e:
-            return f"An error occurred: {e}\n\tGet From Bookshelf"
-        return books
+            return f"An error occurred: {e}\n\tSearch Authors"
 
-    def get_one_book_bookshelf(self, book_id: str, owner: str) -> Optional[Tuple] | str:
-        try:
-            with sqlite3.connect(self.bookshelf_db) as bookshelf_conn:
-                bookshelf_conn.execute(f"ATTACH DATABASE '{self.db_name}' AS books_db")
-                cursor = bookshelf_conn.cursor()
-                cursor.execute(
+    def get_books_by_author(
+        self, author: str, limit: int = 50, offset: int = 0
+    ) -> list[Tuple] | str:
+        """
+        Retrieves the books of an author through the author index, without scanning the catalog.
+
+        Args:
+            author (str): The author's name, matched ignoring case and extra spaces.
+            limit (int): The maximum number of books to return.
+            offset (int): The number of books to skip.
+
+        Returns:
+            list[Tuple] or str: The books ordered by year and title, with the columns in BOOK_LIST_COLUMNS, or an error message.
+        """
+        try:
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    BOOKS_BY_AUTHOR_SELECT, (author_key(author), limit, offset)
+                ).fetchall(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Books By Author"
+
+    def get_books_by_author_frame(
+        self, author: str, limit: int = 50, offset: int = 0
+    ) -> pd.DataFrame | str:
+        """
+        Retrieves one page of an author's books as a typed DataFrame.
+
+        Args:
+            author (str): The author's name, matched ignoring case and extra spaces.
+            limit (int): The maximum number of books to return.
+            offset (int): The number of books to skip.
+
+        Returns:
+            pd.DataFrame or str: The books ordered by year and title, with the columns in BOOK_LIST_COLUMNS under their page labels, or an error message.
+        """
+        try:
+            return self._read_frame(
+                self.db_name,
+                BOOKS_BY_AUTHOR_SELECT,
+                (author_key(author), limit, offset),
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Books By Author Frame"
+
+    # Bookshelf Functions
+    def add_to_bookshelf(self, book_id: str, username: str) -> str:
+        def add(conn: sqlite3.Connection) -> None:
+            # Started today, the end date stays NULL until the book is finished
+            conn.execute(
+                "INSERT INTO bookshelf (isbn, owner, date_started, date_ended, owned, current_page) VALUES (?, ?, ?, NULL, 'Owned', 0)",
+                (book_id, username, to_epoch_day(date.today())),
+            )
+            self._count_in_summary(conn, book_id, username, 1)
+
+        try:
+            self._run(self.bookshelf_db, add, attach_books=True, write=True)
+        except Exception as e:
+            return f"An error occurred: {e}\n\tAdd To Bookshelf"
+        self.invalidate_bookshelf_cache(username)
+        return f"Book with ISBN {book_id} added to your bookshelf!"
+
+    def update_bookshelf(
+        self,
+        book_id: str,
+        username: str,
+        date_started: Optional[date | str],
+        date_ended: Optional[date | str],
+        owned: str,
+        current_page: int,
+    ) -> tuple[bool, str]:
+        def update(conn: sqlite3.Connection) -> int:
+            started, ended = to_epoch_day(date_started), to_epoch_day(date_ended)
+            before = self._finished_year(conn, book_id, username)
+            self._count_in_summary(conn, book_id, username, -1)
+            # A book counts as finished once the current page reaches its page count,
+            # on its end date or today if it has none
+            updated = conn.execute(
+                """
+                UPDATE bookshelf
+                SET date_started = ?, date_ended = ?, owned = ?, current_page = ?,
+                    date_finished = CASE
+                        WHEN ? >= (
+                            SELECT NULLIF(page_count, 0) FROM books_db.books
+                            WHERE books_db.books.isbn = bookshelf.isbn
+                        ) THEN COALESCE(?, ?)
+                        ELSE NULL
+                    END
+                WHERE isbn = ? AND owner = ?
+                """,
+                (
+                    started,
+                    ended,
+                    owned,
+                    current_page,
+                    current_page,
+                    ended,
+                    to_epoch_day(date.today()),
+                    book_id,
+                    username,
+                ),
+            )
+            self._count_in_summary(conn, book_id, username, 1)
+            after = self._finished_year(conn, book_id, username)
+            for year in {before, after} - {None}:
+                self._refresh_leaderboard(conn, year)
+            return updated.rowcount
+
+        try:
+            updated = self._run(
+                self.bookshelf_db, update, attach_books=True, write=True
+            )
+        except Exception as e:
+            return (False, f"An error occurred: {e}\n\tUpdate Bookshelf")
+        if not updated:
+            return (False, f"Book with ISBN {book_id} is not in your bookshelf.")
+        self.invalidate_bookshelf_cache(username)
+        return (True, f"Book with ISBN {book_id} updated successfully!")
+
+    def check_bookshelf_entry(self, book_id: str, username: str) -> tuple[bool, str]:
+        try:
+            book = self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    "SELECT * FROM bookshelf WHERE isbn = ? AND owner = ?",
+                    (book_id, username),
+                ).fetchone(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return (False, f"An error occurred: {e}\n\tCheck Bookshelf Entry")
+        if book:
+            return (True, "Book already exists in your bookshelf!")
+        return (False, "Book does not exist in your bookshelf.")
+
+    def get_from_bookshelf(self, username: str) -> Optional[list[Tuple]] | str:
+        try:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    BOOKSHELF_SELECT + "WHERE owner = ?", (username,)
+                ).fetchall(),
+                attach_books=True,
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet From Bookshelf"
+
+    def _shelf_generations(self) -> tuple[int, int]:
+        """Reads the write generation of the bookshelf and books files, which every shelf cache key ends with."""
+        return self._run(
+            self.bookshelf_db,
+            lambda conn: conn.execute(
+                """
+                SELECT
+                    (SELECT generation FROM write_generation),
+                    (SELECT generation FROM books_db.write_generation)
+                """
+            ).fetchone(),
+            attach_books=True,
+            snapshot=True,
+        )
+
+    def _shelf_filter(
+        self,
+        username: str,
+        categories: tuple[str, ...] = (),
+        year_range: Optional[tuple[int, int]] = None,
+        owned: tuple[str, ...] = (),
+        finished: Optional[bool] = None,
+    ) -> tuple[str, list]:
+        """Builds the WHERE clause and parameters selecting a filtered bookshelf."""
+        clauses, params = ["bookshelf.owner = ?"], [username]
+        if categories:
+            clauses.append(
+                f"""bookshelf.isbn IN (
+                    SELECT isbn FROM books_db.book_categories
+                    WHERE category IN ({", ".join("?" * len(categories))})
+                )"""
+            )
+            params.extend(categories)
+        if year_range:
+            clauses.append("books_db.books.year BETWEEN ? AND ?")
+            params.extend(year_range)
+        if owned:
+            clauses.append(f"bookshelf.owned IN ({', '.join('?' * len(owned))})")
+            params.extend(owned)
+        if finished is not None:
+            clauses.append(
+                f"bookshelf.date_finished IS {'NOT NULL' if finished else 'NULL'}"
+            )
+        return "WHERE " + " AND ".join(clauses), params
+
+    def get_bookshelf_frame(
+        self,
+        username: str,
+        categories: tuple[str, ...] = (),
+        year_range: Optional[tuple[int, int]] = None,
+        owned: tuple[str, ...] = (),
+        finished: Optional[bool] = None,
+    ) -> pd.DataFrame | str:
+        """
+        Retrieves the books of the user's bookshelf that match the filters as a typed DataFrame.
+
+        Frames are kept in the shared query cache until a write to either file changes
+        them, so callers must not modify the returned frame in place.
+
+        Args:
+            username (str): The owner of the bookshelf.
+            categories (tuple[str, ...]): Keeps books in any of these categories, all books if empty.
+            year_range (Optional[tuple[int, int]]): Keeps books published between these years, inclusive.
+            owned (tuple[str, ...]): Keeps books with any of these owned statuses, all books if empty.
+            finished (Optional[bool]): Keeps only finished or only unfinished books, all books if None.
+
+        Returns:
+            pd.DataFrame or str: The bookshelf, with the columns in BOOKSHELF_LIST_COLUMNS under their page labels, or an error message.
+        """
+        where, params = self._shelf_filter(
+            username, categories, year_range, owned, finished
+        )
+        try:
+            return shelf_cache.get_or_load(
+                (
+                    "bookshelf_frame",
+                    self.bookshelf_db,
+                    username,
+                    where,
+                    tuple(params),
+                    self._shelf_generations(),
+                ),
+                lambda: self._read_frame(
+                    self.bookshelf_db,
+                    BOOKSHELF_LIST_SELECT + where,
+                    tuple(params),
+                    attach_books=True,
+                ),
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Bookshelf Frame"
+
+    def get_bookshelf_window(
+        self,
+        username: str,
+        categories: tuple[str, ...] = (),
+        year_range: Optional[tuple[int, int]] = None,
+        owned: tuple[str, ...] = (),
+        finished: Optional[bool] = None,
+        sort_by: str = "title",
+        descending: bool = False,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> pd.DataFrame | str:
+        """
+        Retrieves one sorted page of the books of the user's bookshelf that match the filters.
+
+        Sorting and paging happen in SQL, so only the rows shown are read and typed.
+        Pages are kept in the shared query cache until a write to either file changes them.
+
+        Args:
+            username (str): The owner of the bookshelf.
+            categories (tuple[str, ...]): Keeps books in any of these categories, all books if empty.
+            year_range (Optional[tuple[int, int]]): Keeps books published between these years, inclusive.
+            owned (tuple[str, ...]): Keeps books with any of these owned statuses, all books if empty.
+            finished (Optional[bool]): Keeps only finished or only unfinished books, all books if None.
+            sort_by (str): One of SHELF_SORT_COLUMNS.
+            descending (bool): Whether to sort from the largest value down.
+            limit (int): The maximum number of books to return.
+            offset (int): The number of books to skip.
+
+        Returns:
+            pd.DataFrame or str: The page, with the columns in BOOKSHELF_LIST_COLUMNS under their page labels, or an error message.
+        """
+        if sort_by not in SHELF_SORT_COLUMNS:
+            return (
+                f"An error occurred: cannot sort by {sort_by}\n\tGet Bookshelf Window"
+            )
+        where, params = self._shelf_filter(
+            username, categories, year_range, owned, finished
+        )
+        direction = "DESC" if descending else "ASC"
+        order = f"ORDER BY {SHELF_SORT_COLUMNS[sort_by]} {direction}, bookshelf.isbn {direction}"
+        try:
+            return shelf_cache.get_or_load(
+                (
+                    "bookshelf_window",
+                    self.bookshelf_db,
+                    username,
+                    where,
+                    tuple(params),
+                    order,
+                    limit,
+                    offset,
+                    self._shelf_generations(),
+                ),
+                lambda: self._read_frame(
+                    self.bookshelf_db,
+                    f"{BOOKSHELF_LIST_SELECT} {where} {order} LIMIT ? OFFSET ?",
+                    (*params, limit, offset),
+                    attach_books=True,
+                ),
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Bookshelf Window"
+
+    def get_bookshelf_totals(
+        self,
+        username: str,
+        categories: tuple[str, ...] = (),
+        year_range: Optional[tuple[int, int]] = None,
+        owned: tuple[str, ...] = (),
+        finished: Optional[bool] = None,
+    ) -> dict[str, int] | str:
+        """
+        Counts the books and pages of the user's bookshelf that match the filters in one aggregate query.
+
+        Args:
+            username (str): The owner of the bookshelf.
+            categories (tuple[str, ...]): Keeps books in any of these categories, all books if empty.
+            year_range (Optional[tuple[int, int]]): Keeps books published between these years, inclusive.
+            owned (tuple[str, ...]): Keeps books with any of these owned statuses, all books if empty.
+            finished (Optional[bool]): Keeps only finished or only unfinished books, all books if None.
+
+        Returns:
+            dict[str, int] or str: books, owned (books marked "Owned"), read_pages and total_pages, or an error message.
+        """
+        where, params = self._shelf_filter(
+            username, categories, year_range, owned, finished
+        )
+        try:
+            row = shelf_cache.get_or_load(
+                (
+                    "bookshelf_totals",
+                    self.bookshelf_db,
+                    username,
+                    where,
+                    tuple(params),
+                    self._shelf_generations(),
+                ),
+                lambda: self._run(
+                    self.bookshelf_db,
+                    lambda conn: conn.execute(
+                        f"""
+                        SELECT
+                            COUNT(*),
+                            COALESCE(SUM(bookshelf.owned = 'Owned'), 0),
+                            COALESCE(SUM(bookshelf.current_page), 0),
+                            COALESCE(SUM(books_db.books.page_count), 0)
+                        FROM bookshelf
+                        INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+                        {where}
+                        """,
+                        params,
+                    ).fetchone(),
+                    attach_books=True,
+                    snapshot=True,
+                ),
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Bookshelf Totals"
+        return dict(zip(("books", "owned", "read_pages", "total_pages"), row))
+
+    def get_bookshelf_facets(self, username: str) -> dict[str, dict] | str:
+        """
+        Counts the user's books per category, owned status and finished status in one grouped query.
+
+        Args:
+            username (str): The owner of the bookshelf.
+
+        Returns:
+            dict[str, dict] or str: {"category": {name: count}, "owned": {status: count},
+            "finished": {True/False: count}, "year": {"min": year, "max": year}}, or an error message.
+        """
+
+        def load() -> list[Tuple]:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    """
+                    WITH shelf AS (
+                        SELECT
+                            bookshelf.isbn,
+                            bookshelf.owned,
+                            bookshelf.date_finished IS NOT NULL AS finished,
+                            books_db.books.year
+                        FROM bookshelf
+                        INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+                        WHERE bookshelf.owner = ?
+                    )
+                    SELECT 'category', book_categories.category, COUNT(*)
+                    FROM shelf
+                    INNER JOIN books_db.book_categories ON book_categories.isbn = shelf.isbn
+                    GROUP BY book_categories.category
+                    UNION ALL
+                    SELECT 'owned', owned, COUNT(*) FROM shelf GROUP BY owned
+                    UNION ALL
+                    SELECT 'finished', finished, COUNT(*) FROM shelf GROUP BY finished
+                    UNION ALL
+                    SELECT 'year_min', MIN(NULLIF(year, 0)), COUNT(*) FROM shelf
+                    UNION ALL
+                    SELECT 'year_max', MAX(NULLIF(year, 0)), COUNT(*) FROM shelf
+                    """,
+                    (username,),
+                ).fetchall(),
+                attach_books=True,
+                snapshot=True,
+            )
+
+        try:
+            rows = shelf_cache.get_or_load(
+                (
+                    "bookshelf_facets",
+                    self.bookshelf_db,
+                    username,
+                    self._shelf_generations(),
+                ),
+                load,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Bookshelf Facets"
+        facets: dict[str, dict] = {
+            "category": {},
+            "owned": {},
+            "finished": {},
+            "year": {},
+        }
+        for facet, value, count in rows:
+            if facet.startswith("year_"):
+                facets["year"][facet[5:]] = value
+            else:
+                facets[facet][bool(value) if facet == "finished" else value] = count
+        return facets
+
+    def get_books_page(self, limit: int, offset: int = 0) -> list[Tuple] | str:
+        """
+        Retrieves one page of the books catalog, ordered by ISBN.
+
+        Args:
+            limit (int): The maximum number of books to return.
+            offset (int): The number of books to skip.
+
+        Returns:
+            list[Tuple] or str: The books in the page, or an error message.
+        """
+        try:
+            return self._run(
+                self.db_name,
+                lambda conn: conn.execute(
+                    "SELECT * FROM books ORDER BY isbn LIMIT ? OFFSET ?",
+                    (limit, offset),
+                ).fetchall(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Books Page"
+
+    def get_bookshelf_page(
+        self, username: str, limit: int, offset: int = 0
+    ) -> list[Tuple] | str:
+        """
+        Retrieves one page of the user's bookshelf, ordered by ISBN.
+
+        Args:
+            username (str): The owner of the bookshelf.
+            limit (int): The maximum number of books to return.
+            offset (int): The number of books to skip.
+
+        Returns:
+            list[Tuple] or str: The bookshelf rows in the page, or an error message.
+        """
+        try:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    BOOKSHELF_SELECT
+                    + "WHERE owner = ? ORDER BY bookshelf.isbn LIMIT ? OFFSET ?",
+                    (username, limit, offset),
+                ).fetchall(),
+                attach_books=True,
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Bookshelf Page"
+
+    def _iter(
+        self,
+        db_path: str,
+        sql: str,
+        params: tuple = (),
+        attach_books: bool = False,
+        chunk_size: int = 500,
+    ) -> Iterator[Tuple]:
+        """
+        Streams a query's rows, fetching chunk_size rows from the cursor at a time.
+
+        The connection stays open until the generator is exhausted or closed. It may be
+        resumed from different threads (e.g. by a streaming HTTP response), one at a time.
+        """
+        conn = self._connect(db_path, check_same_thread=False)
+        try:
+            if attach_books:
+                conn.execute("ATTACH DATABASE ? AS books_db", (self.db_name,))
+            cursor = conn.execute(sql, params)
+            while rows := cursor.fetchmany(chunk_size):
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_all_books(self, chunk_size: int = 500) -> Iterator[Tuple]:
+        """
+        Streams the whole catalog without materializing it.
+
+        Args:
+            chunk_size (int): The number of rows fetched from SQLite at a time.
+
+        Returns:
+            Iterator[Tuple]: The books, ordered by ISBN, with the columns in BOOK_COLUMNS.
+
+        Raises:
+            sqlite3.Error: If the query fails.
+        """
+        return self._iter(
+            self.db_name, "SELECT * FROM books ORDER BY isbn", chunk_size=chunk_size
+        )
+
+    def iter_bookshelf(self, username: str, chunk_size: int = 500) -> Iterator[Tuple]:
+        """
+        Streams the user's bookshelf without materializing it.
+
+        Args:
+            username (str): The owner of the bookshelf.
+            chunk_size (int): The number of rows fetched from SQLite at a time.
+
+        Returns:
+            Iterator[Tuple]: The bookshelf rows, ordered by ISBN, with the columns in BOOKSHELF_COLUMNS.
+
+        Raises:
+            sqlite3.Error: If the query fails.
+        """
+        return self._iter(
+            self.bookshelf_db,
+            BOOKSHELF_SELECT + "WHERE owner = ? ORDER BY bookshelf.isbn",
+            (username,),
+            attach_books=True,
+            chunk_size=chunk_size,
+        )
+
+    def invalidate_bookshelf_cache(self, username: Optional[str] = None) -> None:
+        """
+        Drops cached bookshelf results.
+
+        Args:
+            username (Optional[str]): The user whose results are dropped. Drops every user's results if None.
+        """
+        shelf_cache.invalidate(
+            lambda key: key[1] == self.bookshelf_db
+            and (username is None or key[2] == username)
+        )
+
+    def get_one_book_bookshelf(self, book_id: str, owner: str) -> Optional[Tuple] | str:
+        try:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    BOOKSHELF_SELECT
+                    + "WHERE bookshelf.isbn = ? AND bookshelf.owner = ?",
+                    (book_id, owner),
+                ).fetchone(),
+                attach_books=True,
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet One Book Bookshelf"
+
+    def remove_from_bookshelf(self, book_id: str, username: str) -> str:
+        def remove(conn: sqlite3.Connection) -> int:
+            year = self._finished_year(conn, book_id, username)
+            self._count_in_summary(conn, book_id, username, -1)
+            removed = conn.execute(
+                "DELETE FROM bookshelf WHERE isbn = ? AND owner = ?",
+                (book_id, username),
+            )
+            if year is not None:
+                self._refresh_leaderboard(conn, year)
+            return removed.rowcount
+
+        try:
+            removed = self._run(
+                self.bookshelf_db, remove, attach_books=True, write=True
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tRemove From Bookshelf"
+        if not removed:
+            return f"Book with ISBN {book_id} is not in your bookshelf."
+        self.invalidate_bookshelf_cache(username)
+        return f"Book with ISBN {book_id} removed from your bookshelf!"
+
+    # User Summary
+    def _count_in_summary(
+        self, conn: sqlite3.Connection, book_id: str, username: str, sign: int
+    ) -> None:
+        """
+        Adds (sign 1) or subtracts (sign -1) one bookshelf row's counts to its owner's summary.
+
+        Writes call it with -1 before they change a row and with 1 after, so the
+        summary follows every write in the same transaction without rescanning the shelf.
+        """
+        conn.execute(
+            """
+            INSERT INTO user_summary (owner, books, owned, read_pages, total_pages)
+                SELECT
+                    bookshelf.owner,
+                    ?,
+                    ? * (bookshelf.owned = 'Owned'),
+                    ? * COALESCE(bookshelf.current_page, 0),
+                    ? * COALESCE(books_db.books.page_count, 0)
+                FROM bookshelf
+                INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+                WHERE bookshelf.isbn = ? AND bookshelf.owner = ?
+                ON CONFLICT (owner) DO UPDATE SET
+                    books = books + excluded.books,
+                    owned = owned + excluded.owned,
+                    read_pages = read_pages + excluded.read_pages,
+                    total_pages = total_pages + excluded.total_pages
+            """,
+            (sign, sign, sign, sign, book_id, username),
+        )
+
+    def _refresh_user_summary(
+        self, conn: sqlite3.Connection, owners_sql: str, params: tuple = ()
+    ) -> None:
+        """Recomputes the summaries of the owners selected by owners_sql from their shelves."""
+        conn.execute(f"DELETE FROM user_summary WHERE owner IN ({owners_sql})", params)
+        conn.execute(
+            f"""
+            INSERT INTO user_summary (owner, books, owned, read_pages, total_pages)
+            {USER_SUMMARY_SELECT}
+            WHERE bookshelf.owner IN ({owners_sql})
+            GROUP BY bookshelf.owner
+            """,
+            params,
+        )
+
+    def _refresh_book_summaries(self, isbn: str) -> None:
+        """Recomputes the summaries of the users shelving a book whose page count changed or that was deleted."""
+        try:
+            self._run(
+                self.bookshelf_db,
+                lambda conn: self._refresh_user_summary(
+                    conn, "SELECT owner FROM bookshelf WHERE isbn = ?", (isbn,)
+                ),
+                attach_books=True,
+                write=True,
+            )
+        except Exception as e:
+            print(
+                f"[WARN] Could not refresh the summaries of the readers of {isbn}: {e}"
+            )
+
+    def _rebuild_user_summary(self, conn: sqlite3.Connection) -> None:
+        """Recomputes every user's summary."""
+        conn.execute("DELETE FROM user_summary")
+        conn.execute(
+            f"""
+            INSERT INTO user_summary (owner, books, owned, read_pages, total_pages)
+            {USER_SUMMARY_SELECT}
+            GROUP BY bookshelf.owner
+            """
+        )
+
+    def get_user_summary(self, username: str) -> dict[str, int] | str:
+        """
+        Retrieves the maintained totals of the user's whole bookshelf with a single primary key lookup.
+
+        Args:
+            username (str): The owner of the bookshelf.
+
+        Returns:
+            dict[str, int] or str: books, owned (books marked "Owned"), read_pages and total_pages, or an error message.
+        """
+        try:
+            row = self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    f"SELECT {', '.join(USER_SUMMARY_COLUMNS)} FROM user_summary WHERE owner = ?",
+                    (username,),
+                ).fetchone(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet User Summary"
+        return dict(zip(USER_SUMMARY_COLUMNS, row or (0, 0, 0, 0)))
+
+    def check_user_summary(self, repair: bool = True) -> list[Tuple] | str:
+        """
+        Compares every stored user summary with one recomputed from the bookshelf.
+
+        Args:
+            repair (bool): Whether to rebuild the whole table when a summary is off.
+
+        Returns:
+            list[Tuple] or str: One (owner, stored, expected) row per summary that is
+            off, each count tuple in USER_SUMMARY_COLUMNS order, or an error message.
+        """
+
+        def check(conn: sqlite3.Connection) -> list[Tuple]:
+            stored = {
+                row[0]: tuple(row[1:])
+                for row in conn.execute(
+                    f"SELECT owner, {', '.join(USER_SUMMARY_COLUMNS)} FROM user_summary"
+                )
+            }
+            expected = {
+                row[0]: tuple(row[1:])
+                for row in conn.execute(
+                    USER_SUMMARY_SELECT + "GROUP BY bookshelf.owner"
+                )
+            }
+            empty = (0,) * len(USER_SUMMARY_COLUMNS)
+            drift = [
+                (owner, stored.get(owner, empty), expected.get(owner, empty))
+                for owner in sorted(stored.keys() | expected.keys())
+                if stored.get(owner, empty) != expected.get(owner, empty)
+            ]
+            if drift and repair:
+                self._rebuild_user_summary(conn)
+            return drift
+
+        try:
+            return self._run(self.bookshelf_db, check, attach_books=True, write=True)
+        except Exception as e:
+            return f"An error occurred: {e}\n\tCheck User Summary"
+
+    # Leaderboard
+    def _finished_year(
+        self, conn: sqlite3.Connection, book_id: str, username: str
+    ) -> Optional[int]:
+        """Returns the year a bookshelf entry was finished in, or None if it is unfinished."""
+        row = conn.execute(
+            "SELECT date_finished FROM bookshelf WHERE isbn = ? AND owner = ?",
+            (book_id, username),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return from_epoch_day(row[0]).year
+
+    def _refresh_leaderboard(self, conn: sqlite3.Connection, year: int) -> None:
+        """
+        Recomputes one year of the cached leaderboard.
+
+        Only the books finished in that year are read, through the date_finished index,
+        and every user is ranked by books and by pages with window functions.
+        """
+        conn.execute("DELETE FROM leaderboard WHERE year = ?", (year,))
+        conn.execute(
+            """
+            INSERT INTO leaderboard (
+                year, owner, books_finished, pages_finished, books_rank, pages_rank
+            )
+            SELECT
+                ?,
+                owner,
+                books_finished,
+                pages_finished,
+                RANK() OVER (ORDER BY books_finished DESC),
+                RANK() OVER (ORDER BY pages_finished DESC)
+            FROM (
+                SELECT
+                    bookshelf.owner AS owner,
+                    COUNT(*) AS books_finished,
+                    COALESCE(SUM(books_db.books.page_count), 0) AS pages_finished
+                FROM bookshelf
+                INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+                WHERE bookshelf.date_finished >= ? AND bookshelf.date_finished < ?
+                GROUP BY bookshelf.owner
+            )
+            """,
+            (year, to_epoch_day(date(year, 1, 1)), to_epoch_day(date(year + 1, 1, 1))),
+        )
+
+    def _rebuild_leaderboard(self, conn: sqlite3.Connection) -> None:
+        """Recomputes every year of the cached leaderboard."""
+        conn.execute("DELETE FROM leaderboard")
+        years = conn.execute(
+            """
+            SELECT DISTINCT CAST(strftime('%Y', date_finished * 86400, 'unixepoch') AS INTEGER)
+            FROM bookshelf WHERE date_finished IS NOT NULL
+            """
+        ).fetchall()
+        for (year,) in years:
+            self._refresh_leaderboard(conn, year)
+
+    def rebuild_leaderboard(self) -> str:
+        """
+        Recomputes the whole cached leaderboard from the bookshelf.
+
+        Returns:
+            str: A message indicating the status of the rebuild.
+        """
+        try:
+            self._run(
+                self.bookshelf_db,
+                self._rebuild_leaderboard,
+                attach_books=True,
+                write=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tRebuild Leaderboard"
+        return "Leaderboard rebuilt successfully!"
+
+    def get_leaderboard(
+        self, year: int, order_by: str = "books", limit: int = 50
+    ) -> list[Tuple] | str:
+        """
+        Retrieves the cached rankings of a year.
+
+        Args:
+            year (int): The year the books were finished in.
+            order_by (str): "books" to rank by books finished, "pages" to rank by pages read.
+            limit (int): The maximum number of users to return.
+
+        Returns:
+            list[Tuple] or str: (owner, books_finished, pages_finished, books_rank, pages_rank) rows, or an error message.
+        """
+        rank_column = {"books": "books_rank", "pages": "pages_rank"}[order_by]
+        try:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    f"""
+                    SELECT owner, books_finished, pages_finished, books_rank, pages_rank
+                    FROM leaderboard
+                    WHERE year = ?
+                    ORDER BY {rank_column}, owner
+                    LIMIT ?
+                    """,
+                    (year, limit),
+                ).fetchall(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Leaderboard"
+
+    def get_leaderboard_entry(self, year: int, owner: str) -> Optional[Tuple] | str:
+        """
+        Retrieves a user's cached ranking in a year.
+
+        Args:
+            year (int): The year the books were finished in.
+            owner (str): The user.
+
+        Returns:
+            Optional[Tuple] or str: (books_finished, pages_finished, books_rank, pages_rank), None if the user finished nothing that year, or an error message.
+        """
+        try:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    """
+                    SELECT books_finished, pages_finished, books_rank, pages_rank
+                    FROM leaderboard
+                    WHERE year = ? AND owner = ?
+                    """,
+                    (year, owner),
+                ).fetchone(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Leaderboard Entry"
+
+    def get_leaderboard_years(self) -> list[int] | str:
+        """
+        Retrieves the years that have a leaderboard, most recent first.
+
+        Returns:
+            list[int] or str: The years, or an error message.
+        """
+        try:
+            rows = self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    "SELECT DISTINCT year FROM leaderboard ORDER BY year DESC"
+                ).fetchall(),
+                snapshot=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Leaderboard Years"
+        return [year for (year,) in rows]
+
+    # Change Log
+    def changes_since(self, seq: int, owner: Optional[str] = None) -> dict | str:
+        """
+        Returns what changed in the catalog and in a user's bookshelf after a sync cursor.
+
+        Only the latest change per book is returned, together with the row as it is now,
+        so a sync costs O(changes) rather than a re-read of the whole library.
+
+        Args:
+            seq (int): The cursor returned by the previous call, or 0 for a full sync.
+            owner (Optional[str]): Limits the bookshelf changes to this user, and the catalog changes
+                to books on their shelf. Every change is returned if None.
+
+        Returns:
+            dict or str: A dict with the new cursor ("seq"), whether the client must re-read everything
+            because the log was pruned past its cursor or rolled back by a restore ("reset"), and the "books" and "bookshelf" changes
+            as {"op", "isbn", "row"} dicts, bookshelf changes with their "owner" too, where row is None for
+            deletions. An error message on failure.
+        """
+        books_seq, bookshelf_seq = unpack_sync_cursor(seq)
+
+        def latest(rows: list[Tuple]) -> dict[str, str]:
+            # rows are (seq, op, isbn) in seq order, so later ops overwrite earlier ones
+            return {isbn: op for _, op, isbn in rows}
+
+        def read(conn: sqlite3.Connection) -> dict:
+            conn.execute("BEGIN")  # One read transaction over both files
+            reset = False
+            heads = {}
+            for schema, since in (("books_db", books_seq), ("main", bookshelf_seq)):
+                pruned, heads[schema] = log_position(conn, schema, since)
+                reset = reset or pruned
+
+            shelf_filter = "AND owner = ?" if owner else ""
+            shelf_rows = conn.execute(
+                f"SELECT seq, op, isbn, owner FROM main.change_log WHERE seq > ? AND op != 'reset' {shelf_filter} ORDER BY seq",
+                (bookshelf_seq, owner) if owner else (bookshelf_seq,),
+            ).fetchall()
+            book_filter = (
+                "AND isbn IN (SELECT isbn FROM bookshelf WHERE owner = ?)"
+                if owner
+                else ""
+            )
+            book_rows = conn.execute(
+                f"SELECT seq, op, isbn FROM books_db.change_log WHERE seq > ? AND op != 'reset' {book_filter} ORDER BY seq",
+                (books_seq, owner) if owner else (books_seq,),
+            ).fetchall()
+
+            bookshelf_changes = []
+            # Several users may shelve the same book, so shelf rows are told apart by owner too
+            shelf_ops = {
+                (isbn, shelf_owner): op for _, op, isbn, shelf_owner in shelf_rows
+            }
+            for (isbn, shelf_owner), op in shelf_ops.items():
+                row = None
+                if op != "delete":
+                    row = conn.execute(
+                        BOOKSHELF_SELECT
+                        + "WHERE bookshelf.isbn = ? AND bookshelf.owner = ?",
+                        (isbn, shelf_owner),
+                    ).fetchone()
+                bookshelf_changes.append(
+                    {
+                        "op": "delete" if row is None else "upsert",
+                        "isbn": isbn,
+                        "owner": shelf_owner,
+                        "row": row,
+                    }
+                )
+
+            book_changes = []
+            for isbn, op in latest(book_rows).items():
+                row = None
+                if op != "delete":
+                    row = conn.execute(
+                        "SELECT * FROM books_db.books WHERE isbn = ?", (isbn,)
+                    ).fetchone()
+                book_changes.append(
+                    {
+                        "op": "delete" if row is None else "upsert",
+                        "isbn": isbn,
+                        "row": row,
+                    }
+                )
+
+            return {
+                "seq": pack_sync_cursor(heads["books_db"], heads["main"]),
+                "reset": bool(reset),
+                "books": book_changes,
+                "bookshelf": bookshelf_changes,
+            }
+
+        try:
+            return self._run(self.bookshelf_db, read, attach_books=True)
+        except Exception as e:
+            return f"An error occurred: {e}\n\tChanges Since"
+
+    def prune_change_log(self, older_than_days: int = 30) -> str:
+        """
+        Deletes change log entries older than the given age from both databases.
+
+        Clients whose cursor predates the pruned entries get "reset" from changes_since.
+
+        Args:
+            older_than_days (int): Age in days of the oldest entries to keep.
+
+        Returns:
+            str: A message indicating the success or failure of the pruning.
+        """
+        deleted = 0
+        try:
+            for db_path in (self.db_name, self.bookshelf_db):
+                deleted += self._run(
+                    db_path,
+                    lambda conn: prune_change_log(conn, older_than_days),
+                    write=True,
+                )
+            return f"{deleted} change log entries pruned successfully!"
+        except Exception as e:
+            return f"An error occurred: {e}\n\tPrune Change Log"
+
+    # Reading Predictions
+    def get_active_reading(self) -> list[Tuple] | str:
+        """
+        Retrieves every user's unfinished books with their reading progress.
+
+        Returns:
+            list[Tuple] or str: (isbn, owner, date_started, current_page, page_count) tuples, where
+            date_started is in days since EPOCH, or an error message.
+        """
+        try:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
                     """
                     SELECT
-                        books_db.books.isbn,
-                        books_db.books.title,
-                        books_db.books.authors,
-                        books_db.books.publisher,
-                        books_db.books.description,
-                        books_db.books.page_count,
-                        books_db.books.year,
+                        bookshelf.isbn,
+                        bookshelf.owner,
                         bookshelf.date_started,
-                        bookshelf.date_ended,
-                        bookshelf.owned,
-                        bookshelf.current_page
+                        bookshelf.current_page,
+                        books_db.books.page_count
                     FROM bookshelf
                     INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
-                    WHERE bookshelf.isbn = ? AND bookshelf.owner = ?
+                    WHERE bookshelf.current_page < books_db.books.page_count
+                    """
+                ).fetchall(),
+                attach_books=True,
+            )
+        except Exception as e:
+            return f"An error occurred: {e}\n\tGet Active Reading"
+
+    def replace_predictions(self, predictions: list[Tuple]) -> str:
+        """
+        Replaces all stored reading predictions in a single transaction.
+
+        Args:
+            predictions (list[Tuple]): (isbn, owner, pages_per_day, predicted_finish, computed_at) tuples.
+
+        Returns:
+            str: A message indicating the success or failure of the refresh.
+        """
+
+        def replace(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM reading_predictions")
+            conn.executemany(
+                """
+                INSERT INTO reading_predictions (isbn, owner, pages_per_day, predicted_finish, computed_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                predictions,
+            )
+
+        try:
+            self._run(self.bookshelf_db, replace, write=True)
+            return f"{len(predictions)} reading predictions refreshed successfully!"
+        except Exception as e:
+            return f"An error occurred: {e}\n\tReplace Predictions"
+
+    def get_prediction(self, book_id: str, owner: str) -> Optional[Tuple] | str:
+        """
+        Retrieves the stored prediction for one of the user's books.
+
+        Args:
+            book_id (str): The ISBN of the book.
+            owner (str): The owner of the bookshelf.
+
+        Returns:
+            Optional[Tuple] or str: (pages_per_day, predicted_finish, computed_at), None if there is no prediction, or an error message.
+        """
+        try:
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    """
+                    SELECT pages_per_day, predicted_finish, computed_at
+                    FROM reading_predictions
+                    WHERE isbn = ? AND owner = ?
                     """,
                     (book_id, owner),
-                )
-                book = cursor.fetchone()
+                ).fetchone(),
+            )
         except Exception as e:
-            return f"An error occurred: {e}\n\tGet One Book Bookshelf"
-        return book
+            return f"An error occurred: {e}\n\tGet Prediction"
 
-    def remove_from_bookshelf(self, book_id: str, username: str) -> str:
+    def get_predictions(self, owner: str) -> list[Tuple] | str:
+        """
+        Retrieves the stored predictions for all of the user's unfinished books.
+
+        Args:
+            owner (str): The owner of the bookshelf.
+
+        Returns:
+            list[Tuple] or str: (title, current_page, page_count, pages_per_day, predicted_finish) tuples, or an error message.
+        """
         try:
-            with sqlite3.connect(self.bookshelf_db) as bookshelf_conn:
-                cursor = bookshelf_conn.cursor()
-                cursor.execute(
-                    "DELETE FROM bookshelf WHERE isbn = ? AND owner = ?",
-                    (book_id, username),
-                )
-                return f"Book with ISBN {book_id} removed from your bookshelf!"
+            return self._run(
+                self.bookshelf_db,
+                lambda conn: conn.execute(
+                    """
+                    SELECT
+                        books_db.books.title,
+                        bookshelf.current_page,
+                        books_db.books.page_count,
+                        reading_predictions.pages_per_day,
+                        reading_predictions.predicted_finish
+                    FROM reading_predictions
+                    INNER JOIN bookshelf
+                        ON bookshelf.isbn = reading_predictions.isbn
+                        AND bookshelf.owner = reading_predictions.owner
+                    INNER JOIN books_db.books ON bookshelf.isbn = books_db.books.isbn
+                    WHERE reading_predictions.owner = ?
+                    ORDER BY reading_predictions.predicted_finish IS NULL, reading_predictions.predicted_finish
+                    """,
+                    (owner,),
+                ).fetchall(),
+                attach_books=True,
+            )
         except Exception as e:
-            return f"An error occurred: {e}\n\tRemove From Bookshelf"
+            return f"An error occurred: {e}\n\tGet Predictions"
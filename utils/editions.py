@@ -0,0 +1,472 @@
+"""Edition Clustering."""
+
+import re
+import threading
+from typing import Iterable, Optional
+
+import isbnlib
+import numpy as np
+from scipy import sparse
+
+from utils.database_funcs import BookDatabase, author_key, split_authors
+
+# Size of the hashed trigram space shared by titles and authors
+N_FEATURES = 2**20
+# Cosine similarity of title and author trigrams above which two books are the same work
+SIMILARITY_THRESHOLD = 0.8
+# Share of the catalog a trigram may appear in before it stops telling books apart
+MAX_DF = 0.01
+# Trigrams shared by fewer books than this are always kept, so small catalogs still match
+MIN_DF_CAP = 50
+# Rows of the similarity matrix computed at a time during a full clustering
+BLOCK_ROWS = 512
+# Books added since the last build that are merged into the main matrix at once
+MERGE_ROWS = 256
+# Weight of the author trigrams next to the title trigrams
+AUTHOR_WEIGHT = 0.6
+
+_INDEXES: dict[str, "EditionIndex"] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def normalize_title(title: str) -> str:
+    """
+    Reduces a title to the part shared by its editions.
+
+    Subtitles after a colon or dash and bracketed notes such as "(Deluxe Edition)"
+    are dropped, then the title is lowercased and stripped of punctuation.
+
+    Args:
+        title (str): The title of the book.
+
+    Returns:
+        str: The normalized title.
+    """
+    title = re.sub(r"[\(\[].*?[\)\]]", " ", (title or "").lower())
+    title = re.split(r"\s*[:;]\s*|\s+[-–—]\s+", title)[0]
+    return " ".join(re.findall(r"[^\W_]+", title))
+
+
+def canonical_isbn(isbn: str) -> str:
+    """
+    Returns the ISBN-13 of an ISBN-10, so both forms of an edition's ISBN compare equal.
+
+    Args:
+        isbn (str): The ISBN, with or without hyphens.
+
+    Returns:
+        str: The ISBN-13, or the ISBN without separators if it isn't an ISBN-10.
+    """
+    digits = re.sub(r"[^0-9Xx]", "", isbn or "").upper()
+    if len(digits) != 10:
+        return digits
+    # isbnlib.to_isbn13 does the same with full validation, at many times the cost
+    body = "978" + digits[:9]
+    check = -sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(body)) % 10
+    return body + str(check)
+
+
+def _trigrams(text: str) -> Iterable[str]:
+    padded = f"  {text} "
+    return (padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _features(title: str, authors: str) -> tuple[list[int], list[float]]:
+    """Hashes a book's normalized title and author names into trigram buckets and weights."""
+    # The index only lives in memory, so the process' string hash is stable enough
+    buckets = [
+        hash(("t", gram)) % N_FEATURES for gram in _trigrams(normalize_title(title))
+    ]
+    weights = [1.0] * len(buckets)
+    names = " ".join(author_key(name) for name in split_authors(authors))
+    for gram in _trigrams(names):
+        buckets.append(hash(("a", gram)) % N_FEATURES)
+        weights.append(AUTHOR_WEIGHT)
+    return buckets, weights
+
+
+def _normalize(counts: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1))).ravel()
+    norms[norms == 0] = 1.0
+    return sparse.diags(1 / norms).dot(counts).astype(np.float32).tocsr()
+
+
+def _drop(counts: sparse.csr_matrix, keep: np.ndarray) -> sparse.csr_matrix:
+    """Removes the features outside keep, in place and without reindexing the columns."""
+    counts.data[~keep[counts.indices]] = 0
+    counts.eliminate_zeros()
+    return counts
+
+
+class EditionIndex:
+    """
+    An in-memory trigram index of the catalog's titles and authors, for finding other editions.
+
+    Trigrams that appear in more than MAX_DF of the books are dropped when the index
+    is built, so a lookup is one sparse product over a few short columns. A removed
+    book keeps its row, which stops matching once its ISBN no longer points to it.
+
+    Attributes:
+        db (BookDatabase): The database holding the books.
+        threshold (float): The similarity above which two books count as the same work.
+        seq (int): The catalog change log position the index reflects.
+        ready (bool): Whether the index has been built.
+
+    Methods:
+        - build() -> int: Vectorizes the whole catalog.
+        - sync() -> bool: Applies the catalog changes logged since the last build or sync.
+        - find(title: str, authors: str, isbn: Optional[str], limit: int) -> list[tuple[str, float]]: Finds the books that are likely editions of a book.
+        - add_book(isbn: str, title: str, authors: str) -> None: Adds one book to the index.
+        - remove_book(isbn: str) -> None: Removes one book from the index.
+        - similar_pairs() -> Iterable[tuple[int, int]]: Yields the index rows of every pair of likely editions.
+    """
+
+    def __init__(
+        self, db: BookDatabase, threshold: float = SIMILARITY_THRESHOLD
+    ) -> None:
+        self.db = db
+        self.threshold = threshold
+        self.seq = 0
+        self.ready = False
+        self.isbns: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._canonical: dict[str, int] = {}
+        self._keep = np.ones(N_FEATURES, dtype=bool)
+        self._matrix = sparse.csc_matrix((0, N_FEATURES), dtype=np.float32)
+        self._recent = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def _vectors(self, books: list[tuple[str, str]]) -> sparse.csr_matrix:
+        indptr, cols, vals = [0], [], []
+        for title, authors in books:
+            buckets, weights = _features(title, authors)
+            cols.extend(buckets)
+            vals.extend(weights)
+            indptr.append(len(cols))
+        # Repeated trigrams are summed into counts by the conversion
+        return (
+            sparse.csr_matrix(
+                (
+                    np.array(vals, dtype=np.float32),
+                    np.array(cols, dtype=np.int64),
+                    np.array(indptr, dtype=np.int64),
+                ),
+                shape=(len(books), N_FEATURES),
+            )
+            .tocoo()
+            .tocsr()
+        )
+
+    def build(self) -> int:
+        """
+        Vectorizes every book in the catalog.
+
+        Returns:
+            int: The number of books indexed.
+        """
+        # Read first, so changes logged while the catalog is read are applied again by sync
+        seq = self.db.get_catalog_seq()
+        if isinstance(seq, str):
+            raise RuntimeError(seq)
+        books = self.db.get_book_list()
+        if isinstance(books, str):
+            raise RuntimeError(books)
+
+        counts = self._vectors([(book[1], book[2]) for book in books])
+        doc_freq = np.bincount(counts.indices, minlength=N_FEATURES)
+        with self._lock:
+            self.isbns = [book[0] for book in books]
+            self._rows = {isbn: row for row, isbn in enumerate(self.isbns)}
+            self._canonical = {
+                canonical_isbn(isbn): row for row, isbn in enumerate(self.isbns)
+            }
+            self._keep = doc_freq <= max(MIN_DF_CAP, MAX_DF * len(books))
+            self._matrix = _normalize(_drop(counts, self._keep)).tocsc()
+            self._recent = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+            self.seq = seq
+            self.ready = True
+        return len(self.isbns)
+
+    def sync(self) -> bool:
+        """
+        Applies the catalog changes logged since the last build or sync.
+
+        Books inserted or updated by any process are (re-)indexed and deleted ones
+        removed. When the log was pruned past the index or rolled back by a restore,
+        the index is rebuilt in the background instead.
+
+        Returns:
+            bool: Whether the index is up to date, False while it is being rebuilt.
+        """
+        with self._sync_lock:
+            if not self.ready:
+                return False
+            changes = self.db.get_catalog_changes(self.seq)
+            if isinstance(changes, str):
+                raise RuntimeError(changes)
+            if changes["reset"]:
+                self.ready = False
+                _build_in_background(self)
+                return False
+            for isbn, book in changes["books"]:
+                self.remove_book(isbn)
+                if book is not None:
+                    self.add_book(isbn, book[1], book[2])
+            self.seq = changes["seq"]
+        return True
+
+    def _vector(self, title: str, authors: str) -> sparse.csr_matrix:
+        return _normalize(_drop(self._vectors([(title, authors)]), self._keep))
+
+    def find(
+        self, title: str, authors: str, isbn: Optional[str] = None, limit: int = 5
+    ) -> list[tuple[str, float]]:
+        """
+        Finds the books that are likely other editions, or copies, of a book.
+
+        A book whose ISBN-10 and ISBN-13 agree with the given ISBN always matches
+        with a score of 1.
+
+        Args:
+            title (str): The title of the book.
+            authors (str): The authors of the book.
+            isbn (Optional[str]): The ISBN of the book, which is never returned itself.
+            limit (int): The maximum number of books to return.
+
+        Returns:
+            list[tuple[str, float]]: (isbn, similarity) pairs, most similar first.
+        """
+        vector = self._vector(title, authors)
+        with self._lock:
+            matches: dict[int, float] = {}
+            if isbn and canonical_isbn(isbn) in self._canonical:
+                matches[self._canonical[canonical_isbn(isbn)]] = 1.0
+            if vector.nnz and self.isbns:
+                # Only the columns of the book's own trigrams take part in the product
+                sims = np.concatenate(
+                    [
+                        self._matrix[:, vector.indices] @ vector.data,
+                        (self._recent @ vector.T).toarray().ravel(),
+                    ]
+                )
+                for row in np.flatnonzero(sims >= self.threshold):
+                    matches.setdefault(int(row), float(sims[row]))
+            ranked = sorted(matches.items(), key=lambda match: -match[1])
+            return [
+                (self.isbns[row], round(score, 4))
+                for row, score in ranked
+                if self.isbns[row] != isbn and self._rows.get(self.isbns[row]) == row
+            ][:limit]
+
+    def add_book(self, isbn: str, title: str, authors: str) -> None:
+        """
+        Adds a single book to the index.
+
+        The book is kept in a small matrix of recent additions, merged into the main
+        one every MERGE_ROWS books, so an insert doesn't copy the whole index. The
+        trigrams dropped as too common stay the ones chosen at the last build.
+
+        Args:
+            isbn (str): The ISBN of the new book.
+            title (str): The title of the new book.
+            authors (str): The authors of the new book.
+        """
+        vector = self._vector(title, authors)
+        with self._lock:
+            if isbn in self._rows:
+                return
+            self._rows[isbn] = len(self.isbns)
+            self._canonical.setdefault(canonical_isbn(isbn), len(self.isbns))
+            self.isbns.append(isbn)
+            self._recent = sparse.vstack([self._recent, vector]).tocsr()
+            if self._recent.shape[0] >= MERGE_ROWS:
+                self._matrix = sparse.vstack([self._matrix, self._recent]).tocsc()
+                self._recent = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+
+    def remove_book(self, isbn: str) -> None:
+        """
+        Removes a single book from the index, if it is in it.
+
+        Args:
+            isbn (str): The ISBN of the book.
+        """
+        with self._lock:
+            row = self._rows.pop(isbn, None)
+            if row is not None and self._canonical.get(canonical_isbn(isbn)) == row:
+                del self._canonical[canonical_isbn(isbn)]
+
+    def similar_pairs(self) -> Iterable[tuple[int, int]]:
+        """
+        Yields every pair of index rows whose similarity reaches the threshold.
+
+        The similarity matrix is computed in sparse blocks of rows, and each pair is
+        yielded once, as (lower row, higher row).
+
+        Returns:
+            Iterable[tuple[int, int]]: The pairs of rows.
+        """
+        with self._lock:
+            matrix = sparse.vstack([self._matrix, self._recent]).tocsr()
+        transposed = matrix.T.tocsr()
+        for start in range(0, matrix.shape[0], BLOCK_ROWS):
+            sims = matrix[start : start + BLOCK_ROWS] @ transposed
+            rows = np.repeat(
+                np.arange(start, start + sims.shape[0]), np.diff(sims.indptr)
+            )
+            keep = (sims.data >= self.threshold) & (rows < sims.indices)
+            yield from zip(rows[keep].tolist(), sims.indices[keep].tolist())
+
+
+def _build_in_background(index: EditionIndex) -> None:
+    """Builds an index on a daemon thread, dropping it on failure so the next lookup starts over."""
+
+    def run() -> None:
+        try:
+            count = index.build()
+            print(f"[INFO] Indexed {count} books for edition matching.")
+        except Exception as e:
+            print(f"[WARN] Could not build the edition index: {e}")
+            with _INDEXES_LOCK:
+                if _INDEXES.get(index.db.db_name) is index:
+                    del _INDEXES[index.db.db_name]
+
+    threading.Thread(target=run, name="edition-index", daemon=True).start()
+
+
+def get_edition_index(db: BookDatabase) -> Optional[EditionIndex]:
+    """
+    Returns the process-wide edition index for the database, caught up with the catalog.
+
+    The first call starts building the index in the background, which takes seconds
+    on a large catalog, and lookups are skipped until it is ready. Every later call
+    applies the catalog's change log, so books added by other processes are found too.
+
+    Args:
+        db (BookDatabase): The database holding the books.
+
+    Returns:
+        Optional[EditionIndex]: The up-to-date index, or None while it is being built.
+    """
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(db.db_name)
+        if index is None:
+            index = EditionIndex(db)
+            _INDEXES[db.db_name] = index
+            _build_in_background(index)
+    return index if index.sync() else None
+
+
+def _isbnlib_editions(isbn: str) -> list[str]:
+    """Looks up the other editions of a book through isbnlib's web services."""
+    try:
+        return list(isbnlib.editions(isbn, service="merge"))
+    except Exception as e:
+        print(f"[WARN] Could not fetch the editions of {isbn}: {e}")
+        return []
+
+
+def cluster_editions(
+    db: BookDatabase, use_isbnlib: bool = False, threshold: float = SIMILARITY_THRESHOLD
+) -> str:
+    """
+    Groups the catalog's books into works and stores a work_id for every book.
+
+    Books are linked when their ISBN-10 and ISBN-13 agree, when their title and
+    author trigrams reach the similarity threshold and, with use_isbnlib, when
+    isbnlib lists one as an edition of the other. Every group of linked books is one
+    work. A work keeps the lowest work_id its books already had, so ids stay stable
+    across runs, and works without one get new ids.
+
+    Args:
+        db (BookDatabase): The database holding the books.
+        use_isbnlib (bool): Whether to look up every book's editions online, one request per book.
+        threshold (float): The trigram similarity above which two books are the same work.
+
+    Returns:
+        str: A message indicating the success or failure of the clustering.
+    """
+    index = EditionIndex(db, threshold)
+    n_books = index.build()
+    parent = list(range(n_books))
+
+    def root(row: int) -> int:
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    def union(a: int, b: int) -> None:
+        parent[max(root(a), root(b))] = min(root(a), root(b))
+
+    for row, isbn in enumerate(index.isbns):
+        union(row, index._canonical[canonical_isbn(isbn)])
+    for a, b in index.similar_pairs():
+        union(a, b)
+    if use_isbnlib:
+        for row, isbn in enumerate(index.isbns):
+            for edition in _isbnlib_editions(isbn):
+                other = index._canonical.get(canonical_isbn(edition))
+                if other is not None:
+                    union(row, other)
+
+    current = db.get_work_ids()
+    if isinstance(current, str):
+        return current
+    groups: dict[int, list[int]] = {}
+    for row in range(n_books):
+        groups.setdefault(root(row), []).append(row)
+
+    # Each work keeps the lowest id its books had that no other work kept before it
+    next_work = max(current.values(), default=0) + 1
+    taken: set[int] = set()
+    assignments = {}
+    for rows in sorted(
+        groups.values(),
+        key=lambda rows: min(
+            (current[index.isbns[row]] for row in rows if index.isbns[row] in current),
+            default=next_work,
+        ),
+    ):
+        previous = sorted(
+            {current[index.isbns[row]] for row in rows if index.isbns[row] in current}
+            - taken
+        )
+        if previous:
+            work_id = previous[0]
+        else:
+            work_id, next_work = next_work, next_work + 1
+        taken.add(work_id)
+        for row in rows:
+            assignments[index.isbns[row]] = work_id
+
+    ret_msg = db.set_work_ids(assignments)
+    if "error" in ret_msg:
+        return ret_msg
+    editions = n_books - len(groups)
+    return (
+        f"Grouped {n_books} books into {len(groups)} works ({editions} other editions)."
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Group the catalog's editions into works."
+    )
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    parser.add_argument(
+        "--isbnlib",
+        action="store_true",
+        help="Also look up every book's editions online, one request per book.",
+    )
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    args = parser.parse_args()
+
+    print(
+        cluster_editions(
+            BookDatabase(args.books_db, args.bookshelf_db), args.isbnlib, args.threshold
+        )
+    )
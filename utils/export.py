@@ -0,0 +1,97 @@
+"""Streaming Export."""
+
+import csv
+import io
+import json
+from typing import IO, Iterable, Iterator, Sequence
+
+# Rows buffered before a chunk of the export is handed to the caller
+ROWS_PER_CHUNK = 500
+
+
+def _csv_chunks(rows: Iterable[Sequence], columns: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _jsonl_chunks(rows: Iterable[Sequence], columns: Sequence[str]) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str)
+        )
+        if len(lines) == ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+FORMATS = {
+    "csv": (_csv_chunks, "text/csv"),
+    "jsonl": (_jsonl_chunks, "application/x-ndjson"),
+}
+
+
+def iter_export(
+    rows: Iterable[Sequence], columns: Sequence[str], fmt: str = "csv"
+) -> Iterator[str]:
+    """
+    Serializes rows into text chunks without holding more than one chunk in memory.
+
+    Args:
+        rows (Iterable[Sequence]): The rows to export, typically a database generator.
+        columns (Sequence[str]): The column names, in row order.
+        fmt (str): "csv" or "jsonl".
+
+    Returns:
+        Iterator[str]: The export, chunk by chunk, ready to write to a file or an HTTP response.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(
+            f"Unknown export format {fmt!r}, expected one of {list(FORMATS)}"
+        )
+    chunks, _ = FORMATS[fmt]
+    return chunks(rows, columns)
+
+
+def media_type(fmt: str) -> str:
+    """
+    Returns the MIME type of an export format.
+
+    Args:
+        fmt (str): "csv" or "jsonl".
+
+    Returns:
+        str: The MIME type to send with the export.
+    """
+    return FORMATS[fmt][1]
+
+
+def write_export(
+    rows: Iterable[Sequence], columns: Sequence[str], out: IO[str], fmt: str = "csv"
+) -> int:
+    """
+    Writes rows to a text file object in constant memory.
+
+    Args:
+        rows (Iterable[Sequence]): The rows to export, typically a database generator.
+        columns (Sequence[str]): The column names, in row order.
+        out (IO[str]): The file object to write to.
+        fmt (str): "csv" or "jsonl".
+
+    Returns:
+        int: The number of characters written.
+    """
+    written = 0
+    for chunk in iter_export(rows, columns, fmt):
+        written += out.write(chunk)
+    return written
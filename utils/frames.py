@@ -0,0 +1,71 @@
+"""Typed DataFrame Loader."""
+
+import sqlite3
+from typing import Sequence
+
+import pandas as pd
+
+# The label every page shows for each database column
+COLUMN_LABELS = {
+    "isbn": "ISBN",
+    "title": "Title",
+    "authors": "Authors",
+    "publisher": "Publisher",
+    "description": "Description",
+    "page_count": "Page Count",
+    "year": "Year",
+    "date_started": "Started Reading",
+    "date_ended": "Finished Reading",
+    "date_finished": "Date Finished",
+    "owned": "Owned",
+    "current_page": "Current Page",
+}
+# Nullable integers keep books without a page count or year instead of failing the cast
+COLUMN_DTYPES = {
+    "page_count": "Int64",
+    "year": "Int64",
+    "current_page": "Int64",
+    "owned": "category",
+}
+# Dates are selected as ISO 8601 text from the stored day numbers, anything else becomes NaT
+DATE_COLUMNS = ("date_started", "date_ended", "date_finished")
+# Rows fetched from the cursor at a time
+FETCH_SIZE = 5000
+
+
+def load_frame(
+    conn: sqlite3.Connection, sql: str, params: Sequence = ()
+) -> pd.DataFrame:
+    """
+    Reads a query's rows straight into a typed DataFrame with the page labels.
+
+    Rows are fetched FETCH_SIZE at a time and appended to one list per column, so
+    the full result never exists as a list of row tuples. Each column is then
+    built once with its dtype from COLUMN_DTYPES, and the DATE_COLUMNS parsed.
+
+    Args:
+        conn (sqlite3.Connection): The connection to read from.
+        sql (str): The query to run.
+        params (Sequence): The query parameters.
+
+    Returns:
+        pd.DataFrame: The rows, with the columns renamed to COLUMN_LABELS.
+    """
+    cursor = conn.execute(sql, params)
+    names = [description[0] for description in cursor.description]
+    values: list[list] = [[] for _ in names]
+    while rows := cursor.fetchmany(FETCH_SIZE):
+        for column, chunk in zip(values, zip(*rows)):
+            column.extend(chunk)
+
+    columns = {}
+    for name, column in zip(names, values):
+        if name in DATE_COLUMNS:
+            columns[COLUMN_LABELS.get(name, name)] = pd.to_datetime(
+                pd.Series(column, dtype=object), format="ISO8601", errors="coerce"
+            )
+        else:
+            columns[COLUMN_LABELS.get(name, name)] = pd.Series(
+                column, dtype=COLUMN_DTYPES.get(name, object)
+            )
+    return pd.DataFrame(columns)
@@ -0,0 +1,177 @@
+"""Shared HTTP Client."""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Seconds to wait for a connection and for each read from the socket
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10.0
+# Kept-alive connections per host, enough for the prefetch workers and a page
+POOL_SIZE = 10
+# Consecutive failures that open a host's circuit, and seconds before it is retried
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+
+_CLIENT: "HttpClient | None" = None
+_CLIENT_LOCK = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a host after repeated failures, then lets a single trial call through.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a trial call.
+
+    Methods:
+        - allow() -> bool: Whether a call may be made now.
+        - record_success() -> None: Closes the circuit.
+        - record_failure() -> None: Counts a failure and opens the circuit at the threshold.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Checks whether a call may be made now.
+
+        Returns:
+            bool: True while closed, and for one trial call once the reset timeout has passed.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        """Closes the circuit and resets the failure count."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """Counts a failure, opening the circuit at the threshold or after a failed trial."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class HttpClient:
+    """
+    A requests session shared by every outbound call of the process.
+
+    Connections are kept alive and pooled per host, responses are requested with
+    gzip compression, idempotent GETs are retried on transient errors, and each host
+    gets its own circuit breaker so an outage fails fast instead of stalling pages.
+
+    Methods:
+        - get(url: str, params: dict | None, timeout: tuple[float, float] | None) -> requests.Response: Sends a GET request.
+    """
+
+    def __init__(self) -> None:
+        retry = Retry(
+            total=2,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Google's APIs only compress responses for user agents that mention gzip
+        self.session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "User-Agent": "book-tracker (gzip)"}
+        )
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker()
+            return self._breakers[host]
+
+    def get(
+        self,
+        url: str,
+        params: dict | None = None,
+        timeout: tuple[float, float] | None = None,
+    ) -> requests.Response:
+        """
+        Sends a GET request through the shared session.
+
+        Args:
+            url (str): The URL to fetch.
+            params (dict | None): Query string parameters, e.g. API keys.
+            timeout (tuple[float, float] | None): The connect and read timeouts, defaults to the module's.
+
+        Returns:
+            requests.Response: The response. 5xx responses count as failures of the host.
+
+        Raises:
+            CircuitOpenError: If the host failed repeatedly and is not being called for now.
+            requests.RequestException: If the request fails after the retries.
+        """
+        breaker = self._breaker(urlsplit(url).netloc)
+        if not breaker.allow():
+            raise CircuitOpenError(
+                f"{urlsplit(url).netloc} is unavailable, not calling it for now."
+            )
+        try:
+            res = self.session.get(
+                url, params=params, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+            )
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+        if res.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return res
+
+
+def get_client() -> HttpClient:
+    """
+    Returns the process-wide HTTP client.
+
+    Returns:
+        HttpClient: The shared client, created on first use.
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = HttpClient()
+        return _CLIENT
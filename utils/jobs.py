@@ -0,0 +1,720 @@
+"""Durable Background Jobs."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from utils.database_funcs import BookDatabase
+
+# The file holding the queue, shared by the app and every worker process
+JOBS_DB = "jobs.db"
+# Times a job is tried before it is marked failed, and the backoff before the second try
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 30.0
+# Seconds a worker owns a job without reporting progress before others may take it over
+LEASE_SECONDS = 300.0
+# Seconds an idle worker waits before polling the queue again
+POLL_INTERVAL = 1.0
+# Finished jobs older than this are removed by prune()
+KEEP_FINISHED_DAYS = 7
+
+_HANDLERS: dict[str, Callable[["Job", "JobQueue", BookDatabase], Optional[dict]]] = {}
+_QUEUES: dict[str, "JobQueue"] = {}
+_WORKERS: dict[str, threading.Thread] = {}
+_WORKERS_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    A job as stored in the queue.
+
+    Attributes:
+        id (int): The job's id.
+        kind (str): The handler that runs it, e.g. "enrich", "cover" or "import".
+        payload (dict): The handler's arguments.
+        owner (Optional[str]): The user that enqueued it, if any.
+        status (str): "queued", "running", "done" or "failed".
+        attempts (int): Times it was started.
+        progress (float): Share of the work done, from 0 to 1.
+        message (str): The latest progress note or error.
+        result (Optional[dict]): What the handler returned once done.
+        created (float): When it was enqueued, as a Unix timestamp.
+        updated (float): When it last changed, as a Unix timestamp.
+        locked_by (Optional[str]): The worker holding the job's lease while it runs.
+    """
+
+    id: int
+    kind: str
+    payload: dict
+    owner: Optional[str]
+    status: str
+    attempts: int
+    progress: float
+    message: str
+    result: Optional[dict]
+    created: float
+    updated: float
+    locked_by: Optional[str] = None
+
+
+JOB_COLUMNS = "id, kind, payload, owner, status, attempts, progress, message, result, created, updated, locked_by"
+
+
+def _to_job(row: tuple) -> Job:
+    values = list(row)
+    values[2] = json.loads(values[2])
+    values[8] = json.loads(values[8]) if values[8] else None
+    return Job(*values)
+
+
+def handler(kind: str) -> Callable:
+    """
+    Registers a function as the handler of a kind of job.
+
+    The handler is called with the job, the queue (to report progress) and the book
+    database, and returns a JSON-serializable result. Raising fails the attempt.
+
+    Args:
+        kind (str): The kind of job the function runs.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def register(fn: Callable) -> Callable:
+        _HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker reports on a job whose lease another worker has taken over."""
+
+
+class JobQueue:
+    """
+    A durable job queue in SQLite, shared by every process using the same file.
+
+    Jobs survive restarts. Workers claim one job at a time under BEGIN IMMEDIATE and
+    hold it for LEASE_SECONDS, renewed by every progress report, so a crashed
+    worker's job is picked up again once its lease expires. Only the worker holding
+    the lease may report on a job, a worker that lost it gets LeaseLostError and its
+    outcome is dropped. Failed attempts are
+    retried with exponential backoff up to the job's max attempts. A job with the
+    same dedupe key as a queued or running one is not enqueued again.
+
+    Attributes:
+        db_path (str): The SQLite file holding the queue.
+
+    Methods:
+        - enqueue(kind: str, payload: dict, owner: Optional[str], dedupe_key: Optional[str], max_attempts: int) -> int: Adds a job, or returns the identical active one.
+        - claim(worker: str, kinds: Optional[list[str]]) -> Optional[Job]: Takes the next job that is due.
+        - report(job: Job, progress: float, message: str) -> None: Records progress and renews the lease.
+        - complete(job: Job, result: Optional[dict]) -> None: Marks a job done.
+        - fail(job: Job, error: str, retry: bool) -> None: Schedules a retry, or marks the job failed.
+        - get(job_id: int) -> Optional[Job]: Returns a job.
+        - list_jobs(owner: Optional[str], limit: int) -> list[Job]: Returns the most recent jobs.
+        - counts() -> dict[str, int]: Counts the jobs per status.
+        - prune(older_than_days: int) -> int: Removes old finished jobs.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB) -> None:
+        self.db_path = db_path
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                owner TEXT,
+                dedupe_key TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT NOT NULL DEFAULT '',
+                result TEXT,
+                run_after REAL NOT NULL,
+                locked_by TEXT,
+                locked_until REAL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_dedupe ON jobs (dedupe_key)
+                WHERE status IN ('queued', 'running')
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, run_after)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, created)"
+        )
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+
+    def _write(self, work: Callable[[sqlite3.Connection], object]) -> object:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = work(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        owner: Optional[str] = None,
+        dedupe_key: Optional[str] = None,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> int:
+        """
+        Adds a job to the queue and returns right away.
+
+        Args:
+            kind (str): The handler that runs it.
+            payload (dict): The handler's arguments, JSON-serializable.
+            owner (Optional[str]): The user the job's progress is shown to.
+            dedupe_key (Optional[str]): Jobs with the same key are not queued twice,
+                defaults to the kind and payload, so identical work is shared by users.
+            max_attempts (int): Times the job is tried before it is marked failed.
+
+        Returns:
+            int: The id of the new job, or of the identical queued or running one.
+        """
+        encoded = json.dumps(payload, sort_keys=True)
+        key = dedupe_key or f"{kind}:{encoded}"
+
+        def insert(conn: sqlite3.Connection) -> int:
+            existing = conn.execute(
+                "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')",
+                (key,),
+            ).fetchone()
+            if existing:
+                return existing[0]
+            now = time.time()
+            return conn.execute(
+                """
+                INSERT INTO jobs (kind, payload, owner, dedupe_key, max_attempts, run_after, created, updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (kind, encoded, owner, key, max_attempts, now, now, now),
+            ).lastrowid
+
+        return self._write(insert)
+
+    def claim(self, worker: str, kinds: Optional[list[str]] = None) -> Optional[Job]:
+        """
+        Takes the oldest job that is due, including running jobs whose lease expired.
+
+        Args:
+            worker (str): The name of the claiming worker.
+            kinds (Optional[list[str]]): The kinds the worker runs, defaults to all.
+
+        Returns:
+            Optional[Job]: The claimed job, or None if nothing is due.
+        """
+        kind_filter = ""
+        params: list = []
+        if kinds:
+            kind_filter = f"AND kind IN ({', '.join('?' for _ in kinds)})"
+            params = list(kinds)
+
+        def take(conn: sqlite3.Connection) -> Optional[Job]:
+            now = time.time()
+            row = conn.execute(
+                f"""
+                SELECT id FROM jobs
+                WHERE ((status = 'queued' AND run_after <= ?)
+                    OR (status = 'running' AND locked_until < ?)) {kind_filter}
+                ORDER BY run_after, id
+                LIMIT 1
+                """,
+                [now, now, *params],
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = 'running', attempts = attempts + 1, locked_by = ?,
+                    locked_until = ?, updated = ?
+                WHERE id = ?
+                """,
+                (worker, now + LEASE_SECONDS, now, row[0]),
+            )
+            return _to_job(
+                conn.execute(
+                    f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (row[0],)
+                ).fetchone()
+            )
+
+        return self._write(take)
+
+    def _check_lease(self, job: Job, updated: int) -> None:
+        if not updated:
+            raise LeaseLostError(
+                f"Job {job.id} is no longer leased to {job.locked_by}, its lease expired."
+            )
+
+    def report(self, job: Job, progress: float, message: str = "") -> None:
+        """
+        Records a running job's progress and renews its lease.
+
+        Args:
+            job (Job): The claimed job.
+            progress (float): Share of the work done, from 0 to 1.
+            message (str): A note shown next to the progress.
+
+        Raises:
+            LeaseLostError: If another worker took the job over, the caller should stop.
+        """
+        now = time.time()
+        updated = self._write(
+            lambda conn: conn.execute(
+                """
+                UPDATE jobs SET progress = ?, message = ?, locked_until = ?, updated = ?
+                WHERE id = ? AND status = 'running' AND locked_by = ?
+                """,
+                (
+                    min(max(progress, 0.0), 1.0),
+                    message,
+                    now + LEASE_SECONDS,
+                    now,
+                    job.id,
+                    job.locked_by,
+                ),
+            ).rowcount
+        )
+        self._check_lease(job, updated)
+
+    def complete(self, job: Job, result: Optional[dict] = None) -> None:
+        """
+        Marks a job done.
+
+        Args:
+            job (Job): The claimed job.
+            result (Optional[dict]): What the handler returned.
+
+        Raises:
+            LeaseLostError: If another worker took the job over, the result is dropped.
+        """
+        updated = self._write(
+            lambda conn: conn.execute(
+                """
+                UPDATE jobs
+                SET status = 'done', progress = 1, result = ?, locked_by = NULL,
+                    locked_until = NULL, updated = ?
+                WHERE id = ? AND status = 'running' AND locked_by = ?
+                """,
+                (
+                    json.dumps(result) if result is not None else None,
+                    time.time(),
+                    job.id,
+                    job.locked_by,
+                ),
+            ).rowcount
+        )
+        self._check_lease(job, updated)
+
+    def fail(self, job: Job, error: str, retry: bool = True) -> None:
+        """
+        Records a failed attempt, retrying with exponential backoff while attempts are left.
+
+        Args:
+            job (Job): The claimed job.
+            error (str): What went wrong.
+            retry (bool): False for errors another attempt can't fix.
+
+        Raises:
+            LeaseLostError: If another worker took the job over, the failure is dropped.
+        """
+        now = time.time()
+
+        def update(conn: sqlite3.Connection) -> int:
+            row = conn.execute(
+                """
+                SELECT attempts, max_attempts FROM jobs
+                WHERE id = ? AND status = 'running' AND locked_by = ?
+                """,
+                (job.id, job.locked_by),
+            ).fetchone()
+            if row is None:
+                return 0
+            attempts, max_attempts = row
+            retried = retry and attempts < max_attempts
+            return conn.execute(
+                """
+                UPDATE jobs
+                SET status = ?, message = ?, run_after = ?, locked_by = NULL,
+                    locked_until = NULL, updated = ?
+                WHERE id = ?
+                """,
+                (
+                    "queued" if retried else "failed",
+                    f"Attempt {attempts} failed: {error}",
+                    now + RETRY_DELAY * 2 ** (attempts - 1),
+                    now,
+                    job.id,
+                ),
+            ).rowcount
+
+        self._check_lease(job, self._write(update))
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """
+        Returns a job.
+
+        Args:
+            job_id (int): The job's id.
+
+        Returns:
+            Optional[Job]: The job, or None if it does not exist.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return _to_job(row) if row else None
+
+    def list_jobs(self, owner: Optional[str] = None, limit: int = 20) -> list[Job]:
+        """
+        Returns the most recent jobs, newest first.
+
+        Args:
+            owner (Optional[str]): Only this user's jobs, defaults to everyone's.
+            limit (int): The number of jobs to return.
+
+        Returns:
+            list[Job]: The jobs.
+        """
+        conn = self._connect()
+        try:
+            if owner is None:
+                rows = conn.execute(
+                    f"SELECT {JOB_COLUMNS} FROM jobs ORDER BY id DESC LIMIT ?",
+                    (limit,),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"""
+                    SELECT {JOB_COLUMNS} FROM jobs WHERE owner = ?
+                    ORDER BY created DESC LIMIT ?
+                    """,
+                    (owner, limit),
+                ).fetchall()
+        finally:
+            conn.close()
+        return [_to_job(row) for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        """
+        Counts the jobs per status.
+
+        Returns:
+            dict[str, int]: The number of jobs in each status.
+        """
+        conn = self._connect()
+        try:
+            return dict(
+                conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+            )
+        finally:
+            conn.close()
+
+    def prune(self, older_than_days: int = KEEP_FINISHED_DAYS) -> int:
+        """
+        Removes finished jobs that last changed before the cutoff.
+
+        Args:
+            older_than_days (int): Age in days of the jobs to remove.
+
+        Returns:
+            int: The number of removed jobs.
+        """
+        cutoff = time.time() - older_than_days * 24 * 60 * 60
+        return self._write(
+            lambda conn: conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                (cutoff,),
+            ).rowcount
+        )
+
+
+def run_job(queue: JobQueue, db: BookDatabase, job: Job) -> None:
+    """
+    Runs a claimed job with its handler and records the outcome.
+
+    Args:
+        queue (JobQueue): The queue the job was claimed from.
+        db (BookDatabase): The database handlers work on.
+        job (Job): The claimed job.
+    """
+    try:
+        fn = _HANDLERS.get(job.kind)
+        if fn is None:
+            queue.fail(job, f"No handler for {job.kind!r} jobs", retry=False)
+            return
+        try:
+            result = fn(job, queue, db)
+        except LeaseLostError:
+            raise
+        except Exception as e:
+            print(f"[WARN] Job {job.id} ({job.kind}) failed: {e}")
+            queue.fail(job, str(e))
+            return
+        queue.complete(job, result)
+    except LeaseLostError as e:
+        # The worker that took the job over records its outcome
+        print(f"[WARN] {e}")
+
+
+def run_worker(
+    queue: JobQueue,
+    db: BookDatabase,
+    kinds: Optional[list[str]] = None,
+    stop: Optional[threading.Event] = None,
+    poll_interval: float = POLL_INTERVAL,
+) -> None:
+    """
+    Claims and runs jobs until stop is set.
+
+    Args:
+        queue (JobQueue): The queue to work on.
+        db (BookDatabase): The database handlers work on.
+        kinds (Optional[list[str]]): The kinds of jobs to run, defaults to all.
+        stop (Optional[threading.Event]): Ends the loop once set, defaults to never.
+        poll_interval (float): Seconds to wait when no job is due.
+    """
+    worker = f"{os.getpid()}-{threading.current_thread().name}"
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            job = queue.claim(worker, kinds)
+        except sqlite3.OperationalError as e:
+            print(f"[WARN] Could not claim a job: {e}")
+            job = None
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        run_job(queue, db, job)
+
+
+def _worker_process(
+    jobs_db: str, books_db: str, bookshelf_db: str, kinds: Optional[list[str]]
+) -> None:
+    run_worker(JobQueue(jobs_db), BookDatabase(books_db, bookshelf_db), kinds)
+
+
+def get_queue(db_path: str = JOBS_DB) -> JobQueue:
+    """
+    Returns the process-wide queue of a file.
+
+    Args:
+        db_path (str): The SQLite file holding the queue.
+
+    Returns:
+        JobQueue: The shared queue, created on first use.
+    """
+    with _WORKERS_LOCK:
+        if db_path not in _QUEUES:
+            _QUEUES[db_path] = JobQueue(db_path)
+        return _QUEUES[db_path]
+
+
+def start_job_worker(
+    db: BookDatabase, db_path: str = JOBS_DB, kinds: Optional[list[str]] = None
+) -> None:
+    """
+    Starts a daemon thread that runs queued jobs inside the app's process.
+
+    Dedicated worker processes (python -m utils.jobs worker) may run alongside it,
+    every worker claims jobs from the same file. Only one thread runs per queue and
+    process, so calling this on every Streamlit rerun is cheap.
+
+    Args:
+        db (BookDatabase): The database handlers work on.
+        db_path (str): The SQLite file holding the queue.
+        kinds (Optional[list[str]]): The kinds of jobs to run, defaults to all.
+    """
+    queue = get_queue(db_path)
+    with _WORKERS_LOCK:
+        if db_path in _WORKERS:
+            return
+        thread = threading.Thread(
+            target=run_worker,
+            args=(queue, db, kinds),
+            name="jobs",
+            daemon=True,
+        )
+        _WORKERS[db_path] = thread
+        thread.start()
+
+
+def fill_missing_info(db: BookDatabase, book: tuple, priority: str = "bulk") -> bool:
+    """
+    Completes a catalog book's missing fields with its Google Books metadata.
+
+    Args:
+        db (BookDatabase): The database the book lives in.
+        book (tuple): The book's row, starting with isbn, title, authors, publisher,
+            description, page_count and year.
+        priority (str): The Google Books budget the lookup is drawn from.
+
+    Returns:
+        bool: True if the book was updated.
+
+    Raises:
+        RuntimeError: If the lookup failed and is worth trying again later.
+    """
+    import utils.assist_functions as af
+
+    isbn, title, authors, publisher, description, page_count, year = book[:7]
+    if description and page_count:
+        return False
+    info = af.get_basic_info(isbn, priority=priority)
+    if info is None:
+        raise RuntimeError(f"Could not look up {isbn} on Google Books")
+    if not info.get("Title"):
+        return False
+    db.update_book(
+        isbn=isbn,
+        title=title or info["Title"],
+        authors=authors or ", ".join(info["Authors"]),
+        publisher=publisher or info["Publisher"],
+        description=description or info["description"],
+        page_count=page_count or int(info["pageCount"] or 0),
+        year=year or int(info["Year"] or 0),
+    )
+    return True
+
+
+@handler("enrich")
+def enrich(job: Job, queue: JobQueue, db: BookDatabase) -> dict:
+    """Fills in a catalog book's missing metadata. Payload: isbn."""
+    book = db.get_book_by_isbn(job.payload["isbn"])
+    if isinstance(book, str):
+        raise RuntimeError(book)
+    return {"updated": bool(book) and fill_missing_info(db, book)}
+
+
+@handler("cover")
+def cover(job: Job, queue: JobQueue, db: BookDatabase) -> dict:
+    """Downloads a book's cover into the shared cover cache. Payload: isbn."""
+    import utils.assist_functions as af
+
+    isbn = job.payload["isbn"]
+    found = af.get_cover(isbn) is not None
+    # Only answers Open Library gave are cached, anything else is worth a retry
+    if not found and not af.has_cached_cover(isbn):
+        raise RuntimeError(f"Could not fetch the cover for {isbn}")
+    return {"found": found}
+
+
+@handler("import")
+def import_books(job: Job, queue: JobQueue, db: BookDatabase) -> dict:
+    """
+    Adds a list of ISBNs to the catalog and to a bookshelf. Payload: isbns, owner.
+
+    Books already in the catalog or on the bookshelf are skipped, so a retried
+    import picks up where the failed attempt stopped. A failed lookup fails the
+    attempt, only ISBNs Google Books doesn't know are reported missing.
+    """
+    import utils.assist_functions as af
+
+    isbns, owner = job.payload["isbns"], job.payload["owner"]
+    added, shelved, missing = [], [], []
+    for done, isbn in enumerate(isbns):
+        queue.report(job, done / len(isbns), f"Importing {isbn}")
+        book = db.get_book_by_isbn(isbn)
+        if isinstance(book, str):
+            raise RuntimeError(book)
+        if book is None:
+            info = af.get_basic_info(isbn, priority="bulk")
+            if info is None:
+                raise RuntimeError(f"Could not look up {isbn} on Google Books")
+            if not info.get("Title"):
+                missing.append(isbn)
+                continue
+            msg = db.insert_book(
+                isbn=isbn,
+                title=info["Title"],
+                authors=", ".join(info["Authors"]),
+                publisher=info["Publisher"],
+                description=info["description"],
+                page_count=int(info["pageCount"] or 0),
+                year=int(info["Year"] or 0),
+                categories=info["categories"],
+            )
+            if "successfully" not in msg:
+                raise RuntimeError(msg)
+            added.append(isbn)
+            queue.enqueue("cover", {"isbn": isbn})
+        if not db.check_bookshelf_entry(isbn, owner)[0]:
+            msg = db.add_to_bookshelf(isbn, owner)
+            if "added" not in msg:
+                raise RuntimeError(msg)
+            shelved.append(isbn)
+    return {"added": added, "shelved": shelved, "missing": missing}
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Run or inspect the job queue.")
+    parser.add_argument("command", choices=["worker", "status", "prune"])
+    parser.add_argument("--jobs-db", default=JOBS_DB)
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--kinds", nargs="+", choices=sorted(_HANDLERS))
+    args = parser.parse_args()
+
+    queue = JobQueue(args.jobs_db)
+    if args.command == "status":
+        print(queue.counts())
+        for job in queue.list_jobs():
+            print(
+                f"{job.id:>6} {job.kind:<8} {job.status:<8} {job.progress:>4.0%} "
+                f"{job.owner or '':<12} {job.message}"
+            )
+    elif args.command == "prune":
+        print(f"Removed {queue.prune()} finished jobs.")
+    else:
+        processes = [
+            multiprocessing.Process(
+                target=_worker_process,
+                args=(args.jobs_db, args.books_db, args.bookshelf_db, args.kinds),
+                name=f"jobs-{i}",
+            )
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,263 @@
+"""Database Maintenance."""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from utils.database_funcs import prune_change_log
+from utils.jobs import JOBS_DB
+from utils.rate_limit import QUOTA_DB
+
+# Seconds between two maintenance runs of the background scheduler
+MAINTENANCE_INTERVAL = 24 * 60 * 60
+# Seconds each task may run before it is interrupted
+TASK_BUDGETS = {
+    "integrity_check": 60.0,
+    "prune_change_log": 30.0,
+    "analyze": 30.0,
+    "optimize": 10.0,
+    "vacuum": 120.0,
+    "wal_checkpoint": 10.0,
+}
+# Days of sync history kept in the change logs, older clients re-read everything
+CHANGE_LOG_DAYS = 30
+# Share of free pages above which a file is worth vacuuming
+VACUUM_THRESHOLD = 0.2
+# SQLite virtual machine steps between two checks of a task's budget
+PROGRESS_STEPS = 10_000
+
+_SCHEDULERS: dict[tuple[str, ...], threading.Thread] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def file_metrics(conn: sqlite3.Connection, path: str) -> dict:
+    """
+    Measures the size and fragmentation of a database file.
+
+    Args:
+        conn (sqlite3.Connection): A connection to the database.
+        path (str): The path to the database file.
+
+    Returns:
+        dict: size_bytes (including the WAL), wal_bytes, page_size, page_count,
+        freelist_count, fragmentation (the share of free pages) and journal_mode.
+    """
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    wal_bytes = os.path.getsize(f"{path}-wal") if os.path.exists(f"{path}-wal") else 0
+    return {
+        "size_bytes": os.path.getsize(path) + wal_bytes,
+        "wal_bytes": wal_bytes,
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "fragmentation": round(freelist_count / page_count, 4) if page_count else 0.0,
+        "journal_mode": conn.execute("PRAGMA journal_mode").fetchone()[0],
+    }
+
+
+@contextmanager
+def time_budget(conn: sqlite3.Connection, seconds: float) -> Iterator[None]:
+    """
+    Interrupts the statements run on the connection once the budget is spent.
+
+    An interrupted statement raises sqlite3.OperationalError and is rolled back.
+
+    Args:
+        conn (sqlite3.Connection): The connection to watch.
+        seconds (float): The time budget.
+    """
+    deadline = time.monotonic() + seconds
+    conn.set_progress_handler(lambda: int(time.monotonic() > deadline), PROGRESS_STEPS)
+    try:
+        yield
+    finally:
+        conn.set_progress_handler(None, PROGRESS_STEPS)
+
+
+def _integrity_check(conn: sqlite3.Connection, metrics: dict) -> tuple[str, str]:
+    problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    if problems == ["ok"]:
+        return ("ok", "")
+    return ("failed", "; ".join(problems[:10]))
+
+
+def _prune_change_log(conn: sqlite3.Connection, metrics: dict) -> tuple[str, str]:
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'"
+    ).fetchone():
+        return ("skipped", "no change log")
+    deleted = prune_change_log(conn, CHANGE_LOG_DAYS)
+    return ("ok", f"{deleted} entries older than {CHANGE_LOG_DAYS} days deleted")
+
+
+def _analyze(conn: sqlite3.Connection, metrics: dict) -> tuple[str, str]:
+    conn.execute("ANALYZE")
+    return ("ok", "")
+
+
+def _optimize(conn: sqlite3.Connection, metrics: dict) -> tuple[str, str]:
+    conn.execute("PRAGMA optimize")
+    return ("ok", "")
+
+
+def _vacuum(conn: sqlite3.Connection, metrics: dict) -> tuple[str, str]:
+    if metrics["fragmentation"] < VACUUM_THRESHOLD:
+        return ("skipped", f"{metrics['fragmentation']:.1%} of pages free")
+    conn.execute("VACUUM")
+    return ("ok", f"{metrics['freelist_count']} free pages reclaimed")
+
+
+def _wal_checkpoint(conn: sqlite3.Connection, metrics: dict) -> tuple[str, str]:
+    if metrics["journal_mode"] != "wal":
+        return ("skipped", f"journal mode is {metrics['journal_mode']}")
+    # A truncating checkpoint resets the frame counts it returns, so the WAL size
+    # measured before it is what gets reported
+    busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+    if busy:
+        return ("failed", "readers kept the checkpoint from completing")
+    return ("ok", f"{metrics['wal_bytes']:,} bytes of WAL written back")
+
+
+# The tasks in the order they run, a failed integrity check stops the others
+TASKS: dict[str, Callable[[sqlite3.Connection, dict], tuple[str, str]]] = {
+    "integrity_check": _integrity_check,
+    "prune_change_log": _prune_change_log,
+    "analyze": _analyze,
+    "optimize": _optimize,
+    "vacuum": _vacuum,
+    "wal_checkpoint": _wal_checkpoint,
+}
+
+
+def run_maintenance(
+    path: str, tasks: Optional[list[str]] = None, busy_timeout: float = 5.0
+) -> dict:
+    """
+    Runs the maintenance tasks on one database file, each within its time budget.
+
+    Args:
+        path (str): The path to the database file.
+        tasks (Optional[list[str]]): The tasks to run, all of TASKS if None.
+        busy_timeout (float): Seconds to wait for other connections' locks.
+
+    Returns:
+        dict: The path, the file metrics before and after, and one
+        {task, status, seconds, detail} entry per task. status is "ok",
+        "skipped", "interrupted" or "failed".
+    """
+    report: dict = {"path": path, "tasks": []}
+    if not os.path.exists(path):
+        report["error"] = "file does not exist"
+        return report
+
+    # Autocommit, VACUUM cannot run inside a transaction
+    conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)
+    try:
+        report["before"] = file_metrics(conn, path)
+        for name in tasks or list(TASKS):
+            started = time.monotonic()
+            try:
+                with time_budget(conn, TASK_BUDGETS[name]):
+                    status, detail = TASKS[name](conn, file_metrics(conn, path))
+            except sqlite3.OperationalError as e:
+                status = "interrupted" if "interrupt" in str(e) else "failed"
+                detail = str(e)
+            report["tasks"].append(
+                {
+                    "task": name,
+                    "status": status,
+                    "seconds": round(time.monotonic() - started, 3),
+                    "detail": detail,
+                }
+            )
+            if name == "integrity_check" and status == "failed":
+                # Rewriting a corrupt file could make it worse, leave it for a restore
+                break
+        report["after"] = file_metrics(conn, path)
+    finally:
+        conn.close()
+    return report
+
+
+def format_report(report: dict) -> str:
+    """
+    Renders a maintenance report as a few lines of text for logs and the CLI.
+
+    Args:
+        report (dict): A report returned by run_maintenance.
+
+    Returns:
+        str: The report.
+    """
+    if "error" in report:
+        return f"[WARN] {report['path']}: {report['error']}"
+    before, after = report["before"], report["after"]
+    lines = [
+        f"[INFO] {report['path']}: {before['size_bytes']:,} -> {after['size_bytes']:,} bytes, "
+        f"fragmentation {before['fragmentation']:.1%} -> {after['fragmentation']:.1%}"
+    ]
+    for task in report["tasks"]:
+        detail = f" ({task['detail']})" if task["detail"] else ""
+        lines.append(
+            f"    {task['task']:<16} {task['status']:<12} {task['seconds']:>8.3f}s{detail}"
+        )
+    return "\n".join(lines)
+
+
+def start_maintenance_scheduler(
+    paths: list[str], interval: float = MAINTENANCE_INTERVAL
+) -> None:
+    """
+    Starts a daemon thread that maintains the database files every interval seconds.
+
+    The first run happens one interval after start-up, so app starts stay fast. Only
+    one scheduler runs per set of files and process, so calling this on every
+    Streamlit rerun is cheap.
+
+    Args:
+        paths (list[str]): The database files to maintain.
+        interval (float): Seconds between runs.
+    """
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            for path in paths:
+                print(format_report(run_maintenance(path)))
+
+    key = tuple(paths)
+    with _SCHEDULERS_LOCK:
+        if key in _SCHEDULERS:
+            return
+        thread = threading.Thread(target=run, name="maintenance", daemon=True)
+        _SCHEDULERS[key] = thread
+        thread.start()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the SQLite database files.")
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    parser.add_argument("--users-db", default="users.db")
+    parser.add_argument("--jobs-db", default=JOBS_DB)
+    parser.add_argument("--quota-db", default=QUOTA_DB)
+    parser.add_argument(
+        "--tasks", nargs="+", choices=list(TASKS), help="Defaults to every task."
+    )
+    args = parser.parse_args()
+
+    for db_path in (
+        args.books_db,
+        args.bookshelf_db,
+        args.users_db,
+        args.jobs_db,
+        args.quota_db,
+    ):
+        print(format_report(run_maintenance(db_path, args.tasks)))
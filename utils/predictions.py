@@ -0,0 +1,116 @@
+"""Reading Completion Predictions."""
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.database_funcs import EPOCH, BookDatabase
+
+# Seconds between two refreshes of the predictions table
+REFRESH_INTERVAL = 60 * 60
+# Finish dates further out than this are not worth predicting
+MAX_FORECAST_DAYS = 10 * 365
+
+_SCHEDULERS: dict[str, threading.Thread] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def compute_predictions(active: pd.DataFrame, today: pd.Timestamp) -> pd.DataFrame:
+    """
+    Estimates the daily pace and finish date of every active book in one vectorized pass.
+
+    Args:
+        active (pd.DataFrame): One row per unfinished book with isbn, owner, date_started (in days
+            since 1970-01-01), current_page and page_count.
+        today (pd.Timestamp): The date the predictions are made for.
+
+    Returns:
+        pd.DataFrame: isbn, owner, pages_per_day and predicted_finish columns. Books without a
+        usable start date or without any progress get no pace or finish date.
+    """
+    started = pd.to_numeric(active["date_started"], errors="coerce").to_numpy(
+        dtype="float64"
+    )
+    current_page = active["current_page"].to_numpy(dtype="float64")
+    page_count = active["page_count"].to_numpy(dtype="float64")
+
+    # A book started today has been read for one day, not zero
+    days_reading = np.maximum((today - pd.Timestamp(EPOCH)).days - started, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pace = np.where(current_page > 0, current_page / days_reading, np.nan)
+        days_left = np.ceil((page_count - current_page) / pace)
+    days_left[days_left > MAX_FORECAST_DAYS] = np.nan
+
+    finish = today + pd.to_timedelta(days_left, unit="D")
+    return pd.DataFrame(
+        {
+            "isbn": active["isbn"].to_numpy(),
+            "owner": active["owner"].to_numpy(),
+            "pages_per_day": np.round(pace, 2),
+            "predicted_finish": finish.strftime("%Y-%m-%d"),
+        }
+    )
+
+
+def refresh_predictions(db: BookDatabase) -> str:
+    """
+    Recomputes the predictions for all users' active books and stores them.
+
+    Args:
+        db (BookDatabase): The database holding the bookshelves.
+
+    Returns:
+        str: A message indicating the success or failure of the refresh.
+    """
+    active = db.get_active_reading()
+    if isinstance(active, str):
+        return active
+
+    frame = pd.DataFrame(
+        active, columns=["isbn", "owner", "date_started", "current_page", "page_count"]
+    )
+    predictions = compute_predictions(frame, pd.Timestamp(datetime.now().date()))
+    predictions["computed_at"] = datetime.now().isoformat(timespec="seconds")
+    predictions = predictions.astype(object).where(predictions.notna(), None)
+    return db.replace_predictions(list(predictions.itertuples(index=False, name=None)))
+
+
+def start_prediction_scheduler(
+    db: BookDatabase, interval: float = REFRESH_INTERVAL
+) -> None:
+    """
+    Starts a daemon thread that refreshes the predictions every interval seconds.
+
+    Only one scheduler runs per bookshelf database and process, so calling this on
+    every Streamlit rerun is cheap.
+
+    Args:
+        db (BookDatabase): The database holding the bookshelves.
+        interval (float): Seconds between refreshes.
+    """
+
+    def run() -> None:
+        while True:
+            print(f"[INFO] {refresh_predictions(db)}")
+            time.sleep(interval)
+
+    with _SCHEDULERS_LOCK:
+        if db.bookshelf_db in _SCHEDULERS:
+            return
+        thread = threading.Thread(target=run, name="predictions", daemon=True)
+        _SCHEDULERS[db.bookshelf_db] = thread
+        thread.start()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the reading predictions.")
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    args = parser.parse_args()
+
+    print(refresh_predictions(BookDatabase(args.books_db, args.bookshelf_db)))
@@ -0,0 +1,110 @@
+"""Background Warm-up on Login."""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import streamlit as st
+
+import utils.assist_functions as af
+from utils.database_funcs import BookDatabase
+from utils.frames import COLUMN_LABELS
+from utils.jobs import fill_missing_info
+
+# Workers shared by every session, so logins can't flood the process with threads
+MAX_WORKERS = 4
+# Books per login whose cover and metadata are warmed up, the first page of View Books
+# as it opens (sorted by title, 50 books per page)
+MAX_PREFETCH_BOOKS = 50
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="warmup")
+
+
+class Warmup:
+    """
+    Preloads the first page of a user's bookshelf, its covers and missing metadata on
+    the shared worker pool.
+
+    Attributes:
+        db (BookDatabase): The database the user's bookshelf lives in.
+        username (str): The user whose books are warmed up.
+
+    Methods:
+        - start() -> None: Submits the warm-up tasks to the worker pool.
+        - cancel() -> None: Stops the tasks that have not finished yet.
+        - done() -> bool: Checks whether every submitted task has finished.
+    """
+
+    def __init__(self, db: BookDatabase, username: str) -> None:
+        self.db = db
+        self.username = username
+        self._cancelled = threading.Event()
+        self._futures: list[Future] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Submits the bookshelf preload, which in turn schedules one task per book."""
+        self._submit(self._load_bookshelf)
+
+    def cancel(self) -> None:
+        """Cancels queued tasks and tells running ones to stop at their next check."""
+        self._cancelled.set()
+        with self._lock:
+            for future in self._futures:
+                future.cancel()
+
+    def done(self) -> bool:
+        """
+        Checks whether the warm-up has finished.
+
+        Returns:
+            bool: True if every submitted task has finished or was cancelled.
+        """
+        with self._lock:
+            return all(future.done() for future in self._futures)
+
+    def _submit(self, fn, *args) -> None:
+        if self._cancelled.is_set():
+            return
+        with self._lock:
+            self._futures.append(_EXECUTOR.submit(fn, *args))
+
+    def _load_bookshelf(self) -> None:
+        # The same queries View Books runs unfiltered, so they land in the shared cache
+        self.db.get_bookshelf_facets(self.username)
+        books = self.db.get_bookshelf_window(self.username, limit=MAX_PREFETCH_BOOKS)
+        if isinstance(books, str):
+            return
+        for isbn in books[COLUMN_LABELS["isbn"]]:
+            self._submit(self._warm_book, isbn)
+
+    def _warm_book(self, isbn: str) -> None:
+        if self._cancelled.is_set():
+            return
+        af.get_cover(isbn)
+        if self._cancelled.is_set():
+            return
+        # The page's rows leave out the description, the catalog row has every field
+        book = self.db.get_book_by_isbn(isbn)
+        if book and not isinstance(book, str):
+            fill_missing_info(self.db, book)
+
+
+def start_warmup(db: BookDatabase, username: str) -> None:
+    """
+    Starts the warm-up for the logged in user and keeps it in the session state.
+
+    Args:
+        db (BookDatabase): The database the user's bookshelf lives in.
+        username (str): The user that just logged in.
+    """
+    cancel_warmup()
+    warmup = Warmup(db, username)
+    warmup.start()
+    st.session_state["warmup"] = warmup
+
+
+def cancel_warmup() -> None:
+    """Cancels the current session's warm-up, if there is one."""
+    warmup = st.session_state.pop("warmup", None)
+    if warmup is not None:
+        warmup.cancel()
@@ -0,0 +1,189 @@
+"""Page Run Profiling."""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # cProfile is used instead
+    Profiler = None
+
+# Where profiles and their metadata are written
+PROFILE_DIR = "profiles"
+# Profiles kept on disk, the oldest are removed past this
+MAX_PROFILES = 200
+# Seconds between two pyinstrument samples
+SAMPLE_INTERVAL = 0.001
+# The session state key of the admin's "profile my page runs" toggle
+PROFILING_KEY = "profiling"
+
+# Set while a page runs under the profiler, so the page's own call doesn't profile again
+_RUNNING = threading.local()
+
+
+def is_admin(username: str | None) -> bool:
+    """
+    Checks whether a user may profile pages.
+
+    Args:
+        username (str | None): The logged in user.
+
+    Returns:
+        bool: True if the user is listed in ADMIN_USERS in secrets.toml.
+    """
+    return username is not None and username in st.secrets.get("ADMIN_USERS", [])
+
+
+def profile_page(script_path: str) -> None:
+    """
+    Runs the calling page under a profiler when an admin asked for it.
+
+    main.py and every page call it with __file__ before their first Streamlit command,
+    and for anyone but an admin who turned profiling on it is a no-op. Profiling is on
+    for a run when an admin enabled it on the profiles page or opened the page with
+    ?profile=1. The page is then executed again inside the profiler, the profile is
+    saved to PROFILE_DIR and the outer run stops. Otherwise this only reads the
+    session state, no profiler is installed.
+
+    Args:
+        script_path (str): The path of the page script.
+    """
+    if getattr(_RUNNING, "active", False):
+        return
+    if not (
+        st.session_state.get(PROFILING_KEY) or st.query_params.get("profile") == "1"
+    ):
+        return
+    username = st.session_state.get("username")
+    if not is_admin(username):
+        return
+
+    with open(script_path, encoding="utf-8") as f:
+        code = compile(f.read(), script_path, "exec")
+    started = datetime.now()
+    _RUNNING.active = True
+    if Profiler is not None:
+        profiler = Profiler(interval=SAMPLE_INTERVAL)
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        # st.stop() and st.rerun() in the page end the profiled run as well
+        exec(code, {"__name__": "__main__", "__file__": script_path})
+    finally:
+        duration = time.perf_counter() - start
+        if Profiler is not None:
+            profiler.stop()
+        else:
+            profiler.disable()
+        _RUNNING.active = False
+        meta = save_profile(profiler, username, script_path, started, duration)
+    st.caption(f"Profiled this run in {duration * 1000:.0f} ms: {meta['file']}")
+    st.stop()
+
+
+def save_profile(
+    profiler, username: str, script_path: str, started: datetime, duration: float
+) -> dict:
+    """
+    Writes a profile and its metadata to PROFILE_DIR, then prunes old profiles.
+
+    pyinstrument profiles are saved in the speedscope format (open them on
+    speedscope.app), cProfile ones as pstats files (snakeviz or python -m pstats).
+
+    Args:
+        profiler: The stopped pyinstrument or cProfile profiler.
+        username (str): The admin whose run was profiled.
+        script_path (str): The path of the page script.
+        started (datetime): When the run started.
+        duration (float): The run's wall time in seconds.
+
+    Returns:
+        dict: The profile's metadata.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    page = os.path.splitext(os.path.basename(script_path))[0]
+    user = "".join(c for c in username if c.isalnum() or c in "-_")
+    name = f"{started:%Y%m%dT%H%M%S%f}-{user}-{page}-{duration * 1000:.0f}ms"
+    if Profiler is not None:
+        file = f"{name}.speedscope.json"
+        with open(os.path.join(PROFILE_DIR, file), "w", encoding="utf-8") as f:
+            f.write(profiler.output(SpeedscopeRenderer()))
+    else:
+        file = f"{name}.prof"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, file))
+
+    meta = {
+        "id": name,
+        "started": started.isoformat(timespec="seconds"),
+        "user": username,
+        "page": page,
+        "duration_ms": round(duration * 1000, 1),
+        "profiler": "pyinstrument" if Profiler is not None else "cProfile",
+        "file": file,
+    }
+    with open(os.path.join(PROFILE_DIR, f"{name}.meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    for old in list_profiles(limit=None)[MAX_PROFILES:]:
+        for path in (old["file"], f"{old['id']}.meta.json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, path))
+            except FileNotFoundError:
+                pass
+    return meta
+
+
+def list_profiles(limit: int | None = 50) -> list[dict]:
+    """
+    Lists the saved profiles, newest first.
+
+    Args:
+        limit (int | None): The number of profiles to return, None for all.
+
+    Returns:
+        list[dict]: The metadata of each profile: id, started, user, page,
+        duration_ms, profiler and file.
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = sorted(
+        (name for name in os.listdir(PROFILE_DIR) if name.endswith(".meta.json")),
+        reverse=True,
+    )
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Skipping the profile {name}: {e}")
+    return profiles
+
+
+def top_functions(file: str, limit: int = 25) -> str:
+    """
+    Summarizes a cProfile profile as its slowest functions by cumulative time.
+
+    Args:
+        file (str): The profile's file name in PROFILE_DIR.
+        limit (int): The number of functions to list.
+
+    Returns:
+        str: The pstats report.
+    """
+    out = io.StringIO()
+    stats = pstats.Stats(os.path.join(PROFILE_DIR, file), stream=out)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
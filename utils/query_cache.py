@@ -0,0 +1,97 @@
+"""Query Cache."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class QueryCache:
+    """
+    A small thread-safe TTL cache for query results shared by every session in the process.
+
+    Attributes:
+        ttl (float): Seconds an entry stays valid after it was stored.
+        max_entries (int): Maximum number of entries kept before the least recently used one is evicted.
+
+    Methods:
+        - get(key: Hashable) -> Any: Returns the cached value or None if missing or expired.
+        - set(key: Hashable, value: Any) -> None: Stores a value for the given key.
+        - get_or_load(key: Hashable, loader: Callable[[], Any]) -> Any: Returns the cached value or loads and stores it.
+        - invalidate(match: Callable[[Hashable], bool] | None) -> None: Drops the matching entries, or all of them.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 256) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Returns the cached value for the key.
+
+        Args:
+            key (Hashable): The cache key.
+
+        Returns:
+            Any: The cached value, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value, evicting the least recently used entry when full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value or calls the loader and caches its result.
+
+        Results that are strings are error messages from the database layer and are not cached.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable[[], Any]): Function that produces the value on a miss.
+
+        Returns:
+            Any: The cached or freshly loaded value.
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if not isinstance(value, str):
+                self.set(key, value)
+        return value
+
+    def invalidate(self, match: Callable[[Hashable], bool] | None = None) -> None:
+        """
+        Drops cached entries.
+
+        Args:
+            match (Callable[[Hashable], bool] | None): Predicate selecting the keys to drop. Drops everything if None.
+        """
+        with self._lock:
+            if match is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if match(key)]:
+                del self._entries[key]
@@ -0,0 +1,290 @@
+"""Shared API Rate Limits."""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# The file holding every limiter's state, shared by all processes using the same path
+QUOTA_DB = "quota.db"
+# Google Books grants 1,000 requests per day by default, reset at midnight Pacific time
+DAILY_QUOTA = 1000
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+# Sustained requests per second, and how many may be sent at once after a quiet spell
+RATE = 1.0
+BURST = 10
+# Share of the daily quota and of the bucket that only interactive calls may spend
+INTERACTIVE_RESERVE = 0.2
+# Seconds a call waits for a token before it is rejected, per priority
+MAX_WAIT = {"interactive": 5.0, "bulk": 30.0}
+PRIORITIES = tuple(MAX_WAIT)
+
+_LIMITERS: dict[tuple[str, str], "RateLimiter"] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+class QuotaExceededError(Exception):
+    """Raised instead of calling an API whose rate limit or daily quota is spent."""
+
+
+class RateLimiter:
+    """
+    A token bucket and daily quota for one API, kept in SQLite so that every process
+    and replica sharing the file draws from the same budget.
+
+    Each call takes one token inside a BEGIN IMMEDIATE transaction. Calls without a
+    token wait until one is refilled, up to MAX_WAIT, and are rejected after that or
+    once the day's quota is spent. Interactive calls come first: bulk calls leave
+    INTERACTIVE_RESERVE of the bucket and of the daily quota untouched, and hold
+    back while an interactive call is waiting for a token.
+
+    Attributes:
+        name (str): The API the budget belongs to.
+        db_path (str): The SQLite file holding the state.
+        rate (float): Tokens refilled per second.
+        burst (int): The bucket's capacity.
+        daily_quota (int): Calls allowed per day in QUOTA_TIMEZONE.
+
+    Methods:
+        - acquire(priority: str, max_wait: float | None) -> None: Waits for a token and spends it.
+        - metrics() -> dict: Reports the remaining tokens and quota.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        db_path: str = QUOTA_DB,
+        rate: float = RATE,
+        burst: int = BURST,
+        daily_quota: int = DAILY_QUOTA,
+    ) -> None:
+        self.name = name
+        self.db_path = db_path
+        self.rate = rate
+        self.burst = burst
+        self.daily_quota = daily_quota
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                interactive_until REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quota_usage (
+                name TEXT NOT NULL,
+                day TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                used INTEGER NOT NULL DEFAULT 0,
+                rejected INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (name, day, priority)
+            )
+            """
+        )
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+
+    @staticmethod
+    def _day(now: float) -> str:
+        return datetime.fromtimestamp(now, QUOTA_TIMEZONE).date().isoformat()
+
+    def _limits(self, priority: str) -> tuple[float, float]:
+        """The daily calls and the tokens left in the bucket below which priority must stop."""
+        if priority == "interactive":
+            return self.daily_quota, 1.0
+        return (
+            self.daily_quota * (1 - INTERACTIVE_RESERVE),
+            1.0 + self.burst * INTERACTIVE_RESERVE,
+        )
+
+    def _bucket(self, conn: sqlite3.Connection, now: float) -> tuple[float, float]:
+        row = conn.execute(
+            "SELECT tokens, updated, interactive_until FROM rate_buckets WHERE name = ?",
+            (self.name,),
+        ).fetchone()
+        tokens, updated, interactive_until = row or (self.burst, now, 0.0)
+        return (
+            min(self.burst, tokens + max(0.0, now - updated) * self.rate),
+            interactive_until,
+        )
+
+    def _count(self, conn: sqlite3.Connection, day: str, priority: str, column: str):
+        conn.execute(
+            f"""
+            INSERT INTO quota_usage (name, day, priority, {column}) VALUES (?, ?, ?, 1)
+                ON CONFLICT (name, day, priority) DO UPDATE SET {column} = {column} + 1
+            """,
+            (self.name, day, priority),
+        )
+
+    def _take(self, priority: str) -> float | None:
+        """
+        Spends a token if priority may have one now.
+
+        Returns:
+            float | None: 0 if a token was spent, the seconds until one may be
+            available, or None if the day's quota for priority is spent.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            day = self._day(now)
+            tokens, interactive_until = self._bucket(conn, now)
+            used = conn.execute(
+                "SELECT COALESCE(SUM(used), 0) FROM quota_usage WHERE name = ? AND day = ?",
+                (self.name, day),
+            ).fetchone()[0]
+            quota, floor = self._limits(priority)
+
+            if used >= quota:
+                self._count(conn, day, priority, "rejected")
+                wait = None
+            elif priority != "interactive" and interactive_until > now:
+                wait = interactive_until - now
+            elif tokens >= floor:
+                tokens -= 1
+                self._count(conn, day, priority, "used")
+                wait = 0.0
+            else:
+                wait = (floor - tokens) / self.rate
+                if priority == "interactive":
+                    interactive_until = max(interactive_until, now + wait)
+
+            conn.execute(
+                """
+                INSERT INTO rate_buckets (name, tokens, updated, interactive_until)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET tokens = excluded.tokens,
+                        updated = excluded.updated,
+                        interactive_until = excluded.interactive_until
+                """,
+                (self.name, tokens, now, interactive_until),
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _reject(self, priority: str) -> None:
+        conn = self._connect()
+        try:
+            self._count(conn, self._day(time.time()), priority, "rejected")
+        finally:
+            conn.close()
+
+    def acquire(
+        self, priority: str = "interactive", max_wait: float | None = None
+    ) -> None:
+        """
+        Waits for a token and spends it, queueing behind other callers of the API.
+
+        Args:
+            priority (str): "interactive" for calls a user is waiting on, "bulk" for
+                background work.
+            max_wait (float | None): Seconds to wait for a token, defaults to MAX_WAIT.
+
+        Raises:
+            QuotaExceededError: If the day's quota is spent, or no token freed up in time.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}, not {priority!r}")
+        deadline = time.monotonic() + (
+            MAX_WAIT[priority] if max_wait is None else max_wait
+        )
+        while True:
+            wait = self._take(priority)
+            if wait is None:
+                raise QuotaExceededError(
+                    f"The daily {self.name} quota is spent, it resets at midnight "
+                    f"{QUOTA_TIMEZONE.key} time."
+                )
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                self._reject(priority)
+                raise QuotaExceededError(
+                    f"Too many {self.name} requests right now, try again in "
+                    f"{wait:.0f} seconds."
+                )
+            time.sleep(wait)
+
+    def metrics(self) -> dict:
+        """
+        Reports the state of the budget.
+
+        Returns:
+            dict: day, daily_quota, used, remaining, bulk_remaining (what bulk calls
+            may still spend today), tokens (in the bucket now) and the used and
+            rejected calls per priority.
+        """
+        conn = self._connect()
+        try:
+            now = time.time()
+            day = self._day(now)
+            tokens, _ = self._bucket(conn, now)
+            rows = conn.execute(
+                "SELECT priority, used, rejected FROM quota_usage WHERE name = ? AND day = ?",
+                (self.name, day),
+            ).fetchall()
+        finally:
+            conn.close()
+        used = sum(row[1] for row in rows)
+        return {
+            "day": day,
+            "daily_quota": self.daily_quota,
+            "used": used,
+            "remaining": max(0, self.daily_quota - used),
+            "bulk_remaining": max(0, int(self._limits("bulk")[0]) - used),
+            "tokens": round(tokens, 2),
+            "by_priority": {
+                priority: {"used": used, "rejected": rejected}
+                for priority, used, rejected in rows
+            },
+        }
+
+
+def get_limiter(name: str, db_path: str = QUOTA_DB, **settings) -> RateLimiter:
+    """
+    Returns the process-wide limiter of an API.
+
+    Args:
+        name (str): The API the budget belongs to.
+        db_path (str): The SQLite file holding the state.
+        **settings: rate, burst and daily_quota, used when the limiter is created.
+
+    Returns:
+        RateLimiter: The shared limiter, created on first use.
+    """
+    key = (name, db_path)
+    with _LIMITERS_LOCK:
+        if key not in _LIMITERS:
+            _LIMITERS[key] = RateLimiter(name, db_path, **settings)
+        return _LIMITERS[key]
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Show today's API quota usage.")
+    parser.add_argument("--db", default=QUOTA_DB)
+    parser.add_argument("--name", default="google_books")
+    parser.add_argument("--daily-quota", type=int, default=DAILY_QUOTA)
+    args = parser.parse_args()
+
+    limiter = RateLimiter(args.name, args.db, daily_quota=args.daily_quota)
+    print(json.dumps(limiter.metrics(), indent=2))
@@ -0,0 +1,428 @@
+"""Content-Based Book Recommendations."""
+
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Iterable, Optional
+
+import numpy as np
+from scipy import sparse
+
+from utils.database_funcs import BookDatabase
+
+# Size of the hashed feature space shared by titles, authors and descriptions
+N_FEATURES = 2**18
+# Neighbours kept per book
+TOP_K = 10
+# Budget for one dense block of the similarity matrix during a full build
+BLOCK_CELLS = 2**22
+# Books added since the last build that are merged into the main matrix at once
+MERGE_ROWS = 256
+# Seconds between two catch-ups with the catalog's change log
+SYNC_INTERVAL = 10.0
+# Seconds the owning process keeps the neighbour lists without renewing its lease,
+# longer than a full build of a large catalog
+LEASE_SECONDS = 15 * 60
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by de del el en for from has he her his in is it its la las "
+    "los of on or que she that the their this to un una was were which with y".split()
+)
+
+_OWNERS: dict[str, threading.Thread] = {}
+_OWNERS_LOCK = threading.Lock()
+
+
+def _features(title: str, authors: str, description: str) -> dict[int, float]:
+    """
+    Hashes a book's text into term-frequency features.
+
+    Title words count twice and authors get their own feature prefix, so shared
+    authors and title words weigh more than a shared word in the blurb.
+    """
+    counts: dict[int, float] = {}
+    fields = (("t", title, 2.0), ("a", authors, 2.0), ("d", description, 1.0))
+    for prefix, text, weight in fields:
+        for token in re.findall(r"[a-z0-9]+", (text or "").lower()):
+            if len(token) < 2 or token in STOP_WORDS:
+                continue
+            key = f"{prefix}:{token}" if prefix == "a" else token
+            bucket = zlib.crc32(key.encode()) % N_FEATURES
+            counts[bucket] = counts.get(bucket, 0.0) + weight
+    return counts
+
+
+class RecommendationIndex:
+    """
+    A hashed TF-IDF index over the books catalog with precomputed top-k neighbours.
+
+    The vectors live in memory and the neighbour lists are stored through the
+    BookDatabase, so pages only ever look them up. Only one process at a time keeps
+    an index and writes the lists, see start_recommender.
+
+    Attributes:
+        db (BookDatabase): The database holding the books.
+        top_k (int): The number of neighbours kept per book.
+        seq (int): The catalog change log position the index reflects.
+
+    Methods:
+        - build() -> int: Vectorizes the whole catalog.
+        - add_book(isbn: str, title: str, authors: str, description: str) -> set[int]: Adds or re-indexes one book.
+        - remove_book(isbn: str) -> set[int]: Removes one book.
+        - neighbours(rows: Optional[Iterable[int]]) -> dict[str, list[tuple[str, float]]]: Returns the ranked neighbour lists of index rows.
+    """
+
+    def __init__(self, db: BookDatabase, top_k: int = TOP_K) -> None:
+        self.db = db
+        self.top_k = top_k
+        self.seq = 0
+        self.isbns: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._matrix = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._recent = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._doc_freq = np.zeros(N_FEATURES, dtype=np.int64)
+        # Per-row arrays grow by doubling, only their first len(isbns) rows are used.
+        # Rows of removed books stay in place and are only marked dead
+        self._top_idx = np.empty((0, top_k), dtype=np.int64)
+        self._top_scores = np.empty((0, top_k), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+
+    @staticmethod
+    def _weigh(
+        counts: sparse.csr_matrix, doc_freq: np.ndarray, n_docs: int
+    ) -> sparse.csr_matrix:
+        n_docs = max(n_docs, 1)
+        idf = (np.log((1 + n_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+        weighted = counts.multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1))).ravel()
+        norms[norms == 0] = 1.0
+        return sparse.diags(1 / norms).dot(weighted).astype(np.float32).tocsr()
+
+    def build(self) -> int:
+        """
+        Vectorizes every book in the catalog and computes the top-k neighbours of each.
+
+        Returns:
+            int: The number of books indexed.
+        """
+        books = self.db.get_all_books()
+        if isinstance(books, str):
+            raise RuntimeError(books)
+
+        rows, cols, vals = [], [], []
+        for row, book in enumerate(books):
+            for bucket, count in _features(book[1], book[2], book[4]).items():
+                rows.append(row)
+                cols.append(bucket)
+                vals.append(count)
+
+        self.isbns = [book[0] for book in books]
+        self._rows = {isbn: row for row, isbn in enumerate(self.isbns)}
+        counts = sparse.csr_matrix(
+            (vals, (rows, cols)), shape=(len(books), N_FEATURES), dtype=np.float32
+        )
+        self._doc_freq = np.bincount(counts.indices, minlength=N_FEATURES).astype(
+            np.int64
+        )
+        self._matrix = self._weigh(counts, self._doc_freq, len(books))
+        self._recent = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._top_idx, self._top_scores = self._top_neighbours(self._matrix)
+        self._alive = np.ones(len(books), dtype=bool)
+        return len(books)
+
+    def _top_neighbours(
+        self, matrix: sparse.csr_matrix
+    ) -> tuple[np.ndarray, np.ndarray]:
+        n_books = matrix.shape[0]
+        k = min(self.top_k, max(n_books - 1, 0))
+        top_idx = np.full((n_books, self.top_k), -1, dtype=np.int64)
+        top_scores = np.full((n_books, self.top_k), -np.inf, dtype=np.float32)
+        if k == 0:
+            return top_idx, top_scores
+
+        block = max(1, BLOCK_CELLS // n_books)
+        transposed = matrix.T.tocsc()
+        for start in range(0, n_books, block):
+            stop = min(start + block, n_books)
+            sims = (matrix[start:stop] @ transposed).toarray()
+            sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            part_scores = np.take_along_axis(sims, part, axis=1)
+            order = np.argsort(-part_scores, axis=1)
+            top_idx[start:stop, :k] = np.take_along_axis(part, order, axis=1)
+            top_scores[start:stop, :k] = np.take_along_axis(part_scores, order, axis=1)
+        return top_idx, top_scores
+
+    def _vector(self, row: int) -> sparse.csr_matrix:
+        merged = self._matrix.shape[0]
+        return self._matrix[row] if row < merged else self._recent[row - merged]
+
+    def _similarities(self, vector: sparse.csr_matrix) -> np.ndarray:
+        sims = np.concatenate(
+            [
+                (self._matrix @ vector.T).toarray().ravel(),
+                (self._recent @ vector.T).toarray().ravel(),
+            ]
+        )
+        sims[~self._alive[: sims.size]] = -np.inf
+        return sims
+
+    def _top(self, sims: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        top_idx = np.full(self.top_k, -1, dtype=np.int64)
+        top_scores = np.full(self.top_k, -np.inf, dtype=np.float32)
+        k = min(self.top_k, sims.size)
+        if k:
+            best = np.argsort(-sims)[:k]
+            top_idx[:k] = best
+            top_scores[:k] = sims[best]
+        return top_idx, top_scores
+
+    def add_book(
+        self, isbn: str, title: str, authors: str, description: str
+    ) -> set[int]:
+        """
+        Adds a single book, or re-indexes a changed one, and updates the lists it now belongs to.
+
+        Existing vectors keep the IDF weights they were built with until the next
+        full build, which keeps an insert to one sparse matrix-vector product. The
+        book is kept in a small matrix of recent additions, merged into the main one
+        every MERGE_ROWS books, so an insert doesn't copy the whole index. A book
+        already in the index is removed first and added again as a new row.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            title (str): The title of the book.
+            authors (str): The authors of the book.
+            description (str): The description of the book.
+
+        Returns:
+            set[int]: The rows whose neighbour lists changed, including the book's own.
+        """
+        changed = self.remove_book(isbn)
+        features = _features(title, authors, description)
+        counts = sparse.csr_matrix(
+            (
+                list(features.values()),
+                ([0] * len(features), list(features.keys())),
+            ),
+            shape=(1, N_FEATURES),
+            dtype=np.float32,
+        )
+        self._doc_freq[counts.indices] += 1
+        new_row = len(self.isbns)
+        self._rows[isbn] = new_row
+        self.isbns.append(isbn)
+        vector = self._weigh(counts, self._doc_freq, len(self._rows))
+
+        sims = self._similarities(vector)
+        top_idx, top_scores = self._top(sims)
+        # Books whose weakest neighbour is less similar than the new book
+        closer = np.flatnonzero((sims > 0) & (sims > self._top_scores[:new_row, -1]))
+        for row in closer:
+            pos = np.searchsorted(-self._top_scores[row], -sims[row], side="right")
+            self._top_idx[row] = np.insert(self._top_idx[row], pos, new_row)[:-1]
+            self._top_scores[row] = np.insert(self._top_scores[row], pos, sims[row])[
+                :-1
+            ]
+
+        self._recent = sparse.vstack([self._recent, vector]).tocsr()
+        if self._recent.shape[0] >= MERGE_ROWS:
+            self._matrix = sparse.vstack([self._matrix, self._recent]).tocsr()
+            self._recent = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._grow(new_row + 1)
+        self._top_idx[new_row] = top_idx
+        self._top_scores[new_row] = top_scores
+        self._alive[new_row] = True
+        return changed | {new_row, *closer.tolist()}
+
+    def remove_book(self, isbn: str) -> set[int]:
+        """
+        Removes a book and refills the neighbour lists it was part of.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            set[int]: The rows whose neighbour lists changed, empty if the book wasn't indexed.
+        """
+        row = self._rows.pop(isbn, None)
+        if row is None:
+            return set()
+        self._alive[row] = False
+        n_rows = len(self.isbns)
+        affected = np.flatnonzero(
+            (self._top_idx[:n_rows] == row).any(axis=1) & self._alive[:n_rows]
+        )
+        for other in affected:
+            sims = self._similarities(self._vector(other))
+            sims[other] = -np.inf
+            self._top_idx[other], self._top_scores[other] = self._top(sims)
+        return set(affected.tolist())
+
+    def _grow(self, rows: int) -> None:
+        capacity = self._top_idx.shape[0]
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity)
+        top_idx = np.full((capacity, self.top_k), -1, dtype=np.int64)
+        top_scores = np.full((capacity, self.top_k), -np.inf, dtype=np.float32)
+        alive = np.zeros(capacity, dtype=bool)
+        top_idx[: self._top_idx.shape[0]] = self._top_idx
+        top_scores[: self._top_scores.shape[0]] = self._top_scores
+        alive[: self._alive.size] = self._alive
+        self._top_idx, self._top_scores, self._alive = top_idx, top_scores, alive
+
+    def neighbours(
+        self, rows: Optional[Iterable[int]] = None
+    ) -> dict[str, list[tuple[str, float]]]:
+        """
+        Returns the ranked (ISBN, score) neighbour lists of index rows.
+
+        Args:
+            rows (Optional[Iterable[int]]): The rows, every indexed book if None.
+
+        Returns:
+            dict[str, list[tuple[str, float]]]: The lists per book ISBN, removed books left out.
+        """
+        neighbours = {}
+        for row in self._rows.values() if rows is None else rows:
+            if not self._alive[row]:
+                continue
+            valid = self._top_idx[row] >= 0
+            neighbours[self.isbns[row]] = [
+                (self.isbns[idx], float(score))
+                for idx, score in zip(
+                    self._top_idx[row][valid], self._top_scores[row][valid]
+                )
+                if score > 0
+            ]
+        return neighbours
+
+
+def sync_recommendations(
+    db: BookDatabase, index: Optional[RecommendationIndex], holder: str
+) -> Optional[RecommendationIndex]:
+    """
+    Brings the stored neighbour lists up to date with the catalog, if this process owns them.
+
+    The lists are kept by whichever process holds the recommender lease. The holder
+    follows the catalog's change log: inserted and updated books are (re-)indexed,
+    deleted ones removed, and only the lists that changed are written. An index
+    that missed part of the log, because another process held the lease in between
+    or the log was pruned, is rebuilt from the whole catalog.
+
+    Args:
+        db (BookDatabase): The database holding the books.
+        index (Optional[RecommendationIndex]): The index returned by the previous call.
+        holder (str): The name of this process.
+
+    Returns:
+        Optional[RecommendationIndex]: The up-to-date index, or None if another process holds the lease.
+    """
+    seq = db.claim_recommender(holder, LEASE_SECONDS)
+    if isinstance(seq, str):
+        raise RuntimeError(seq)
+    if seq is None:
+        return None
+    changes = db.get_catalog_changes(seq)
+    if isinstance(changes, str):
+        raise RuntimeError(changes)
+
+    if index is None or index.seq != seq or changes["reset"]:
+        index = RecommendationIndex(db)
+        count = index.build()
+        neighbours = index.neighbours()
+        print(f"[INFO] Indexed {count} books for recommendations.")
+    else:
+        rows: set[int] = set()
+        deleted = []
+        for isbn, book in changes["books"]:
+            if book is None:
+                rows |= index.remove_book(isbn)
+                deleted.append(isbn)
+            else:
+                rows |= index.add_book(isbn, book[1], book[2], book[4])
+        neighbours = index.neighbours(rows)
+        neighbours.update({isbn: [] for isbn in deleted})
+    # Changes logged while the catalog was read are applied again by the next call
+    if neighbours or changes["seq"] != seq:
+        ret_msg = db.replace_neighbours(neighbours, holder, changes["seq"])
+        if "error" in ret_msg:
+            raise RuntimeError(ret_msg)
+    index.seq = changes["seq"]
+    return index
+
+
+def run_recommender(
+    db: BookDatabase, holder: str, interval: float = SYNC_INTERVAL
+) -> None:
+    """
+    Calls sync_recommendations every interval seconds, forever.
+
+    Args:
+        db (BookDatabase): The database holding the books.
+        holder (str): The name of this process.
+        interval (float): Seconds between two catch-ups with the change log.
+    """
+    index = None
+    while True:
+        try:
+            index = sync_recommendations(db, index, holder)
+        except Exception as e:
+            print(f"[WARN] Could not update the recommendations: {e}")
+            index = None
+        time.sleep(interval)
+
+
+def start_recommender(db: BookDatabase, interval: float = SYNC_INTERVAL) -> None:
+    """
+    Starts a daemon thread that keeps the "more like this" lists current while this process owns them.
+
+    Every process runs one, but only the holder of the recommender lease keeps an
+    index in memory and writes the lists. The others just check the lease, and take
+    it over when its holder stops renewing it. Only one thread runs per database
+    and process, so calling this on every Streamlit rerun is cheap.
+
+    Args:
+        db (BookDatabase): The database holding the books.
+        interval (float): Seconds between two catch-ups with the change log.
+    """
+    with _OWNERS_LOCK:
+        if db.db_name in _OWNERS:
+            return
+        thread = threading.Thread(
+            target=run_recommender,
+            args=(db, f"{os.getpid()}-recommender", interval),
+            name="recommender",
+            daemon=True,
+        )
+        _OWNERS[db.db_name] = thread
+        thread.start()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild the book recommendations.")
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep the lists current from the change log instead of exiting after a rebuild.",
+    )
+    args = parser.parse_args()
+
+    book_db = BookDatabase(args.books_db, args.bookshelf_db)
+    cli_holder = f"{os.getpid()}-cli"
+    if book_db.claim_recommender(cli_holder, LEASE_SECONDS) is None:
+        print("[WARN] Another process owns the recommendations and keeps them current.")
+    elif args.follow:
+        run_recommender(book_db, cli_holder)
+    else:
+        try:
+            sync_recommendations(book_db, None, cli_holder)
+        finally:
+            print(book_db.release_recommender(cli_holder))
@@ -0,0 +1,49 @@
+"""User Summary Consistency Check."""
+
+from utils.database_funcs import USER_SUMMARY_COLUMNS, BookDatabase
+
+
+def check_summaries(db: BookDatabase, repair: bool = True) -> str:
+    """
+    Compares the maintained user summaries with the bookshelf, rebuilding them if any drifted.
+
+    Args:
+        db (BookDatabase): The database holding the bookshelves.
+        repair (bool): Whether to rebuild the summaries when one is off.
+
+    Returns:
+        str: A report of the summaries that were off, or an error message.
+    """
+    drift = db.check_user_summary(repair)
+    if isinstance(drift, str):
+        return drift
+    if not drift:
+        return "Every user summary matches the bookshelf."
+    lines = [f"{len(drift)} user summaries were off:"]
+    for owner, stored, expected in drift:
+        changes = ", ".join(
+            f"{column} {was} -> {should}"
+            for column, was, should in zip(USER_SUMMARY_COLUMNS, stored, expected)
+            if was != should
+        )
+        lines.append(f"  {owner}: {changes}")
+    lines.append("Rebuilt the table." if repair else "Run without --check-only to fix.")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Check and rebuild the user summaries."
+    )
+    parser.add_argument("--books-db", default="books.db")
+    parser.add_argument("--bookshelf-db", default="bookshelf.db")
+    parser.add_argument("--check-only", action="store_true")
+    args = parser.parse_args()
+
+    print(
+        check_summaries(
+            BookDatabase(args.books_db, args.bookshelf_db), not args.check_only
+        )
+    )